@@ -161,6 +161,7 @@ class OpenShotApp(QApplication):
 
         # Init Update Manager
         self.updates = updates.UpdateManager()
+        self.updates.history_size_limit = int(self.settings.get("history-size-limit") or 0) * 1024 * 1024
 
         # It is important that the project is the first listener if the key gets update
         self.updates.add_listener(self.project)
@@ -0,0 +1,269 @@
+"""
+ @file
+ @brief This file contains a background writer for autosaves, and recovery points saved as compressed deltas
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import gzip
+import json
+import os
+import itertools
+import threading
+import time
+
+from classes import info
+from classes.logger import log
+from classes.project_container import pack_container
+from classes.project_paths import PathResolver
+
+# Index of recovery points (in the recovery folder)
+RECOVERY_INDEX = "recovery.json"
+
+
+def write_file(file_path, contents):
+    """ Write a file atomically (to a temp file, which then replaces the file) """
+    temp_path = "%s.%s-%s.tmp" % (file_path, os.getpid(), threading.get_ident())
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def is_item_list(value):
+    """ Lists of items with unique ids (i.e. clips, effects, files) are compared item by item """
+    if not isinstance(value, list) or not value:
+        return False
+    if not all(isinstance(item, dict) and "id" in item for item in value):
+        return False
+    return len(set(str(item["id"]) for item in value)) == len(value)
+
+
+class ProjectSnapshot:
+    """ Project data serialized on the main thread (each item of the clips, effects, files...
+    lists separately), so it can be written on a background thread while the project changes.
+    Snapshots can be compared item by item, to save only the changes. """
+
+    def __init__(self, values=None, compact=False):
+        self.values = values or {}  # key: JSON text, or list of (item id, JSON text)
+        self.compact = compact  # Write as a compact project container
+
+    @classmethod
+    def from_data(cls, data, resolver=None):
+        """ Serialize project data (with paths converted by a PathResolver, if any) """
+        def dumps(value):
+            if resolver:
+                value = resolver.make_relative(value)
+            return json.dumps(value, ensure_ascii=False)
+
+        values = {}
+        for key, value in data.items():
+            if is_item_list(value):
+                values[key] = [(item["id"], dumps(item)) for item in value]
+            else:
+                values[key] = dumps(value)
+        return cls(values)
+
+    @staticmethod
+    def get_value_text(value):
+        if isinstance(value, list):
+            return "[%s]" % ", ".join(text for _, text in value)
+        return value
+
+    def get_text(self):
+        """ Get the project file contents (JSON) """
+        return "{%s}" % ", ".join("%s: %s" % (json.dumps(key, ensure_ascii=False), self.get_value_text(value))
+                                  for key, value in self.values.items())
+
+    def get_contents(self):
+        """ Get the project file contents (a JSON file, or a compact project container) """
+        if self.compact:
+            return pack_container({key: self.get_value_text(value) for key, value in self.values.items()})
+        return self.get_text().encode("utf-8")
+
+    def make_delta(self, base):
+        """ Get the changes from a base snapshot (changed values, and changed or reordered items) """
+        delta = {"values": {}, "items": {}, "removed": [key for key in base.values if key not in self.values]}
+        for key, value in self.values.items():
+            base_value = base.values.get(key)
+            if isinstance(value, list) and isinstance(base_value, list):
+                base_texts = dict(base_value)
+                ids = [item_id for item_id, _ in value]
+                changed = [[item_id, text] for item_id, text in value if base_texts.get(item_id) != text]
+                if changed or ids != [item_id for item_id, _ in base_value]:
+                    delta["items"][key] = {"ids": ids, "changed": changed}
+            elif value != base_value:
+                delta["values"][key] = self.get_value_text(value)
+        return delta
+
+    def apply_delta(self, delta):
+        """ Get the snapshot of a base snapshot (self) with changes applied """
+        values = {key: value for key, value in self.values.items() if key not in delta["removed"]}
+        values.update(delta["values"])
+        for key, items in delta["items"].items():
+            base_value = self.values.get(key)
+            texts = dict(base_value) if isinstance(base_value, list) else {}
+            texts.update((item_id, text) for item_id, text in items["changed"])
+            values[key] = [(item_id, texts[item_id]) for item_id in items["ids"]]
+        return ProjectSnapshot(values)
+
+
+class RecoveryStore:
+    """ Recovery points of autosaved projects. Each project has a base (a compressed copy of the
+    first autosave after a full save), and each recovery point only stores the changes since that
+    base. Points are listed in an index file, which limits how many are kept (so the recovery
+    folder never needs to be scanned). Use restore() to write a point to a new project file
+    (File > Recover Project). """
+
+    def __init__(self, folder=info.RECOVERY_PATH, limit=30):
+        self.folder = folder
+        self.limit = limit
+        self.bases = {}  # project path: (base file name, snapshot)
+        self.counter = itertools.count()  # Keeps file names unique (even within a millisecond)
+
+    def get_index_path(self):
+        return os.path.join(self.folder, RECOVERY_INDEX)
+
+    def load_index(self):
+        try:
+            with open(self.get_index_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"points": []}
+
+    def save_index(self, index):
+        write_file(self.get_index_path(), json.dumps(index, ensure_ascii=False).encode("utf-8"))
+
+    def get_file_name(self, project_path, suffix):
+        project_name = os.path.splitext(os.path.basename(project_path))[0]
+        return "%d-%d-%d-%s.%s" % (time.time() * 1000, os.getpid(), next(self.counter), project_name, suffix)
+
+    def reset(self, project_path):
+        """ Start a new base for a project (i.e. after it was saved by the user) """
+        self.bases.pop(project_path, None)
+
+    def add(self, project_path, snapshot):
+        """ Add a recovery point for a project """
+        base_name, base = self.bases.get(project_path, (None, None))
+        if base is None:
+            base_name, base = self.get_file_name(project_path, "base.osp.gz"), snapshot
+            write_file(os.path.join(self.folder, base_name), gzip.compress(snapshot.get_text().encode("utf-8")))
+            self.bases[project_path] = (base_name, base)
+
+        point = {"project": project_path, "base": base_name, "time": time.time(),
+                 "file": self.get_file_name(project_path, "delta.gz")}
+        delta = dict(point, delta=snapshot.make_delta(base))
+        write_file(os.path.join(self.folder, point["file"]),
+                   gzip.compress(json.dumps(delta, ensure_ascii=False).encode("utf-8")))
+
+        # Remove the oldest points (and bases no longer used)
+        index = self.load_index()
+        index["points"].append(point)
+        removed = index["points"][:-self.limit] if self.limit > 0 else index["points"]
+        index["points"] = index["points"][len(removed):]
+        self.save_index(index)
+        used_bases = set(item["base"] for item in index["points"])
+        used_bases.update(name for name, _ in self.bases.values())
+        removed_bases = set(item["base"] for item in removed) - used_bases
+        for file_name in [item["file"] for item in removed] + sorted(removed_bases):
+            try:
+                os.unlink(os.path.join(self.folder, file_name))
+            except OSError:
+                pass
+
+    def get_points(self, project_path=None):
+        """ Get the recovery points (oldest first) of a project (or of all projects) """
+        return [point for point in self.load_index()["points"]
+                if project_path is None or point["project"] == project_path]
+
+    def restore(self, point, file_path):
+        """ Write the project of a recovery point to a project file (with paths relative to the
+        new file). The undo history is not restored, since the history file of the project
+        may have been compacted (or replaced) since the point was added. """
+        with gzip.open(os.path.join(self.folder, point["base"]), "rt", encoding="utf-8") as f:
+            base = ProjectSnapshot.from_data(json.load(f))
+        with gzip.open(os.path.join(self.folder, point["file"]), "rt", encoding="utf-8") as f:
+            delta = json.load(f)["delta"]
+        data = json.loads(base.apply_delta(delta).get_text())
+        if "history" in data:
+            data["history"] = {"undo": [], "redo": []}
+        data = PathResolver(file_path).make_relative(PathResolver(point["project"]).make_absolute(data))
+        write_file(file_path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+class AutoSaver:
+    """ Writes autosaved projects on a background thread. Only the newest snapshot of each
+    project file is written (older snapshots waiting to be written are skipped). """
+
+    def __init__(self, recovery=None):
+        self.recovery = recovery or RecoveryStore()
+        self.pending = {}  # file path: (snapshot, add recovery point)
+        self.writing = False
+        self.condition = threading.Condition()
+        self.recovery_lock = threading.Lock()
+        self.thread = None
+
+    def save(self, file_path, snapshot, recovery=True):
+        """ Queue a snapshot to be written to a project file (and as a recovery point) """
+        with self.condition:
+            self.pending[file_path] = (snapshot, recovery)
+            if not self.thread:
+                self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def reset(self, file_path):
+        """ A project was saved by the user (so its next recovery point starts a new base) """
+        with self.recovery_lock:
+            self.recovery.reset(file_path)
+
+    def wait(self, timeout=None):
+        """ Wait until all queued snapshots are written. Returns False on timeout. """
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and not self.writing, timeout)
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+                file_path, (snapshot, recovery) = self.pending.popitem()
+                self.writing = True
+            try:
+                start_time = time.perf_counter()
+                write_file(file_path, snapshot.get_contents())
+                if recovery:
+                    with self.recovery_lock:
+                        self.recovery.add(file_path, snapshot)
+                log.info("Autosaved %s in %.2f seconds" % (file_path, time.perf_counter() - start_time))
+            except Exception:
+                log.error("Failed to autosave %s" % file_path, exc_info=1)
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.condition.notify_all()
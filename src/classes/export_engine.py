@@ -0,0 +1,944 @@
+"""
+ @file
+ @brief This file contains the export engine (which renders a project to a video file, without the UI)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from queue import Empty
+
+import openshot  # Python module for libopenshot (required video editing module installed separately)
+
+from classes.export_report import ExportReport
+from classes.logger import log
+from classes.project_file import load_project_file, rescale_keyframes
+from classes.smart_render import (
+    SMART_RENDER_MIN_SECONDS, ENCODER_CODECS, get_ffprobe_path, find_passthrough_spans, probe_video,
+    get_copy_range, plan_segments, copy_segment, get_codec_parameters, probe_codec_parameters, get_encoder_options
+)
+
+# Types of export
+EXPORT_VIDEO_AUDIO = "video-audio"
+EXPORT_VIDEO = "video"
+EXPORT_AUDIO = "audio"
+EXPORT_IMAGE_SEQUENCE = "image-sequence"
+EXPORT_TYPES = [EXPORT_VIDEO_AUDIO, EXPORT_VIDEO, EXPORT_AUDIO, EXPORT_IMAGE_SEQUENCE]
+
+# Number of frames cached by the export timeline
+EXPORT_CACHE_FRAMES = 500
+
+# Max seconds between progress callbacks
+EXPORT_PROGRESS_INTERVAL = 1.0
+
+# Max number of frames composited ahead of the writer (0 = composite and encode in turn)
+EXPORT_PREFETCH_FRAMES = 8
+
+# Number of threads compositing frames ahead of the writer
+EXPORT_PREFETCH_THREADS = 1
+
+# Keyframe interval (in seconds) of segmented exports. Segments always start on a keyframe.
+EXPORT_SEGMENT_GOP_SECONDS = 2
+
+# Min number of frames in each segment of a segmented export
+EXPORT_MIN_SEGMENT_FRAMES = 240
+
+# Length (in seconds) of each segment of a resumable export (at most this much work is lost when interrupted)
+EXPORT_RESUME_SEGMENT_SECONDS = 30
+
+# Formats which support moving the index to the start of the file (for faster playback start when streamed)
+FASTSTART_FORMATS = [".mp4", ".mov", ".m4v", ".m4a"]
+
+
+# Number of exports (and export dialogs) using the export settings of libopenshot. These settings are
+# global (shared with the preview), so they are only restored after the last export is done.
+export_settings_lock = threading.Lock()
+export_settings_count = 0
+preview_settings = {}
+
+
+def acquire_export_settings():
+    """ Use the export settings of libopenshot (until release_export_settings() is called) """
+    global export_settings_count
+    with export_settings_lock:
+        settings = openshot.Settings.Instance()
+        if export_settings_count == 0:
+            # Save the preview settings (restored after the last export)
+            preview_settings["WAIT_FOR_VIDEO_PROCESSING_TASK"] = settings.WAIT_FOR_VIDEO_PROCESSING_TASK
+            preview_settings["HIGH_QUALITY_SCALING"] = settings.HIGH_QUALITY_SCALING
+        export_settings_count += 1
+
+        # Set OMP thread disabled flag (for stability), and high quality scaling
+        settings.WAIT_FOR_VIDEO_PROCESSING_TASK = True
+        settings.HIGH_QUALITY_SCALING = True
+
+
+def release_export_settings():
+    """ Stop using the export settings of libopenshot (the preview settings are restored after the last export) """
+    global export_settings_count
+    with export_settings_lock:
+        export_settings_count -= 1
+        if export_settings_count == 0:
+            settings = openshot.Settings.Instance()
+            for name, value in preview_settings.items():
+                setattr(settings, name, value)
+
+
+def set_preview_setting(name, value):
+    """ Change a setting of libopenshot used by the preview (if any exports are running, the setting is
+    changed after the last export) """
+    with export_settings_lock:
+        if export_settings_count:
+            preview_settings[name] = value
+        else:
+            setattr(openshot.Settings.Instance(), name, value)
+
+
+def is_frame_cached(timeline, frame_number):
+    """ Check if a frame is in the cache of a timeline (None if unknown) """
+    try:
+        return timeline.GetCache().GetFrame(frame_number) is not None
+    except Exception:
+        return None
+
+
+class FramePrefetcher:
+    """ Composites upcoming frames (timeline.GetFrame) in background threads, while the writer
+    encodes earlier frames. At most max_frames frames are composited ahead of the writer (so
+    memory use is bounded), and frames are returned in order. """
+
+    def __init__(self, timeline, start_frame, end_frame, threads=EXPORT_PREFETCH_THREADS,
+                 max_frames=EXPORT_PREFETCH_FRAMES):
+        self.timeline = timeline
+        self.end_frame = end_frame
+        self.next_frame = start_frame
+        self.frames = {}  # Composited frames (by frame number): (frame, error, seconds, cache hit)
+        self.condition = threading.Condition()
+        self.space = threading.Semaphore(max(1, max_frames))
+        self.stopped = False
+        self.threads = [threading.Thread(target=self.composite_frames, name="export-prefetch")
+                        for _ in range(max(1, threads))]
+
+        # Total seconds spent compositing frames (in all threads), and waiting for frames (in the writer)
+        self.composite_time = 0.0
+        self.wait_time = 0.0
+
+    def start(self):
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def composite_frames(self):
+        """ Composite frames in order, until the last frame (or until stopped) """
+        while True:
+            # Wait for space (back-pressure from the writer)
+            self.space.acquire()
+            with self.condition:
+                if self.stopped or self.next_frame > self.end_frame:
+                    return
+                frame_number = self.next_frame
+                self.next_frame += 1
+
+            cache_hit = is_frame_cached(self.timeline, frame_number)
+            start_time = time.perf_counter()
+            frame, error = None, None
+            try:
+                frame = self.timeline.GetFrame(frame_number)
+            except Exception as ex:
+                error = ex
+            seconds = time.perf_counter() - start_time
+
+            with self.condition:
+                self.frames[frame_number] = (frame, error, seconds, cache_hit)
+                self.composite_time += seconds
+                self.condition.notify_all()
+
+    def get_frame(self, frame_number):
+        """ Get a composited frame (waiting for it, if needed). Call release() once it is written. """
+        start_time = time.perf_counter()
+        with self.condition:
+            while frame_number not in self.frames:
+                self.condition.wait()
+            frame, error, seconds, cache_hit = self.frames.pop(frame_number)
+        self.wait_time += time.perf_counter() - start_time
+        if error:
+            raise error
+        return frame, seconds, cache_hit
+
+    def release(self):
+        """ Allow another frame to be composited (after a frame is written) """
+        self.space.release()
+
+    def stop(self):
+        """ Stop compositing frames (and wait for the threads to finish their current frame) """
+        with self.condition:
+            self.stopped = True
+        for thread in self.threads:
+            self.space.release()
+        for thread in self.threads:
+            thread.join()
+        self.frames.clear()
+
+
+class ExportEngine:
+    """ Renders a range of frames of a project to a file (video, audio, or image sequence).
+    The engine only needs the project data and a dict of export settings, so it can run in a
+    worker thread of the Export dialog, or headless (from the command line). Export settings:
+
+        {
+            "path": "/home/user/video.mp4",
+            "type": "video-audio" (or "video", "audio", "image-sequence"),
+            "video": {"vformat", "vcodec", "fps": {"num", "den"}, "width", "height",
+                      "pixel_ratio": {"num", "den"}, "video_bitrate", "quality" (None, "crf", "cqp" or "qp"),
+                      "start_frame", "end_frame" (None for the entire timeline), "interlace", "topfirst"},
+            "audio": {"acodec", "sample_rate", "channels", "channel_layout", "audio_bitrate"}
+        }
+    """
+
+    def __init__(self, project_data, export_settings, progress_callback=None):
+        self.project_data = project_data
+        self.export_settings = export_settings
+        self.path = export_settings.get("path")
+        self.export_type = export_settings.get("type", EXPORT_VIDEO_AUDIO)
+        self.video_settings = export_settings.get("video", {})
+        self.audio_settings = export_settings.get("audio", {})
+        self.start_frame = self.video_settings.get("start_frame") or 1
+        self.end_frame = self.video_settings.get("end_frame")  # None exports the entire timeline
+
+        # Callback (called from the export thread): progress_callback(frame, start_frame, end_frame, seconds elapsed)
+        self.progress_callback = progress_callback
+
+        self.cancelled = False
+        self.completed = False
+        self.error = None
+        self.current_frame = self.start_frame
+        self.start_time = None
+        self.end_time = None
+        self.thread = None
+
+        # Frames composited ahead of the writer (0 = composite and encode in turn)
+        self.prefetch_frames = export_settings.get("prefetch_frames", EXPORT_PREFETCH_FRAMES)
+        self.prefetch_threads = export_settings.get("prefetch_threads", EXPORT_PREFETCH_THREADS)
+
+        # Seconds spent compositing frames, encoding frames, and waiting for composited frames
+        self.composite_time = 0.0
+        self.encode_time = 0.0
+        self.wait_time = 0.0
+
+        # Per-frame timing report (saved next to the exported file, unless the frames are
+        # collected by the segmented export this engine is part of)
+        self.report = None
+        self.report_path = None
+        self.save_report = True
+        if export_settings.get("report"):
+            fps = self.video_settings.get("fps") or project_data.get("fps")
+            self.report = ExportReport(project_data, export_settings, float(fps["num"]) / float(fps["den"]))
+
+    @property
+    def has_video(self):
+        return self.export_type in [EXPORT_VIDEO_AUDIO, EXPORT_VIDEO, EXPORT_IMAGE_SEQUENCE]
+
+    @property
+    def has_audio(self):
+        return self.export_type in [EXPORT_VIDEO_AUDIO, EXPORT_AUDIO]
+
+    @property
+    def elapsed(self):
+        """ Seconds spent exporting (so far) """
+        if not self.start_time:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def frames_per_second(self):
+        """ Average export speed (frames per second) """
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0
+        return (self.current_frame - self.start_frame) / elapsed
+
+    def get_export_data(self):
+        """ Get the project data to export (with keyframes rescaled to the export frame rate, if needed) """
+        project_fps = self.project_data.get("fps", {"num": 24, "den": 1})
+        export_fps = self.video_settings.get("fps", project_fps)
+        fps_factor = (float(export_fps["num"]) / float(export_fps["den"])) / \
+                     (float(project_fps["num"]) / float(project_fps["den"]))
+        if fps_factor != 1.0:
+            return rescale_keyframes(self.project_data, fps_factor)
+        return self.project_data
+
+    def create_timeline(self):
+        """ Create and open a timeline with the export settings (and the project data) """
+        fps = self.video_settings.get("fps") or self.project_data.get("fps")
+        width = self.video_settings.get("width") or self.project_data.get("width")
+        height = self.video_settings.get("height") or self.project_data.get("height")
+        sample_rate = self.audio_settings.get("sample_rate") or self.project_data.get("sample_rate")
+        channels = self.audio_settings.get("channels") or self.project_data.get("channels")
+        channel_layout = self.audio_settings.get("channel_layout") or self.project_data.get("channel_layout")
+
+        timeline = openshot.Timeline(width, height, openshot.Fraction(fps["num"], fps["den"]),
+                                     sample_rate, channels, channel_layout)
+        timeline.info.channel_layout = channel_layout
+        timeline.info.has_audio = True
+        timeline.info.has_video = True
+        timeline.info.duration = float(self.project_data.get("duration", 0.0))
+        timeline.info.video_length = round(timeline.info.duration * float(fps["num"]) / float(fps["den"]))
+        timeline.info.sample_rate = sample_rate
+        timeline.info.channels = channels
+
+        # Load the project data, and open the timeline
+        timeline.SetJson(json.dumps(self.get_export_data()))
+        timeline.Open()
+
+        # Set MaxSize (so we don't have any downsampling)
+        timeline.SetMaxSize(width, height)
+
+        # Set lossless cache settings
+        timeline.SetCache(openshot.CacheMemory(EXPORT_CACHE_FRAMES))
+        return timeline
+
+    def create_writer(self):
+        """ Create, prepare, and open the writer of the export file """
+        w = openshot.FFmpegWriter(self.path)
+
+        # Set video options
+        if self.has_video:
+            w.SetVideoOptions(True,
+                              self.video_settings.get("vcodec"),
+                              openshot.Fraction(self.video_settings.get("fps").get("num"),
+                                                self.video_settings.get("fps").get("den")),
+                              self.video_settings.get("width"),
+                              self.video_settings.get("height"),
+                              openshot.Fraction(self.video_settings.get("pixel_ratio").get("num"),
+                                                self.video_settings.get("pixel_ratio").get("den")),
+                              self.video_settings.get("interlace", False),
+                              self.video_settings.get("topfirst", False),
+                              self.video_settings.get("video_bitrate"))
+
+        # Set audio options
+        if self.has_audio:
+            w.SetAudioOptions(True,
+                              self.audio_settings.get("acodec"),
+                              self.audio_settings.get("sample_rate"),
+                              self.audio_settings.get("channels"),
+                              self.audio_settings.get("channel_layout"),
+                              self.audio_settings.get("audio_bitrate"))
+
+        # Prepare the streams
+        w.PrepareStreams()
+
+        # These extra options should be set in an extra method
+        # No feedback is given to the user
+        # TODO: Tell user if option is not available
+        if self.export_type == EXPORT_AUDIO:
+            # Muxing options for mp4/mov
+            w.SetOption(openshot.AUDIO_STREAM, "muxing_preset", "mp4_faststart")
+        else:
+            # Muxing options for mp4/mov
+            w.SetOption(openshot.VIDEO_STREAM, "muxing_preset", "mp4_faststart")
+            # Set the quality in case crf, cqp or qp was selected
+            quality = self.video_settings.get("quality")
+            if quality in ["crf", "cqp", "qp"]:
+                w.SetOption(openshot.VIDEO_STREAM, quality, str(int(self.video_settings.get("video_bitrate"))))
+            # Fixed keyframe interval (used by segmented exports)
+            if self.video_settings.get("gop_size"):
+                w.SetOption(openshot.VIDEO_STREAM, "gop_size", str(int(self.video_settings.get("gop_size"))))
+            # Profile and level of the encoder (used by smart render, to match the copied video)
+            for option in ["profile", "level"]:
+                if self.video_settings.get(option):
+                    w.SetOption(openshot.VIDEO_STREAM, option, str(int(self.video_settings.get(option))))
+
+        # Open the writer
+        w.Open()
+        return w
+
+    def run(self):
+        """ Export all frames (in the current thread). Returns True if the export completed, and
+        False if it was cancelled. Errors are raised (after closing the timeline). """
+        acquire_export_settings()
+        try:
+            self.start_time = time.time()
+            self.end_time = None
+            timeline = self.create_timeline()
+            if not self.end_frame:
+                # Export the entire timeline
+                self.end_frame = timeline.GetMaxFrame()
+            log.info("Exporting frames %s-%s to %s" % (self.start_frame, self.end_frame, self.path))
+            try:
+                w = self.create_writer()
+                try:
+                    self.write_frames(timeline, w)
+                finally:
+                    # Close writer
+                    w.Close()
+            finally:
+                self.end_time = time.time()
+                timeline.Close()
+                timeline.ClearAllCache()
+        finally:
+            release_export_settings()
+
+        # Save the timing report (if any)
+        if self.report and self.report.frames and self.save_report:
+            self.report_path = self.report.save(self.path)
+
+        self.completed = not self.cancelled
+        log.info("Export %s after %.1f seconds: %s" % (
+            "completed" if self.completed else "cancelled", self.elapsed, self.path))
+        return self.completed
+
+    def write_frames(self, timeline, w):
+        """ Write each frame in the selected range (compositing upcoming frames in other threads,
+        while the current frame is encoded) """
+        prefetcher = None
+        if self.prefetch_frames:
+            prefetcher = FramePrefetcher(timeline, self.start_frame, self.end_frame,
+                                         self.prefetch_threads, self.prefetch_frames)
+            prefetcher.start()
+
+        progress_step = max(1, round((self.end_frame - self.start_frame) / 1000))
+        last_progress_time = 0.0
+        try:
+            for frame in range(self.start_frame, self.end_frame + 1):
+                self.current_frame = frame
+
+                # Report progress (every 0.1% of frames, or every second)
+                now = time.time()
+                if self.progress_callback and (frame % progress_step == 0 or now - last_progress_time > EXPORT_PROGRESS_INTERVAL):
+                    last_progress_time = now
+                    self.progress_callback(frame, self.start_frame, self.end_frame, now - self.start_time)
+
+                # Get the composited frame
+                if prefetcher:
+                    frame_object, composite_seconds, cache_hit = prefetcher.get_frame(frame)
+                else:
+                    cache_hit = is_frame_cached(timeline, frame) if self.report else None
+                    start_time = time.perf_counter()
+                    frame_object = timeline.GetFrame(frame)
+                    composite_seconds = time.perf_counter() - start_time
+                self.composite_time += composite_seconds
+
+                # Write the frame object to the video
+                start_time = time.perf_counter()
+                w.WriteFrame(frame_object)
+                encode_seconds = time.perf_counter() - start_time
+                self.encode_time += encode_seconds
+                if prefetcher:
+                    prefetcher.release()
+                if self.report:
+                    self.report.add_frame(frame, composite_seconds, encode_seconds, cache_hit)
+
+                # Check if we need to bail out
+                if self.cancelled:
+                    break
+        finally:
+            if prefetcher:
+                prefetcher.stop()
+                self.wait_time = prefetcher.wait_time
+            else:
+                self.wait_time = self.composite_time
+            log.info(self.get_timing_summary())
+
+    def get_timing_summary(self):
+        """ Describe the time spent compositing vs encoding frames (and which one limits the export speed) """
+        frames = max(1, self.current_frame - self.start_frame + 1)
+        bottleneck = "compositing" if self.wait_time > self.encode_time else "encoding"
+        return ("Export timing: composite %.1fs (%.1f ms/frame), encode %.1fs (%.1f ms/frame), "
+                "writer waited %.1fs for frames, limited by %s" % (
+                    self.composite_time, self.composite_time * 1000.0 / frames,
+                    self.encode_time, self.encode_time * 1000.0 / frames,
+                    self.wait_time, bottleneck))
+
+    def start(self, finished_callback=None):
+        """ Export in a worker thread. finished_callback(engine) is called from the worker thread
+        when done (check engine.completed and engine.error). """
+        def export_thread():
+            try:
+                self.run()
+            except Exception as ex:
+                log.error("Failed to export %s" % self.path, exc_info=1)
+                self.error = ex
+            if finished_callback:
+                finished_callback(self)
+
+        self.thread = threading.Thread(target=export_thread, name="export")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def cancel(self):
+        """ Stop exporting (after the current frame) """
+        self.cancelled = True
+
+    def wait(self):
+        """ Wait for the export thread to finish """
+        if self.thread:
+            self.thread.join()
+
+
+def get_ffmpeg_path():
+    """ Get the path of the ffmpeg executable (used to join files without re-encoding), or None """
+    return shutil.which("ffmpeg")
+
+
+def concat_files(paths, output_path, audio_path=None):
+    """ Join video files (with the same codec and settings) without re-encoding, using
+    the ffmpeg concat demuxer. The audio of audio_path (if any) is added to the output. """
+    list_path = "%s.txt" % os.path.splitext(paths[0])[0]
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            f.write("file '%s'\n" % path.replace("'", "'\\''"))
+
+    command = [get_ffmpeg_path(), "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        command.extend(["-i", audio_path, "-map", "0:v", "-map", "1:a"])
+    command.extend(["-c", "copy"])
+    if os.path.splitext(output_path)[1].lower() in FASTSTART_FORMATS:
+        command.extend(["-movflags", "+faststart"])
+    command.append(output_path)
+    log.info("Joining %s files: %s" % (len(paths), command))
+
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    os.remove(list_path)
+    if result.returncode != 0:
+        raise RuntimeError("Failed to join exported segments: %s" % result.stderr.decode("utf-8", "replace")[-1000:])
+
+
+def get_segments(start_frame, end_frame, count, gop_size, segment_frames=None):
+    """ Split a range of frames into (at most) count segments, each a multiple of gop_size frames
+    (or into segments of segment_frames, if set, no matter how many there are) """
+    if segment_frames:
+        segment_frames = max(1, math.ceil(segment_frames / gop_size)) * gop_size
+    else:
+        total_frames = end_frame - start_frame + 1
+        gop_count = math.ceil(total_frames / gop_size)
+        segment_frames = max(1, math.ceil(gop_count / count)) * gop_size
+    segment_frames = max(segment_frames, math.ceil(EXPORT_MIN_SEGMENT_FRAMES / gop_size) * gop_size)
+    return [(frame, min(frame + segment_frames - 1, end_frame))
+            for frame in range(start_frame, end_frame + 1, segment_frames)]
+
+
+def get_resume_segment_frames(fps):
+    """ Get the length of each segment of a resumable export. The length does not depend on the
+    number of processes, so a single process export is resumable too, and it is saved with the
+    export (so the segments are the same each time it is resumed). """
+    gop_size = max(1, round(EXPORT_SEGMENT_GOP_SECONDS * float(fps["num"]) / float(fps["den"])))
+    return gop_size * max(1, round(EXPORT_RESUME_SEGMENT_SECONDS / EXPORT_SEGMENT_GOP_SECONDS))
+
+
+def export_segment(project_data, export_settings, index, progress_queue, cancel_event):
+    """ Export one segment (runs in a worker process, with its own timeline), or copy it from
+    a source file (for smart render). Returns a dict of the result: whether the segment was
+    completed, the timing report rows of its frames (if reported), and its timing totals. """
+    if export_settings.get("copy"):
+        copy_settings = export_settings["copy"]
+        copy_segment(copy_settings["source_path"], copy_settings["source_seconds"], copy_settings["frames"],
+                     export_settings["path"])
+        progress_queue.put((index, copy_settings["frames"]))
+        return {"completed": True, "frames": [], "composite_time": 0.0, "encode_time": 0.0, "wait_time": 0.0}
+
+    def progress(frame, start_frame, end_frame, seconds_run):
+        progress_queue.put((index, frame - start_frame))
+        if cancel_event.is_set():
+            engine.cancel()
+
+    engine = ExportEngine(project_data, export_settings, progress_callback=progress)
+    engine.save_report = False
+    completed = engine.run()
+    if completed:
+        progress_queue.put((index, engine.end_frame - engine.start_frame + 1))
+    return {"completed": completed, "frames": engine.report.frames if engine.report else [],
+            "composite_time": engine.composite_time, "encode_time": engine.encode_time, "wait_time": engine.wait_time}
+
+
+class SegmentedExportEngine(ExportEngine):
+    """ Exports a range of frames in segments, in parallel worker processes (each with its
+    own timeline), and joins the segments without re-encoding. Each segment is a multiple of
+    the keyframe interval (so each starts on a keyframe), and the audio is exported in a
+    separate process (since audio codecs can't be cut at arbitrary frames without gaps).
+    Falls back to a normal export if ffmpeg isn't found, or for audio and image sequences.
+
+    Segments are kept in work_folder (if any) until the export is done, so an interrupted
+    export can be resumed: finished segments (completed_segments) are not exported again,
+    and segment_callback(index) is called as each segment is finished. Resumable exports
+    should set segment_frames (see get_resume_segment_frames), so the segments are short,
+    and the same each time the export is resumed. """
+
+    def __init__(self, project_data, export_settings, progress_callback=None, processes=None,
+                 work_folder=None, completed_segments=None, segment_callback=None, segment_frames=None):
+        super().__init__(project_data, export_settings, progress_callback)
+        self.processes = processes or os.cpu_count() or 1
+        self.work_folder = work_folder
+        self.completed_segments = set(completed_segments or [])
+        self.segment_callback = segment_callback
+        self.segment_frames = segment_frames
+
+    def can_segment(self):
+        """ Only video exports are segmented (and only if ffmpeg is found, to join the segments).
+        Single process exports are only segmented if they can be resumed (with a work folder). """
+        if (self.processes < 2 and not self.work_folder) or self.export_type not in [EXPORT_VIDEO_AUDIO, EXPORT_VIDEO]:
+            return False
+        if not get_ffmpeg_path():
+            log.warning("ffmpeg not found, exporting without segments")
+            return False
+        return True
+
+    def get_shared_settings(self):
+        """ Get the export settings of the whole export which every segment uses """
+        return {
+            "report": bool(self.report),
+            "prefetch_frames": self.prefetch_frames,
+            "prefetch_threads": self.prefetch_threads,
+        }
+
+    def get_segment_path(self, temp_folder, name):
+        """ Get the path of a segment, in the container format of the export (so the codecs of the
+        export are supported by the segments, and the segments can be joined without re-encoding) """
+        extension = os.path.splitext(self.path)[1] or ".mkv"
+        return os.path.join(temp_folder, name + extension)
+
+    def get_segment_settings(self, temp_folder):
+        """ Get the export settings of each video segment (and of the audio, if any) """
+        fps = self.video_settings.get("fps")
+        gop_size = max(1, round(EXPORT_SEGMENT_GOP_SECONDS * float(fps["num"]) / float(fps["den"])))
+
+        segment_settings = []
+        for index, (start_frame, end_frame) in enumerate(
+                get_segments(self.start_frame, self.end_frame, self.processes, gop_size, self.segment_frames)):
+            video_settings = dict(self.video_settings, start_frame=start_frame, end_frame=end_frame, gop_size=gop_size)
+            segment_settings.append(dict(self.get_shared_settings(), **{
+                "path": self.get_segment_path(temp_folder, "segment-%05d" % index),
+                "type": EXPORT_VIDEO,
+                "video": video_settings,
+                "audio": self.audio_settings,
+            }))
+
+        audio_settings = None
+        if self.has_audio:
+            audio_settings = dict(self.get_shared_settings(), **{
+                "path": self.get_segment_path(temp_folder, "audio"),
+                "type": EXPORT_AUDIO,
+                "video": self.video_settings,
+                "audio": self.audio_settings,
+                "report": False,
+            })
+        return segment_settings, audio_settings
+
+    def run(self):
+        """ Export all segments (in worker processes), and join them """
+        if not self.can_segment():
+            return super().run()
+
+        self.start_time = time.time()
+        self.end_time = None
+        if not self.end_frame:
+            # Export the entire timeline
+            timeline = self.create_timeline()
+            self.end_frame = timeline.GetMaxFrame()
+            timeline.Close()
+
+        if self.work_folder:
+            temp_folder = self.work_folder
+            os.makedirs(temp_folder, exist_ok=True)
+        else:
+            temp_folder = tempfile.mkdtemp(prefix="openshot-export-", dir=os.path.dirname(self.path) or None)
+        try:
+            segment_settings, audio_settings = self.get_segment_settings(temp_folder)
+            log.info("Exporting frames %s-%s to %s in %s segments (%s processes)" % (
+                self.start_frame, self.end_frame, self.path, len(segment_settings), self.processes))
+
+            completed = self.export_segments(segment_settings, audio_settings)
+            if completed:
+                concat_files([settings["path"] for settings in segment_settings], self.path,
+                             audio_settings["path"] if audio_settings else None)
+        finally:
+            self.end_time = time.time()
+            if not self.work_folder:
+                shutil.rmtree(temp_folder, True)
+
+        # Save the timing report of the segments (frames of segments finished by an earlier,
+        # interrupted export are not included)
+        if self.report and self.report.frames:
+            self.report_path = self.report.save(self.path)
+
+        self.completed = completed
+        log.info("Segmented export %s after %.1f seconds: %s" % (
+            "completed" if self.completed else "cancelled", self.elapsed, self.path))
+        return self.completed
+
+    def export_segments(self, segment_settings, audio_settings):
+        """ Export segments in worker processes, and report their combined progress """
+        all_settings = segment_settings + ([audio_settings] if audio_settings else [])
+        indexes, segment_frames = self.get_pending_segments(all_settings)
+        last_progress_time = 0.0
+
+        # Spawn workers (forking a process with Qt and libopenshot threads is not safe)
+        context = multiprocessing.get_context("spawn")
+        with context.Manager() as manager, \
+                ProcessPoolExecutor(max_workers=self.processes, mp_context=context) as pool:
+            progress_queue = manager.Queue()
+            cancel_event = manager.Event()
+            futures = {}
+            for index in indexes:
+                future = pool.submit(export_segment, self.project_data, all_settings[index], index,
+                                     progress_queue, cancel_event)
+                future.add_done_callback(partial(self.segment_finished, index))
+                futures[future] = index
+
+            while not all(future.done() for future in futures):
+                if self.cancelled:
+                    cancel_event.set()
+                    for future in futures:
+                        future.cancel()
+                try:
+                    index, frames = progress_queue.get(timeout=0.5)
+                    segment_frames[index] = frames
+                except Empty:
+                    pass
+
+                # Report progress of the video segments (the audio is not counted)
+                self.current_frame = self.start_frame + sum(segment_frames[:len(segment_settings)])
+                now = time.time()
+                if self.progress_callback and now - last_progress_time > EXPORT_PROGRESS_INTERVAL:
+                    last_progress_time = now
+                    self.progress_callback(min(self.current_frame, self.end_frame), self.start_frame,
+                                           self.end_frame, now - self.start_time)
+
+            # Raise the first error (if any)
+            results = [future.result() for future in futures if not future.cancelled()]
+        self.add_segment_results(results)
+
+        completed = not self.cancelled and len(results) == len(futures) and \
+            all(result["completed"] for result in results)
+        if completed:
+            self.current_frame = self.end_frame
+        log.info(self.get_timing_summary())
+        return completed
+
+    def get_pending_segments(self, all_settings):
+        """ Get the indexes of the segments to export (skipping segments finished by an earlier,
+        interrupted export), and the number of frames already finished in each segment """
+        indexes = []
+        segment_frames = [0] * len(all_settings)
+        for index, settings in enumerate(all_settings):
+            if index in self.completed_segments and os.path.exists(settings["path"]):
+                video_settings = settings["video"]
+                segment_frames[index] = video_settings["end_frame"] - video_settings["start_frame"] + 1
+            else:
+                indexes.append(index)
+        if len(indexes) < len(all_settings):
+            log.info("Resuming export, %s of %s segments are finished" % (len(all_settings) - len(indexes), len(all_settings)))
+        return indexes, segment_frames
+
+    def add_segment_results(self, results):
+        """ Combine the results of the segment processes (their timing, and the timing report rows
+        of their frames). Times are the totals of all processes (not the elapsed time). """
+        for result in results:
+            self.composite_time += result["composite_time"]
+            self.encode_time += result["encode_time"]
+            self.wait_time += result["wait_time"]
+        if self.report:
+            for result in results:
+                self.report.frames.extend(result["frames"])
+            self.report.frames.sort(key=lambda frame: frame[0])
+
+    def segment_finished(self, index, future):
+        """ Callback when a segment process is done (called from a pool thread) """
+        if not future.cancelled() and not future.exception() and future.result()["completed"]:
+            self.completed_segments.add(index)
+            if self.segment_callback:
+                self.segment_callback(index)
+
+
+class SmartRenderEngine(SegmentedExportEngine):
+    """ Exports spans of the timeline which only show a single untouched clip (no effects,
+    transitions, keyframes or other visible clips, and already in the export codec, size and
+    frame rate) by copying the compressed video from the source file, and renders the rest.
+    Copied spans start and end on keyframes of the source file, so the frames between the edges
+    of a span and its nearest keyframes are rendered. The segments (copied and rendered) are
+    joined without re-encoding, and the audio is always rendered (like segmented exports).
+
+    Joined segments must have the same codec parameters (profile, level, extradata, colors...),
+    so only sources which match each other are copied, and the rest is encoded with the same
+    profile and level. If the rendered segments still don't match the copied ones, the copied
+    segments are rendered too (i.e. a full render). """
+
+    def __init__(self, project_data, export_settings, progress_callback=None, processes=1,
+                 work_folder=None, completed_segments=None, segment_callback=None, segment_frames=None):
+        super().__init__(project_data, export_settings, progress_callback, processes, work_folder,
+                         completed_segments, segment_callback, segment_frames)
+        self.plan = None
+        self.encoder_options = {}  # Profile and level of the copied video (for rendered segments)
+
+    def can_segment(self):
+        if self.export_type not in [EXPORT_VIDEO_AUDIO, EXPORT_VIDEO]:
+            return False
+        if not get_ffmpeg_path() or not get_ffprobe_path():
+            log.warning("ffmpeg or ffprobe not found, exporting without smart render")
+            return False
+        return True
+
+    def get_plan(self):
+        """ Find the spans of frames which can be copied, and split the export into copied
+        and rendered segments. Returns None if no frames can be copied. """
+        fps = float(self.video_settings["fps"]["num"]) / float(self.video_settings["fps"]["den"])
+        vcodec = self.video_settings.get("vcodec")
+        copy_ranges = []
+        copy_parameters = None
+        for span in find_passthrough_spans(self.project_data, self.start_frame, self.end_frame, self.video_settings):
+            source_path = span["clip"]["reader"]["path"]
+            end_seconds = span["source_seconds"] + (span["end_frame"] - span["start_frame"] + 1) / fps
+            stream = probe_video(source_path, span["source_seconds"], end_seconds)
+            if not stream or stream.get("codec_name") != ENCODER_CODECS.get(vcodec, vcodec) \
+                    or stream.get("pix_fmt") != "yuv420p":
+                continue
+            # All copied video must have the same codec parameters (as the first copied span)
+            if copy_parameters and get_codec_parameters(stream) != copy_parameters:
+                log.info("Smart render: rendering %s (codec parameters differ from other copied video)" % source_path)
+                continue
+            copy_range = get_copy_range(span, stream["keyframes"], fps, SMART_RENDER_MIN_SECONDS * fps)
+            if copy_range:
+                span["source_path"] = source_path
+                copy_ranges.append(copy_range + (span,))
+                if not copy_parameters:
+                    copy_parameters = get_codec_parameters(stream)
+                    self.encoder_options = get_encoder_options(stream)
+
+        if not copy_ranges:
+            return None
+        plan = plan_segments(self.start_frame, self.end_frame, copy_ranges)
+        copied_frames = sum(end_frame - start_frame + 1 for start_frame, end_frame, span in plan if span)
+        log.info("Smart render: copying %s of %s frames (%s spans)" % (
+            copied_frames, self.end_frame - self.start_frame + 1, len(copy_ranges)))
+        return plan
+
+    def get_segment_settings(self, temp_folder):
+        """ Get the export settings of each copied and rendered segment (and of the audio, if any) """
+        segment_settings, audio_settings = super().get_segment_settings(temp_folder)
+        if not self.plan:
+            return segment_settings, audio_settings
+
+        fps = float(self.video_settings["fps"]["num"]) / float(self.video_settings["fps"]["den"])
+        gop_size = max(1, round(EXPORT_SEGMENT_GOP_SECONDS * fps))
+        segment_settings = []
+        for start_frame, end_frame, span in self.plan:
+            if span:
+                # Seek to a point just after the keyframe (so rounding never seeks to the previous keyframe)
+                ranges = [(start_frame, end_frame)]
+                copy_settings = {
+                    "source_path": span["source_path"],
+                    "source_seconds": span["source_seconds"] + (start_frame - span["start_frame"] + 0.25) / fps,
+                    "frames": end_frame - start_frame + 1,
+                }
+            else:
+                ranges = get_segments(start_frame, end_frame, self.processes, gop_size, self.segment_frames)
+                copy_settings = None
+            for range_start, range_end in ranges:
+                video_settings = dict(self.video_settings, start_frame=range_start, end_frame=range_end,
+                                      gop_size=gop_size, **self.encoder_options)
+                segment_settings.append(dict(self.get_shared_settings(), **{
+                    "path": self.get_segment_path(temp_folder, "segment-%05d" % len(segment_settings)),
+                    "type": EXPORT_VIDEO,
+                    "video": video_settings,
+                    "audio": self.audio_settings,
+                    "copy": copy_settings,
+                }))
+        return segment_settings, audio_settings
+
+    def can_join(self, segment_settings):
+        """ Check if the copied segments have the same codec parameters as the rendered segments """
+        copied = [settings["path"] for settings in segment_settings if settings.get("copy")]
+        rendered = [settings["path"] for settings in segment_settings if not settings.get("copy")]
+        if not copied or not rendered:
+            return True
+        parameters = [probe_codec_parameters(path) for path in copied + rendered[:1]]
+        if None in parameters or any(item != parameters[0] for item in parameters[1:]):
+            log.warning("Smart render: copied video can't be joined with rendered video (codec parameters "
+                        "differ: %s), rendering all frames" % parameters)
+            return False
+        return True
+
+    def export_segments(self, segment_settings, audio_settings):
+        """ Export (and copy) segments, then render the copied segments too if they can't be joined """
+        completed = super().export_segments(segment_settings, audio_settings)
+        if not completed or not self.plan or self.can_join(segment_settings):
+            return completed
+
+        # Full render (the rendered segments and the audio are finished, and are not exported again)
+        for index, settings in enumerate(segment_settings):
+            if settings.get("copy"):
+                settings["copy"] = None
+                self.completed_segments.discard(index)
+        return super().export_segments(segment_settings, audio_settings)
+
+    def run(self):
+        """ Copy and render segments (or export normally, if no frames can be copied) """
+        if self.can_segment():
+            if not self.end_frame:
+                timeline = self.create_timeline()
+                self.end_frame = timeline.GetMaxFrame()
+                timeline.Close()
+            self.plan = self.get_plan()
+        if not self.plan:
+            if SegmentedExportEngine.can_segment(self):
+                return super().run()
+            return ExportEngine.run(self)
+        return super().run()
+
+
+def get_default_export_settings(project_data, path, export_type=EXPORT_VIDEO_AUDIO):
+    """ Get export settings matching the project profile (H.264 / AAC, or PNG for image sequences) """
+    video_settings = {
+        "vformat": path.rsplit(".", 1)[-1].lower() if "." in path else "mp4",
+        "vcodec": "libx264",
+        "fps": project_data.get("fps"),
+        "width": project_data.get("width"),
+        "height": project_data.get("height"),
+        "pixel_ratio": project_data.get("pixel_ratio"),
+        "video_bitrate": 15000000,
+        "quality": None,
+        "start_frame": 1,
+        "end_frame": None,
+        "interlace": False,
+        "topfirst": False,
+    }
+    if export_type == EXPORT_IMAGE_SEQUENCE:
+        video_settings["vcodec"] = "mjpeg" if video_settings["vformat"] in ["jpg", "jpeg"] else video_settings["vformat"]
+
+    audio_settings = {
+        "acodec": "aac",
+        "sample_rate": project_data.get("sample_rate"),
+        "channels": project_data.get("channels"),
+        "channel_layout": project_data.get("channel_layout"),
+        "audio_bitrate": 192000,
+    }
+    return {"path": path, "type": export_type, "video": video_settings, "audio": audio_settings}
@@ -0,0 +1,176 @@
+"""
+ @file
+ @brief This file contains the export report (per-frame timing of an export, and its slowest frame ranges)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import csv
+import json
+import os
+import sys
+
+from classes.logger import log
+
+# Used to measure the peak memory of the process (not available on Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Number of slowest frame ranges in the summary
+REPORT_SLOWEST_RANGES = 5
+
+# Length of each frame range in the summary (in seconds)
+REPORT_RANGE_SECONDS = 1.0
+
+
+def get_peak_memory():
+    """ Get the peak memory used by this process (in bytes), or None if unknown """
+    if not resource:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ExportReport:
+    """ Per-frame timing of an export: seconds compositing and encoding each frame, whether
+    the frame came from the timeline cache, and the peak memory of the process. The report
+    is saved next to the exported file, as a CSV file (one row per frame) and a JSON file
+    (the totals, and the slowest frame ranges with the clips active in them). """
+
+    def __init__(self, project_data, export_settings, fps):
+        self.project_data = project_data
+        self.export_settings = export_settings
+        self.fps = fps
+        self.frames = []  # List of (frame number, composite seconds, encode seconds, cache hit, peak memory)
+
+    def add_frame(self, frame_number, composite_seconds, encode_seconds, cache_hit):
+        self.frames.append((frame_number, composite_seconds, encode_seconds, cache_hit, get_peak_memory()))
+
+    def get_paths(self, path):
+        """ Get the paths of the JSON and CSV reports of an exported file """
+        base_path = os.path.splitext(path)[0].replace("%", "")
+        return "%s.export-report.json" % base_path, "%s.export-report.csv" % base_path
+
+    def get_active_clips(self, start_frame, end_frame):
+        """ Get the clips (and their effects) active in a range of frames """
+        clips = []
+        for clip in self.project_data.get("clips", []):
+            clip_start = round(float(clip.get("position", 0.0)) * self.fps) + 1
+            clip_end = clip_start + round((float(clip.get("end", 0.0)) - float(clip.get("start", 0.0))) * self.fps) - 1
+            if clip_start <= end_frame and clip_end >= start_frame:
+                clips.append({
+                    "id": clip.get("id"),
+                    "title": clip.get("title") or os.path.basename(clip.get("reader", {}).get("path", "")),
+                    "layer": clip.get("layer"),
+                    "effects": [effect.get("class_name") or effect.get("type") for effect in clip.get("effects", [])],
+                })
+        for effect in self.project_data.get("effects", []):
+            effect_start = round(float(effect.get("position", 0.0)) * self.fps) + 1
+            effect_end = effect_start + round((float(effect.get("end", 0.0)) - float(effect.get("start", 0.0))) * self.fps) - 1
+            if effect_start <= end_frame and effect_end >= start_frame:
+                clips.append({"id": effect.get("id"), "title": "Transition", "layer": effect.get("layer"), "effects": []})
+        return clips
+
+    def get_slowest_ranges(self, count=REPORT_SLOWEST_RANGES):
+        """ Get the frame ranges (of REPORT_RANGE_SECONDS) with the highest average time per frame """
+        range_frames = max(1, round(REPORT_RANGE_SECONDS * self.fps))
+        ranges = []
+        for index in range(0, len(self.frames), range_frames):
+            frames = self.frames[index:index + range_frames]
+            composite_seconds = sum(frame[1] for frame in frames)
+            encode_seconds = sum(frame[2] for frame in frames)
+            ranges.append({
+                "start_frame": frames[0][0],
+                "end_frame": frames[-1][0],
+                "ms_per_frame": (composite_seconds + encode_seconds) * 1000.0 / len(frames),
+                "composite_ms_per_frame": composite_seconds * 1000.0 / len(frames),
+                "encode_ms_per_frame": encode_seconds * 1000.0 / len(frames),
+                "cache_hits": sum(1 for frame in frames if frame[3]),
+            })
+        ranges.sort(key=lambda frame_range: frame_range["ms_per_frame"], reverse=True)
+        for frame_range in ranges[:count]:
+            frame_range["clips"] = self.get_active_clips(frame_range["start_frame"], frame_range["end_frame"])
+        return ranges[:count]
+
+    def get_totals(self):
+        """ Get the total (and average) timing of all frames """
+        frame_count = max(1, len(self.frames))
+        cache_known = [frame[3] for frame in self.frames if frame[3] is not None]
+        peak_memory = [frame[4] for frame in self.frames if frame[4] is not None]
+        composite_seconds = sum(frame[1] for frame in self.frames)
+        encode_seconds = sum(frame[2] for frame in self.frames)
+        return {
+            "frames": len(self.frames),
+            "composite_seconds": composite_seconds,
+            "encode_seconds": encode_seconds,
+            "composite_ms_per_frame": composite_seconds * 1000.0 / frame_count,
+            "encode_ms_per_frame": encode_seconds * 1000.0 / frame_count,
+            "cache_hits": sum(1 for hit in cache_known if hit),
+            "cache_misses": sum(1 for hit in cache_known if not hit),
+            "peak_memory_bytes": max(peak_memory) if peak_memory else None,
+        }
+
+    def get_summary_text(self):
+        """ Describe the totals, and the slowest frame ranges (with the clips active in them) """
+        totals = self.get_totals()
+        lines = ["%(frames)d frames: composite %(composite_ms_per_frame).1f ms/frame, "
+                 "encode %(encode_ms_per_frame).1f ms/frame, cache hits %(cache_hits)d, misses %(cache_misses)d" % totals]
+        if totals["peak_memory_bytes"]:
+            lines.append("Peak memory: %.0f MB" % (totals["peak_memory_bytes"] / 1024.0 / 1024.0))
+        lines.append("")
+        lines.append("Slowest frame ranges:")
+        for frame_range in self.get_slowest_ranges():
+            lines.append("  Frames %(start_frame)d-%(end_frame)d: %(ms_per_frame).1f ms/frame "
+                         "(composite %(composite_ms_per_frame).1f, encode %(encode_ms_per_frame).1f)" % frame_range)
+            for clip in frame_range["clips"]:
+                effects = ", ".join(effect for effect in clip["effects"] if effect)
+                lines.append("    %s (layer %s)%s" % (clip["title"], clip["layer"], ": %s" % effects if effects else ""))
+        return "\n".join(lines)
+
+    def save(self, path):
+        """ Save the JSON and CSV reports next to an exported file """
+        json_path, csv_path = self.get_paths(path)
+        try:
+            with open(csv_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame", "composite_ms", "encode_ms", "cache_hit", "peak_memory_bytes"])
+                for frame_number, composite_seconds, encode_seconds, cache_hit, peak_memory in self.frames:
+                    writer.writerow([frame_number, "%.3f" % (composite_seconds * 1000.0), "%.3f" % (encode_seconds * 1000.0),
+                                     "" if cache_hit is None else int(cache_hit), "" if peak_memory is None else peak_memory])
+
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "path": path,
+                    "export_settings": self.export_settings,
+                    "totals": self.get_totals(),
+                    "slowest_ranges": self.get_slowest_ranges(),
+                    "frames_csv": os.path.basename(csv_path),
+                }, f, indent=1)
+        except OSError:
+            log.warning("Failed to save export report: %s" % json_path, exc_info=1)
+            return None
+        log.info("Saved export report: %s" % json_path)
+        return json_path
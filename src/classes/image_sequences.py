@@ -0,0 +1,110 @@
+"""
+ @file
+ @brief This file contains image sequence detection (using a single scan of each folder)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import os
+import re
+
+# File extensions of image sequences
+IMAGE_SEQUENCE_EXTENSIONS = ["png", "jpg", "jpeg", "gif", "tif", "svg"]
+
+# Numbered image file names: base name, leading zeros, number, and extension
+IMAGE_SEQUENCE_REGEX = re.compile(r"(.*[^\d])?(0*)(\d+)\.(%s)$" % "|".join(IMAGE_SEQUENCE_EXTENSIONS), re.I)
+
+# Max distance (in numbers) between a file and its neighbour in a sequence
+IMAGE_SEQUENCE_MAX_GAP = 100
+
+# Max image number checked for neighbours
+IMAGE_SEQUENCE_MAX_NUMBER = 50000
+
+
+class SequenceIndex:
+    """ Index of the numbered image files of a folder (built by a single directory scan), grouped
+    into runs by base name and extension. Each run maps the number text of its files (with any
+    leading zeros, i.e. "0042") to the file name. """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.runs = {}  # Numbered files (by base name and extension): {number text: file name}
+        self.sequences = {}  # Sorted numbers of each sequence (by base name, extension, fixlen and digits)
+        try:
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    match = IMAGE_SEQUENCE_REGEX.match(entry.name)
+                    if match:
+                        base_name, zeros, number, extension = match.groups()
+                        self.runs.setdefault((base_name or "", extension), {})[zeros + number] = entry.name
+        except OSError:
+            pass
+
+    def get_details(self, file_name):
+        """ Get the details of the image sequence of a file (or None if it is not part of a sequence) """
+        match = IMAGE_SEQUENCE_REGEX.match(file_name)
+        if not match:
+            # File name does not match an image sequence
+            return None
+
+        # Get the parts of image name
+        base_name = match.group(1) or ""
+        fixlen = match.group(2) > ""
+        number = int(match.group(3))
+        digits = len(match.group(2) + match.group(3))
+        extension = match.group(4)
+        run = self.runs.get((base_name, extension), {})
+
+        # Check for images which the file names have the different length
+        lengths = set(len(number_text) for number_text in run)
+        fixlen = fixlen or not ((digits + 1) in lengths or ((digits - 1) if digits > 1 else 3) in lengths)
+
+        def number_text(x):
+            return str(x).rjust(digits, "0") if fixlen else str(x)
+
+        # Check for previous or next image
+        for x in range(max(0, number - IMAGE_SEQUENCE_MAX_GAP), min(number + IMAGE_SEQUENCE_MAX_GAP + 1, IMAGE_SEQUENCE_MAX_NUMBER)):
+            if x != number and number_text(x) in run:
+                break  # found one!
+        else:
+            # We didn't discover an image sequence
+            return None
+
+        # Numbers of the sequence (files with the same zero padding)
+        key = (base_name, extension, fixlen, digits)
+        if key not in self.sequences:
+            self.sequences[key] = sorted(int(text) for text in run if number_text(int(text)) == text)
+        numbers = self.sequences[key]
+        return {
+            "folder_path": self.folder_path,
+            "base_name": base_name,
+            "fixlen": fixlen,
+            "digits": digits,
+            "extension": extension,
+            "first": numbers[0],
+            "last": numbers[-1],
+            "count": len(numbers),
+            "gaps": numbers[-1] - numbers[0] + 1 - len(numbers),
+            "files": [os.path.join(self.folder_path, file_name) for file_name in run.values()],  # All numbered files
+        }
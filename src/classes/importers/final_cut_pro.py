@@ -36,7 +36,8 @@ from PyQt5.QtWidgets import QFileDialog
 from classes import info
 from classes.app import get_app
 from classes.logger import log
-from classes.image_types import is_image
+from classes.media_cache import media_cache
+from classes.media_probe import get_media_type
 from classes.query import Clip, Track, File
 from windows.views.find_file import find_missing_file
 
@@ -124,16 +125,12 @@ def import_xml():
                 if not file:
                     # Get the JSON for the clip's internal reader
                     try:
-                        reader = clip_obj.Reader()
-                        file_data = json.loads(reader.Json())
-
-                        # Determine media type
-                        if file_data["has_video"] and not is_image(file_data):
-                            file_data["media_type"] = "video"
-                        elif file_data["has_video"] and is_image(file_data):
-                            file_data["media_type"] = "image"
-                        elif file_data["has_audio"] and not file_data["has_video"]:
-                            file_data["media_type"] = "audio"
+                        # Use cached metadata (if this file was probed before)
+                        file_data = media_cache.get(clip_path)
+                        if not file_data:
+                            file_data = json.loads(clip_obj.Reader().Json())
+                            file_data["media_type"] = get_media_type(file_data)
+                            media_cache.put(clip_path, file_data)
 
                         # Save new file to the project data
                         file = File()
@@ -58,6 +58,11 @@ TITLE_PATH = os.path.join(USER_PATH, "title")
 TRANSITIONS_PATH = os.path.join(USER_PATH, "transitions")
 EMOJIS_PATH = os.path.join(USER_PATH, "emojis")
 PREVIEW_CACHE_PATH = os.path.join(USER_PATH, "preview-cache")
+WAVEFORM_PATH = os.path.join(USER_PATH, "waveform")
+RENDER_QUEUE_PATH = os.path.join(USER_PATH, "render_queue")
+PROXY_PATH = os.path.join(USER_PATH, "proxies")
+MEDIA_CACHE_PATH = os.path.join(USER_PATH, "media_cache")
+THUMBNAIL_STORE_PATH = os.path.join(USER_PATH, "thumbnail_store")
 USER_PROFILES_PATH = os.path.join(USER_PATH, "profiles")
 USER_PRESETS_PATH = os.path.join(USER_PATH, "presets")
 USER_TITLES_PATH = os.path.join(USER_PATH, "title_templates")
@@ -70,7 +75,8 @@ USER_DEFAULT_PROJECT = os.path.join(USER_PATH, "default.project")
 for folder in [
     USER_PATH, BACKUP_PATH, RECOVERY_PATH, THUMBNAIL_PATH, CACHE_PATH,
     BLENDER_PATH, TITLE_PATH, TRANSITIONS_PATH, PREVIEW_CACHE_PATH,
-    USER_PROFILES_PATH, USER_PRESETS_PATH, USER_TITLES_PATH, EMOJIS_PATH ]:
+    USER_PROFILES_PATH, USER_PRESETS_PATH, USER_TITLES_PATH, EMOJIS_PATH, WAVEFORM_PATH,
+    RENDER_QUEUE_PATH, PROXY_PATH, MEDIA_CACHE_PATH, THUMBNAIL_STORE_PATH ]:
     if not os.path.exists(os.fsencode(folder)):
         os.makedirs(folder, exist_ok=True)
 
@@ -167,6 +173,9 @@ SETUP = {
     "entry_points": {
         "gui_scripts": [
             "openshot-qt = openshot_qt.launch:main"
+        ],
+        "console_scripts": [
+            "openshot-qt-export = openshot_qt.export:main"
         ]
     }
 }
@@ -31,16 +31,14 @@ import json
 
 import copy
 import os
-import re
+import threading
 
-from classes.assets import get_assets_path
 from classes.logger import log
 from classes import info
 from classes.app import get_app
-
-# Compiled path regex
-path_regex = re.compile(r'"(image|path)"\s*:\s*"(.*?)"')
-path_context = {}
+from classes.project_container import is_container, read_container, write_container
+from classes.project_file import is_damaged, repair_contents
+from classes.project_paths import PathResolver
 
 
 class JsonDataStore:
@@ -54,19 +52,9 @@ class JsonDataStore:
         self._data = {}  # Private data store, accessible through the get and set methods
         self.data_type = "json data"
 
-        # Regular expression for project files with possible corruption
-        self.version_re = re.compile(r'"openshot-qt".*"2.5.0')
-
-        # Regular expression matching likely corruption in project files
-        self.damage_re = re.compile(r'/u([0-9a-fA-F]{4})')
-
-        # Regular expression used to detect lost slashes, when repairing data
-        self.slash_repair_re = re.compile(r'(["/][.]+)(/u[0-9a-fA-F]{4})')
-
         # Connection to Qt main window, used in recovery alerts
         app = get_app()
-        if app:
-            self.app = app
+        self.app = app
 
         if app and app._tr:
             self._ = app._tr
@@ -146,49 +134,53 @@ class JsonDataStore:
             # Return merged dictionary
             return user
 
-    def read_from_file(self, file_path, path_mode="ignore"):
-        """ Load JSON settings from a file """
+    def read_from_file(self, file_path, path_mode="ignore", sections=None):
+        """ Load JSON settings from a file. Project containers only read the given sections
+        (i.e. without "history"), or all sections if None. """
+        data = None
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                contents = f.read()
-            if not contents:
-                raise RuntimeError("Couldn't load {} file, no data.".format(self.data_type))
-
-            # Scan for and correct possible OpenShot 2.5.0 corruption
-            if self.damage_re.search(contents) and self.version_re.search(contents):
-                # File contains corruptions, backup and repair
-                self.make_repair_backup(file_path, contents)
-
-                # Repair lost slashes, then fix all corrupted escapes
-                contents = self.slash_repair_re.sub(r'\1/\2', contents)
-                contents, subs_count = self.damage_re.subn(r'\\u\1', contents)
-
-                if subs_count < 1:
-                    # Nothing to do!
-                    log.info("No recovery substitutions on {}".format(file_path))
-                else:
-                    # We have to de- and re-serialize the data, to complete repairs
-                    temp_data = json.loads(contents)
-                    contents = json.dumps(temp_data, ensure_ascii=False, indent=1)
-                    temp_data = {}
-
-                    # Save the repaired data back to the original file
-                    with open(file_path, "w", encoding="utf-8") as fout:
-                        fout.write(contents)
-
-                    msg_log = "Repaired {} corruptions in file {}"
-                    msg_local = self._("Repaired {num} corruptions in file {path}")
-                    log.info(msg_log.format(subs_count, file_path))
-                    if hasattr(self.app, "window") and hasattr(self.app.window, "statusBar"):
-                        self.app.window.statusBar.showMessage(
-                            msg_local.format(num=subs_count, path=file_path), 5000
-                        )
+            if is_container(file_path):
+                # Compact project file (JSON sections in a zip archive)
+                data = read_container(file_path, sections)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    contents = f.read()
+                if not contents:
+                    raise RuntimeError("Couldn't load {} file, no data.".format(self.data_type))
+
+                # Scan for and correct possible OpenShot 2.5.0 corruption
+                if is_damaged(contents):
+                    # File contains corruptions, backup and repair
+                    self.make_repair_backup(file_path, contents)
+
+                    # Repair lost slashes, then fix all corrupted escapes
+                    contents, subs_count = repair_contents(contents)
+
+                    if subs_count < 1:
+                        # Nothing to do!
+                        log.info("No recovery substitutions on {}".format(file_path))
+                    else:
+                        # We have to de- and re-serialize the data, to complete repairs
+                        # (the parsed data is used below, instead of parsing it again)
+                        data = json.loads(contents)
+                        contents = json.dumps(data, ensure_ascii=False, indent=1)
+
+                        # Save the repaired data back to the original file
+                        with open(file_path, "w", encoding="utf-8") as fout:
+                            fout.write(contents)
+
+                        msg_log = "Repaired {} corruptions in file {}"
+                        msg_local = self._("Repaired {num} corruptions in file {path}")
+                        log.info(msg_log.format(subs_count, file_path))
+                        self.show_status_message(msg_local.format(num=subs_count, path=file_path))
 
             # Process JSON data
+            if data is None:
+                data = json.loads(contents)
             if path_mode == "absolute":
                 # Convert any paths to absolute
-                contents = self.convert_paths_to_absolute(file_path, contents)
-            return json.loads(contents)
+                data = self.convert_paths_to_absolute(file_path, data)
+            return data
         except RuntimeError as ex:
             log.error(str(ex))
             raise
@@ -200,13 +192,16 @@ class JsonDataStore:
         log.warning(msg)
         raise Exception(msg)
 
-    def write_to_file(self, file_path, data, path_mode="ignore", previous_path=None):
-        """ Save JSON settings to a file """
+    def write_to_file(self, file_path, data, path_mode="ignore", previous_path=None, compact=False):
+        """ Save JSON settings to a file (or to a compact project container) """
         try:
-            contents = json.dumps(data, ensure_ascii=False, indent=1)
             if path_mode == "relative":
                 # Convert any paths to relative
-                contents = self.convert_paths_to_relative(file_path, previous_path, contents)
+                data = self.convert_paths_to_relative(file_path, previous_path, data)
+            if compact:
+                write_container(file_path, data)
+                return
+            contents = json.dumps(data, ensure_ascii=False, indent=1)
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(contents)
         except Exception as ex:
@@ -214,125 +209,34 @@ class JsonDataStore:
             log.error(msg)
             raise Exception(msg)
 
-    def replace_string_to_absolute(self, match):
-        """Replace matched string for converting paths to relative paths"""
-        key = match.groups(0)[0]
-        path = match.groups(0)[1]
-
-        # Find absolute path of file (if needed)
-        if "@transitions" in path:
-            new_path = path.replace("@transitions", os.path.join(info.PATH, "transitions"))
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
-        elif "@emojis" in path:
-            new_path = path.replace("@emojis", os.path.join(info.PATH, "emojis", "color", "svg"))
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
-        elif "@assets" in path:
-            new_path = path.replace("@assets", path_context["new_project_assets"])
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
-        else:
-            # Convert path to the correct relative path
-            new_path = os.path.abspath(os.path.join(path_context.get("new_project_folder", ""), path))
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
     def convert_paths_to_absolute(self, file_path, data):
-        """ Convert all paths to absolute using regex """
+        """ Convert all paths of parsed data to absolute paths (in place) """
         try:
-            # Get project folder
-            path_context["new_project_folder"] = os.path.dirname(file_path)
-            path_context["existing_project_folder"] = os.path.dirname(file_path)
-            path_context["new_project_assets"] = get_assets_path(file_path, create_paths=False)
-            path_context["existing_project_assets"] = get_assets_path(file_path, create_paths=False)
-
-            # Optimized regex replacement
-            data = re.sub(path_regex, self.replace_string_to_absolute, data)
+            data = PathResolver(file_path).make_absolute(data)
 
         except Exception as ex:
             log.error("Error while converting relative paths to absolute paths: %s" % str(ex))
 
         return data
 
-    def replace_string_to_relative(self, match):
-        """Replace matched string for converting paths to relative paths"""
-        key = match.groups(0)[0]
-        path = match.groups(0)[1]
-        folder_path, file_path = os.path.split(os.path.abspath(path))
-
-        # Determine if thumbnail path is found
-        if info.THUMBNAIL_PATH in folder_path:
-            # Convert path to relative thumbnail path
-            new_path = os.path.join("thumbnail", file_path).replace("\\", "/")
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
-        # Determine if @transitions path is found
-        elif os.path.join(info.PATH, "transitions") in folder_path:
-            # Yes, this is an OpenShot transition
-            folder_path, category_path = os.path.split(folder_path)
-
-            # Convert path to @transitions/ path
-            new_path = os.path.join("@transitions", category_path, file_path).replace("\\", "/")
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
-        # Determine if @emojis path is found
-        elif os.path.join(info.PATH, "emojis") in folder_path:
-            # Yes, this is an OpenShot emoji
-            # Convert path to @emojis/ path
-            new_path = os.path.join("@emojis", file_path).replace("\\", "/")
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
-        # Determine if @assets path is found
-        elif path_context["new_project_assets"] in folder_path:
-            # Yes, this is an OpenShot transitions
-            folder_path = folder_path.replace(path_context["new_project_assets"], "@assets")
-
-            # Convert path to @assets/ path
-            new_path = os.path.join(folder_path, file_path).replace("\\", "/")
-            new_path = json.dumps(new_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_path)
-
-        # Find absolute path of file (if needed)
-        else:
-            # Convert path to the correct relative path (based on the existing folder)
-            orig_abs_path = os.path.abspath(path)
-
-            # Remove file from abs path
-            orig_abs_folder = os.path.dirname(orig_abs_path)
-
-            # Calculate new relateive path
-            new_rel_path_folder = os.path.relpath(orig_abs_folder, path_context.get("new_project_folder", ""))
-            new_rel_path = os.path.join(new_rel_path_folder, file_path).replace("\\", "/")
-            new_rel_path = json.dumps(new_rel_path, ensure_ascii=False)
-            return '"%s": %s' % (key, new_rel_path)
-
     def convert_paths_to_relative(self, file_path, previous_path, data):
-        """ Convert all paths relative to this filepath """
+        """ Get a copy of parsed data, with all paths relative to this filepath """
         try:
-            # Get project folder
-            path_context["new_project_folder"] = os.path.dirname(file_path)
-            path_context["new_project_assets"] = get_assets_path(file_path, create_paths=False)
-            path_context["existing_project_folder"] = os.path.dirname(file_path)
-            path_context["existing_project_assets"] = get_assets_path(file_path, create_paths=False)
-            if previous_path and file_path != previous_path:
-                path_context["existing_project_folder"] = os.path.dirname(previous_path)
-                path_context["existing_project_assets"] = get_assets_path(previous_path, create_paths=False)
-
-            # Optimized regex replacement
-            data = re.sub(path_regex, self.replace_string_to_relative, data)
+            data = PathResolver(file_path).make_relative(data)
 
         except Exception as ex:
             log.error("Error while converting absolute paths to relative paths: %s" % str(ex))
 
         return data
 
+    def show_status_message(self, message):
+        """ Show a message in the status bar of the main window (if any) """
+        # Projects can be read on a background thread (which can't use widgets)
+        if threading.current_thread() is not threading.main_thread():
+            return
+        if hasattr(self.app, "window") and hasattr(self.app.window, "statusBar"):
+            self.app.window.statusBar.showMessage(message, 5000)
+
     def make_repair_backup(self, file_path, jsondata, backup_dir=None):
         """ Make a backup copy of an OSP file before performing recovery """
 
@@ -357,10 +261,7 @@ class JsonDataStore:
             with open(backup_file, "w") as fout:
                 fout.write(jsondata)
 
-            if hasattr(self.app, "window") and hasattr(self.app.window, "statusBar"):
-                self.app.window.statusBar.showMessage(
-                    self._("Saved backup file {}").format(backup_file), 5000
-                )
+            self.show_status_message(self._("Saved backup file {}").format(backup_file))
             log.info("Backed up {} as {}".format(file_path, backup_file))
         except (PermissionError, FileExistsError) as ex:
             # Couldn't write to backup file! Try alternate location
@@ -0,0 +1,98 @@
+"""
+ @file
+ @brief This file contains a persistent cache of media metadata (so files are not probed again on every import)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import hashlib
+import json
+import os
+import threading
+
+from classes import info
+from classes.logger import log
+
+# Bytes read from the start and the end of a file for its partial hash
+MEDIA_HASH_BYTES = 64 * 1024
+
+# Project specific attributes of file records (which are not cached)
+PROJECT_ATTRIBUTES = ["id", "name", "tags", "proxy"]
+
+
+def get_signature(file_path, partial_hash=False):
+    """ Get the signature of a media file: its path, size and modification time, or (with
+    partial_hash) its size and a hash of its first and last bytes, so copies of the same
+    file (i.e. footage on a shared drive, mounted at different paths) have the same signature. """
+    stat = os.stat(file_path)
+    if not partial_hash:
+        return "%s|%s|%s" % (file_path, stat.st_size, stat.st_mtime_ns)
+
+    content_hash = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        content_hash.update(f.read(MEDIA_HASH_BYTES))
+        if stat.st_size > MEDIA_HASH_BYTES * 2:
+            f.seek(-MEDIA_HASH_BYTES, os.SEEK_END)
+        content_hash.update(f.read(MEDIA_HASH_BYTES))
+    return "%s|%s" % (stat.st_size, content_hash.hexdigest())
+
+
+class MediaCache:
+    """ Metadata (reader JSON and media type) of probed media files, saved in the user folder
+    (one small JSON file per signature), and shared by all projects. Entries are never stale:
+    a changed file has a new signature (and is probed again). """
+
+    def __init__(self, folder=info.MEDIA_CACHE_PATH, partial_hash=False):
+        self.folder = folder
+        self.partial_hash = partial_hash
+
+    def get_cache_path(self, file_path):
+        signature = get_signature(file_path, self.partial_hash)
+        return os.path.join(self.folder, "%s.json" % hashlib.sha1(signature.encode("utf-8")).hexdigest())
+
+    def get(self, file_path):
+        """ Get the cached file data of a media file (or None) """
+        try:
+            with open(self.get_cache_path(file_path), encoding="utf-8") as f:
+                file_data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        file_data["path"] = file_path
+        return file_data
+
+    def put(self, file_path, file_data):
+        """ Save the file data of a probed media file """
+        file_data = {key: value for key, value in file_data.items() if key not in PROJECT_ATTRIBUTES}
+        try:
+            cache_path = self.get_cache_path(file_path)
+            temp_path = "%s.%s-%s.tmp" % (cache_path, os.getpid(), threading.get_ident())
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(file_data, f)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            log.warning("Failed to save media metadata of %s" % file_path, exc_info=1)
+
+
+# Metadata of media files (shared by all projects)
+media_cache = MediaCache()
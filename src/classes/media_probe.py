@@ -0,0 +1,67 @@
+"""
+ @file
+ @brief This file contains media probing for imports (which runs in worker processes, without the UI)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import json
+
+import openshot  # Python module for libopenshot (required video editing module installed separately)
+
+from classes.image_types import is_image
+
+
+def get_media_type(file_data):
+    """ Determine the media type of a file (video, image, or audio) from its reader data """
+    if file_data["has_video"] and not is_image(file_data):
+        return "video"
+    elif file_data["has_video"] and is_image(file_data):
+        return "image"
+    elif file_data["has_audio"] and not file_data["has_video"]:
+        return "audio"
+    else:
+        # If none set, just assume video
+        return "video"
+
+
+def probe_media(file_path, sequence_path=None):
+    """ Open a media file (libopenshot tries multiple readers), and get its file data for the
+    project. For image sequences, sequence_path is the path pattern of the sequence (i.e.
+    image%04d.png), which is opened to find the duration of the sequence. """
+    # Get the JSON for the clip's internal reader
+    clip = openshot.Clip(file_path)
+    file_data = json.loads(clip.Reader().Json())
+    file_data["media_type"] = get_media_type(file_data)
+    clip.Close()
+
+    if sequence_path:
+        # Load image sequence (to determine duration and video_length)
+        image_seq = openshot.Clip(sequence_path)
+        file_data["path"] = sequence_path
+        file_data["media_type"] = "video"
+        file_data["duration"] = image_seq.Reader().info.duration
+        file_data["video_length"] = image_seq.Reader().info.video_length
+        image_seq.Close()
+    return file_data
@@ -0,0 +1,86 @@
+"""
+ @file
+ @brief This file contains code to read and write compact project files (a zip archive of JSON sections)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import io
+import json
+import zipfile
+
+# Project data saved as separate members (so readers can skip sections they don't need)
+CONTAINER_SECTIONS = ("clips", "effects", "files", "history")
+
+# First member of a container, which identifies the format
+FORMAT_MEMBER = "format"
+CONTAINER_FORMAT = "openshot-project/1"
+
+# Member with all other project data
+PROJECT_MEMBER = "project.json"
+
+
+def is_container(file_path):
+    """ Check if a project file is a container (instead of a JSON file) """
+    try:
+        with open(file_path, "rb") as f:
+            return f.read(4) == b"PK\x03\x04"
+    except OSError:
+        return False
+
+
+def pack_container(texts):
+    """ Get the contents of a container, from the JSON text of each project key """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(FORMAT_MEMBER, CONTAINER_FORMAT, compress_type=zipfile.ZIP_STORED)
+        archive.writestr(PROJECT_MEMBER, "{%s}" % ", ".join(
+            "%s: %s" % (json.dumps(key, ensure_ascii=False), text)
+            for key, text in texts.items() if key not in CONTAINER_SECTIONS))
+        for key in CONTAINER_SECTIONS:
+            if key in texts:
+                archive.writestr("%s.json" % key, texts[key])
+    return buffer.getvalue()
+
+
+def write_container(file_path, data):
+    """ Write project data to a container """
+    contents = pack_container({key: json.dumps(value, ensure_ascii=False) for key, value in data.items()})
+    with open(file_path, "wb") as f:
+        f.write(contents)
+
+
+def read_container(file_path, sections=None):
+    """ Read project data from a container. Only the given sections (of CONTAINER_SECTIONS)
+    are read, or all of them if sections is None. """
+    with zipfile.ZipFile(file_path) as archive:
+        names = archive.namelist()
+        if FORMAT_MEMBER not in names or archive.read(FORMAT_MEMBER).decode("utf-8") != CONTAINER_FORMAT:
+            raise ValueError("%s is not an OpenShot project container" % file_path)
+        data = json.loads(archive.read(PROJECT_MEMBER).decode("utf-8"))
+        for key in CONTAINER_SECTIONS:
+            member = "%s.json" % key
+            if member in names and (sections is None or key in sections):
+                data[key] = json.loads(archive.read(member).decode("utf-8"))
+    return data
@@ -32,19 +32,199 @@ import glob
 import os
 import random
 import shutil
+from bisect import bisect_left, bisect_right
 
 from classes import info, settings
+from classes.autosave import ProjectSnapshot
 from classes.image_types import is_image
 from classes.json_data import JsonDataStore
 from classes.logger import log
+from classes.project_file import rescale_keyframes, scale_keyframe_value
+from classes.project_paths import PathResolver
 from classes.updates import UpdateInterface
 from classes.assets import get_assets_path
 from windows.views.find_file import find_missing_file
 
 
+def find_missing_paths(project_data):
+    """ Find the files and clips whose paths are missing. This only checks the file system (no
+    prompts), so it can run on a background thread. Returns a list of (key, path) tuples. """
+    exists = {}
+    missing_paths = []
+    for object_key, path_key in [("files", ["path"]), ("clips", ["reader", "path"])]:
+        # Loop through each object (in reverse order)
+        for item in reversed(project_data.get(object_key) or []):
+            path = item
+            for part in path_key:
+                path = path.get(part) or {}
+            if not path or "%" in path:
+                continue
+            if path not in exists:
+                exists[path] = os.path.exists(path)
+            if not exists[path]:
+                missing_paths.append(([object_key, {"id": item["id"]}], path))
+    return missing_paths
+
+
+class ItemIndex:
+    """ Maintain an id -> list index lookup for each list of project data objects (clips, effects, files, etc...)
+    Each entry is verified on use, so a list modified outside of _set() is simply re-indexed. Entries of lists
+    which are removed or replaced by _set() are discarded (so they don't keep old lists alive). """
+
+    def __init__(self):
+        self.lists = {}  # id(list) -> [list, {item id: list index}, list length]
+
+    def clear(self):
+        """ Forget all indexed lists """
+        self.lists.clear()
+
+    def build(self, items):
+        """ Index all items in a list (by their 'id' attribute) """
+        ids = {}
+        for item_index, item in enumerate(items):
+            if isinstance(item, dict) and "id" in item:
+                # Keep the first match (same as a linear search)
+                ids.setdefault(item["id"], item_index)
+        self.lists[id(items)] = [items, ids, len(items)]
+        return ids
+
+    def find(self, items, item_id):
+        """ Find the list index of the item with a matching id (or None) """
+        entry = self.lists.get(id(items))
+        if entry and entry[0] is items and entry[2] == len(items):
+            item_index = entry[1].get(item_id)
+            if item_index is None:
+                # List is unchanged, so this id is not in it
+                return None
+            item = items[item_index]
+            if isinstance(item, dict) and item.get("id") == item_id:
+                return item_index
+
+        # Index is missing or stale, rebuild it
+        return self.build(items).get(item_id)
+
+    def appended(self, items):
+        """ Update index after an item is appended to a list """
+        entry = self.lists.get(id(items))
+        if not entry or entry[0] is not items:
+            return
+        item = items[-1]
+        if entry[2] == len(items) - 1 and isinstance(item, dict) and "id" in item:
+            entry[1].setdefault(item["id"], len(items) - 1)
+            entry[2] = len(items)
+        else:
+            # Non-indexable item, rebuild on next lookup
+            self.discard(items)
+
+    def discard(self, items):
+        """ Forget the index of a list (i.e. after its item positions have shifted) """
+        if isinstance(items, list):
+            self.lists.pop(id(items), None)
+
+    def discard_tree(self, obj):
+        """ Forget the indexes of a removed or replaced object, and of all lists nested inside it """
+        objects = [obj]
+        while objects:
+            obj = objects.pop()
+            if isinstance(obj, list):
+                self.lists.pop(id(obj), None)
+                objects.extend(value for value in obj if isinstance(value, (dict, list)))
+            elif isinstance(obj, dict) and "Points" not in obj:
+                # Keyframes have no indexed lists
+                objects.extend(value for value in obj.values() if isinstance(value, (dict, list)))
+
+
+class QueryIndex:
+    """ Cache secondary indexes for project data lists (by attribute value, and by timeline position).
+    Indexes are built on first use, and discarded each time the list changes. """
+
+    def __init__(self):
+        self.lists = {}  # id(list) -> {"items": list, "length": int, "values": {}, "intervals": None}
+
+    def clear(self):
+        """ Forget all indexed lists """
+        self.lists.clear()
+
+    def discard(self, items):
+        """ Forget the indexes of a list """
+        if isinstance(items, list):
+            self.lists.pop(id(items), None)
+
+    def get_entry(self, items):
+        """ Get (or create) the index entry of a list """
+        entry = self.lists.get(id(items))
+        if not entry or entry["items"] is not items or entry["length"] != len(items):
+            entry = {"items": items, "length": len(items), "values": {}, "intervals": None}
+            self.lists[id(items)] = entry
+        return entry
+
+    def lookup(self, items, attribute, value):
+        """ Get the list indexes of items which could match attribute == value (or None, if not indexable).
+        Items missing the attribute are included, since they also match a filter. """
+        entry = self.get_entry(items)
+        if attribute not in entry["values"]:
+            values = {}
+            missing = []
+            try:
+                for item_index, item in enumerate(items):
+                    if not item:
+                        continue
+                    if attribute in item:
+                        values.setdefault(item[attribute], []).append(item_index)
+                    else:
+                        missing.append(item_index)
+            except TypeError:
+                # Unhashable attribute value, this attribute can't be indexed
+                entry["values"][attribute] = None
+            else:
+                entry["values"][attribute] = (values, missing)
+
+        if entry["values"][attribute] is None:
+            return None
+        values, missing = entry["values"][attribute]
+        try:
+            matches = values.get(value, [])
+        except TypeError:
+            return None
+        if missing:
+            return sorted(matches + missing)
+        return matches
+
+    def intersect(self, items, position):
+        """ Get the list indexes of items whose time range (position to position + duration) contains a position """
+        entry = self.get_entry(items)
+        intervals = entry["intervals"]
+        if intervals is None:
+            # Sort items by starting position, and track the longest item
+            starts = []
+            max_duration = 0.0
+            for item_index, item in enumerate(items):
+                if not item:
+                    continue
+                item_position = item.get("position", 0)
+                duration = item.get("end", 0) - item.get("start", 0)
+                max_duration = max(max_duration, duration)
+                starts.append((item_position, item_index, item_position + duration))
+            starts.sort()
+            intervals = entry["intervals"] = ([start[0] for start in starts], starts, max_duration)
+
+        positions, starts, max_duration = intervals
+
+        # Only items starting within max_duration before this position can overlap it
+        first = bisect_left(positions, position - max_duration)
+        last = bisect_right(positions, position)
+        return sorted(start[1] for start in starts[first:last] if start[2] >= position)
+
+
 class ProjectDataStore(JsonDataStore, UpdateInterface):
     """ This class allows advanced searching of data structure, implements changes interface """
 
+    # Attributes with secondary indexes (used by query filters)
+    query_attributes = ["layer", "file_id", "parentObjectId"]
+
+    # Apply changes right away inside transactions (so queries see earlier changes)
+    immediate_updates = True
+
     def __init__(self):
         JsonDataStore.__init__(self)
         self.data_type = "project data"  # Used in error messages
@@ -56,6 +236,12 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
         # Track changes after save
         self.has_unsaved_changes = False
 
+        # Index of list items (by id), used to quickly find objects by key
+        self.item_index = ItemIndex()
+
+        # Secondary indexes of list items (by attribute or position), used by queries
+        self.query_index = QueryIndex()
+
         # Load default project data on creation
         self.new()
 
@@ -88,29 +274,12 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
             # If key_part is a dictionary and obj is a list or dict, each key is tested as a property of the items in the current object
             # in the project data structure, and the first match is returned.
             if isinstance(key_part, dict) and isinstance(obj, list):
-                # Overall status of finding a matching sub-object
-                found = False
-                # Loop through each item in object to find match
-                for item_index in range(len(obj)):
-                    item = obj[item_index]
-                    # True until something disqualifies this as a match
-                    match = True
-                    # Check each key in key_part dictionary and if not found to be equal as a property in item, move on to next item in list
-                    for subkey in key_part.keys():
-                        # Get each key in dictionary (i.e. "id", "layer", etc...)
-                        subkey = subkey.lower()
-                        # If object is missing the key or the values differ, then it doesn't match.
-                        if not (subkey in item and item[subkey] == key_part[subkey]):
-                            match = False
-                            break
-                    # If matched, set key_part to index of list or dict and stop loop
-                    if match:
-                        found = True
-                        obj = item
-                        break
+                # Find matching item (using the id index when possible)
+                item_index = self.find_item_index(obj, key_part)
                 # No match found, return None
-                if not found:
+                if item_index is None:
                     return None
+                obj = obj[item_index]
 
             # If key_part is a string, homogenize to lower case for comparisons
             if isinstance(key_part, str):
@@ -136,6 +305,58 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
         # After processing each key, we've found object, return it
         return obj
 
+    def find_item_index(self, items, key_part):
+        """Find the list index of the first item matching all attributes in key_part (i.e. {"id": "ADB34"})"""
+
+        # Use the id index for the common {"id": ...} key part
+        if len(key_part) == 1:
+            subkey, value = next(iter(key_part.items()))
+            if subkey.lower() == "id":
+                return self.item_index.find(items, value)
+
+        # Loop through each item in object to find match
+        for item_index, item in enumerate(items):
+            # True until something disqualifies this as a match
+            match = True
+            # Check each key in key_part dictionary and if not found to be equal as a property in item, move on to next item in list
+            for subkey in key_part.keys():
+                # Get each key in dictionary (i.e. "id", "layer", etc...)
+                subkey = subkey.lower()
+                # If object is missing the key or the values differ, then it doesn't match.
+                if not (subkey in item and item[subkey] == key_part[subkey]):
+                    match = False
+                    break
+            if match:
+                return item_index
+
+        # No match found
+        return None
+
+    def find_candidates(self, items, filters):
+        """Get the items of a list which could match all filters (using indexes when possible).
+        Each candidate must still be compared to the filters, since indexes only narrow the search."""
+        candidates = None
+
+        # Lookup by id
+        if "id" in filters:
+            item_index = self.item_index.find(items, filters["id"])
+            candidates = [] if item_index is None else [item_index]
+
+        # Lookup by timeline position
+        if candidates is None and "intersect" in filters:
+            candidates = self.query_index.intersect(items, filters["intersect"])
+
+        # Lookup by indexed attributes (and use the smallest list of matches)
+        for attribute in self.query_attributes:
+            if attribute in filters:
+                matches = self.query_index.lookup(items, attribute, filters[attribute])
+                if matches is not None and (candidates is None or len(matches) < len(candidates)):
+                    candidates = matches
+
+        if candidates is None:
+            return items
+        return [items[item_index] for item_index in candidates]
+
     def set(self, key, value):
         """Prevent calling JsonDataStore set() method. It is not allowed in ProjectDataStore, as changes come from UpdateManager."""
         raise RuntimeError("ProjectDataStore.set() is not allowed. Changes must route through UpdateManager.")
@@ -170,31 +391,13 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
             # If key_part is a dictionary and obj is a list or dict, each key is tested as a property of the items in the current object
             # in the project data structure, and the first match is returned.
             if isinstance(key_part, dict) and isinstance(obj, list):
-                # Overall status of finding a matching sub-object
-                found = False
-                # Loop through each item in object to find match
-                for item_index in range(len(obj)):
-                    item = obj[item_index]
-                    # True until something disqualifies this as a match
-                    match = True
-                    # Check each key in key_part dictionary and if not found to be equal as a property in item, move on to next item in list
-                    for subkey in key_part.keys():
-                        # Get each key in dictionary (i.e. "id", "layer", etc...)
-                        subkey = subkey.lower()
-                        # If object is missing the key or the values differ, then it doesn't match.
-                        if not (subkey in item and item[subkey] == key_part[subkey]):
-                            match = False
-                            break
-                    # If matched, set key_part to index of list or dict and stop loop
-                    if match:
-                        found = True
-                        obj = item
-                        my_key = item_index
-                        break
+                # Find matching item (using the id index when possible)
+                item_index = self.find_item_index(obj, key_part)
                 # No match found, return None
-                if not found:
+                if item_index is None:
                     return None
-
+                obj = obj[item_index]
+                my_key = item_index
 
             # If key_part is a string, homogenize to lower case for comparisons
             if isinstance(key_part, str):
@@ -220,27 +423,49 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
 
 
         # After processing each key, we've found object and parent, return former value/s on update
-        ret = copy.deepcopy(obj)
+        # (only the values needed to reverse this change are copied)
+        if remove:
+            # Removed object is no longer part of the project data (no copy needed)
+            ret = obj
+        elif add and isinstance(parent, list):
+            # Inserts are reversed by id (no previous value needed)
+            ret = None
+        elif isinstance(values, dict) and isinstance(obj, dict):
+            # Only keys being updated can change
+            ret = {k: copy.deepcopy(obj[k]) for k in values if k in obj}
+        else:
+            ret = copy.deepcopy(obj)
 
         # Apply the correct action to the found item
         if remove:
             del parent[my_key]
 
+            # Item positions have shifted, re-index on next lookup
+            self.item_index.discard(parent)
+            self.item_index.discard_tree(obj)
+
         else:
 
             # Add or Full Update
             # For adds to list perform an insert to index or the end if not specified
             if add and isinstance(parent, list):
                 parent.append(values)
+                self.item_index.appended(parent)
 
             # Otherwise, set the given index
             elif isinstance(values, dict):
+                # Forget the indexes of any lists being replaced
+                for k, value in values.items():
+                    if isinstance(obj, dict) and obj.get(k) is not value:
+                        self.item_index.discard_tree(obj.get(k))
+
                 # Update existing dictionary value
                 obj.update(values)
 
             else:
 
                 # Update root string
+                self.item_index.discard_tree(obj)
                 self._data[my_key] = values
 
         # Return the previous value to the matching item (used for history tracking)
@@ -267,6 +492,8 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
 
         self.current_filepath = None
         self.has_unsaved_changes = False
+        self.item_index.clear()
+        self.query_index.clear()
 
         # Reset info paths
         info.THUMBNAIL_PATH = os.path.join(info.USER_PATH, "thumbnail")
@@ -331,8 +558,19 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
         # Set default project ID
         self._data["id"] = self.generate_id()
 
-    def load(self, file_path, clear_thumbnails=True):
-        """ Load project from file """
+    def read_project(self, file_path):
+        """ Read and parse a v2.X project file, without changing the current project. This is the
+        slow part of opening a large project, so it can run on a background thread. """
+        project_data = self.read_from_file(file_path, path_mode="absolute")
+
+        # Fix history (if broken)
+        if not project_data.get("history"):
+            project_data["history"] = {"undo": [], "redo": []}
+        return project_data
+
+    def load(self, file_path, clear_thumbnails=True, project_data=None, check_paths=True):
+        """ Load project from file (or from project data already read by read_project()). Without
+        check_paths, missing files are left for a later call to check_if_paths_are_valid(). """
 
         self.new()
 
@@ -342,25 +580,24 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
             # Default project data
             default_project = self._data
 
-            try:
-                # Attempt to load v2.X project file
-                project_data = self.read_from_file(file_path, path_mode="absolute")
-
-                # Fix history (if broken)
-                if not project_data.get("history"):
-                    project_data["history"] = {"undo": [], "redo": []}
-
-            except Exception:
+            if project_data is None:
                 try:
-                    # Attempt to load legacy project file (v1.X version)
-                    project_data = self.read_legacy_project_file(file_path)
+                    # Attempt to load v2.X project file
+                    project_data = self.read_project(file_path)
 
                 except Exception:
-                    # Project file not recognized as v1.X or v2.X, bubble up error
-                    raise
+                    try:
+                        # Attempt to load legacy project file (v1.X version)
+                        project_data = self.read_legacy_project_file(file_path)
+
+                    except Exception:
+                        # Project file not recognized as v1.X or v2.X, bubble up error
+                        raise
 
             # Merge default and project settings, excluding settings not in default.
             self._data = self.merge_settings(default_project, project_data)
+            self.item_index.clear()
+            self.query_index.clear()
 
             # On success, save current filepath
             self.current_filepath = file_path
@@ -375,7 +612,8 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
             self.has_unsaved_changes = False
 
             # Check if paths are all valid
-            self.check_if_paths_are_valid()
+            if check_paths:
+                self.check_if_paths_are_valid()
 
             # Clear old thumbnails
             openshot_thumbnails = os.path.join(info.USER_PATH, "thumbnails")
@@ -396,63 +634,12 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
 
     def scale_keyframe_value(self, original_value, scale_factor):
         """Scale keyframe X coordinate by some factor, except for 1 (leave that alone)"""
-        if original_value == 1.0:
-            # This represents the first frame of a clip (so we want to maintain that)
-            return original_value
-        else:
-            # Round to nearest INT
-            return round(original_value * scale_factor)
+        return scale_keyframe_value(original_value, scale_factor)
 
     def rescale_keyframes(self, scale_factor):
         """Adjust all keyframe coordinates from previous FPS to new FPS (using a scale factor)
            and return scaled project data without modifing the current project."""
-        log.info('Scale all keyframes by a factor of %s' % scale_factor)
-
-        # Create copy of active project data
-        data = copy.deepcopy(self._data)
-
-        # Rescale the the copied project data
-        # Loop through all clips (and look for Keyframe objects)
-        # Scale the X coordinate by factor (which represents the frame #)
-        for clip in data.get('clips', []):
-            for attribute in clip:
-                if type(clip.get(attribute)) == dict and "Points" in clip.get(attribute):
-                    for point in clip.get(attribute).get("Points"):
-                        if "co" in point:
-                            point["co"]["X"] = self.scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
-                if type(clip.get(attribute)) == dict and "red" in clip.get(attribute):
-                    for color in clip.get(attribute):
-                        for point in clip.get(attribute).get(color).get("Points"):
-                            if "co" in point:
-                                point["co"]["X"] = self.scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
-            for effect in clip.get("effects", []):
-                for attribute in effect:
-                    if type(effect.get(attribute)) == dict and "Points" in effect.get(attribute):
-                        for point in effect.get(attribute).get("Points"):
-                            if "co" in point:
-                                point["co"]["X"] = self.scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
-                    if type(effect.get(attribute)) == dict and "red" in effect.get(attribute):
-                        for color in effect.get(attribute):
-                            for point in effect.get(attribute).get(color).get("Points"):
-                                if "co" in point:
-                                    point["co"]["X"] = self.scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
-
-        # Loop through all effects/transitions (and look for Keyframe objects)
-        # Scale the X coordinate by factor (which represents the frame #)
-        for effect in data.get('effects', []):
-            for attribute in effect:
-                if type(effect.get(attribute)) == dict and "Points" in effect.get(attribute):
-                    for point in effect.get(attribute).get("Points"):
-                        if "co" in point:
-                            point["co"]["X"] = self.scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
-                if type(effect.get(attribute)) == dict and "red" in effect.get(attribute):
-                    for color in effect.get(attribute):
-                        for point in effect.get(attribute).get(color).get("Points"):
-                            if "co" in point:
-                                point["co"]["X"] = self.scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
-
-        # return the copied and scaled project data
-        return data
+        return rescale_keyframes(self._data, scale_factor)
 
     def read_legacy_project_file(self, file_path):
         """Attempt to read a legacy version 1.x openshot project file"""
@@ -766,6 +953,23 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
         if self._data.get("id") == "T0":
             self._data["id"] = self.generate_id()
 
+    def snapshot(self, file_path):
+        """ Get a serialized copy of the project (with paths relative to file_path), which can be
+        written on a background thread while the project keeps changing """
+        import openshot
+
+        # Append version info
+        self._data["version"] = {"openshot-qt": info.VERSION,
+                                 "libopenshot": openshot.OPENSHOT_VERSION_FULL}
+
+        snapshot = ProjectSnapshot.from_data(self._data, PathResolver(file_path))
+        snapshot.compact = self.use_compact_format()
+        return snapshot
+
+    def use_compact_format(self):
+        """ Check if projects are saved as compact containers (instead of JSON files) """
+        return bool(settings.get_settings().get("project-compact"))
+
     def save(self, file_path, move_temp_files=True, make_paths_relative=True):
         """ Save project file to disk """
         import openshot
@@ -781,7 +985,8 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
                                  "libopenshot": openshot.OPENSHOT_VERSION_FULL}
 
         # Try to save project settings file, will raise error on failure
-        self.write_to_file(file_path, self._data, path_mode="relative", previous_path=self.current_filepath)
+        self.write_to_file(file_path, self._data, path_mode="relative", previous_path=self.current_filepath,
+                           compact=self.use_compact_format())
 
         # On success, save current filepath
         self.current_filepath = file_path
@@ -922,59 +1127,72 @@ class ProjectDataStore(JsonDataStore, UpdateInterface):
         s.save()
 
     def check_if_paths_are_valid(self):
-        """Check if all paths are valid, and prompt to update them if needed"""
-        # Get import path or project folder
-        starting_folder = None
-        if self._data["import_path"]:
-            starting_folder = os.path.join(self._data["import_path"])
-        elif self.current_filepath:
-            starting_folder = os.path.dirname(self.current_filepath)
-
-        # Get translation method
+        """Check if all paths are valid, and prompt to update them if needed (before the project
+        data is loaded by the UpdateManager). Returns True if any paths were updated (or files removed)."""
         from classes.app import get_app
-        _ = get_app()._tr
 
         log.info("checking project files...")
-
-        # Loop through each files (in reverse order)
-        for file in reversed(self._data["files"]):
-            path = file["path"]
-            parent_path, file_name_with_ext = os.path.split(path)
-
-            log.info("checking file %s" % path)
-            if not os.path.exists(path) and "%" not in path:
-                # File is missing
-                path, is_modified, is_skipped = find_missing_file(path)
-                if path and is_modified and not is_skipped:
-                    # Found file, update path
-                    file["path"] = path
-                    get_app().updates.update_untracked(["import_path"], os.path.dirname(path))
-                    log.info("Auto-updated missing file: %s" % path)
-                elif is_skipped:
-                    # Remove missing file
-                    log.info('Removed missing file: %s' % file_name_with_ext)
-                    self._data["files"].remove(file)
-
-        # Loop through each clip (in reverse order)
-        for clip in reversed(self._data["clips"]):
-            path = clip["reader"]["path"]
-
-            if not os.path.exists(path) and "%" not in path:
-                # File is missing
-                path, is_modified, is_skipped = find_missing_file(path)
-                file_name_with_ext = os.path.basename(path)
-
-                if path and is_modified and not is_skipped:
-                    # Found file, update path
-                    clip["reader"]["path"] = path
-                    log.info("Auto-updated missing file: %s" % clip["reader"]["path"])
-                elif is_skipped:
-                    # Remove missing file
-                    log.info('Removed missing clip: %s' % file_name_with_ext)
-                    self._data["clips"].remove(clip)
+        is_changed = False
+        for key, path, new_path in self.find_missing_files(find_missing_paths(self._data)):
+            object_key = key[0]
+            item = self.get(key)
+            if new_path:
+                # Found file, update path
+                if object_key == "files":
+                    item["path"] = new_path
+                    get_app().updates.update_untracked(["import_path"], os.path.dirname(new_path))
+                else:
+                    item["reader"]["path"] = new_path
+            else:
+                # Remove missing file
+                self._data[object_key].remove(item)
+            is_changed = True
+        return is_changed
+
+    def update_missing_paths(self, missing_paths):
+        """Prompt to update the missing paths found by find_missing_paths() (i.e. on a background thread),
+        after the project data is loaded. Only the changed files and clips are updated."""
+        from classes.app import get_app
+        updates = get_app().updates
+
+        for key, path, new_path in self.find_missing_files(missing_paths):
+            object_key = key[0]
+            if not self.get(key):
+                # Removed since the paths were checked
+                continue
+            if new_path and object_key == "files":
+                # Found file, update path
+                updates.update_untracked(key, {"path": new_path}, partial_update=True)
+                updates.update_untracked(["import_path"], os.path.dirname(new_path))
+            elif new_path:
+                # Found file, update path of the clip's reader (libopenshot only updates whole clips)
+                clip = copy.deepcopy(self.get(key))
+                clip["reader"]["path"] = new_path
+                updates.update_untracked(key, clip)
+            else:
+                # Remove missing file
+                updates.delete(key)
+
+    def find_missing_files(self, missing_paths):
+        """Prompt to find each missing path. Yields (key, path, new path) for each path which was
+        found (or an empty new path, if the user skipped it and the item should be removed)."""
+        for key, path in missing_paths:
+            new_path, is_modified, is_skipped = find_missing_file(path)
+            if new_path and is_modified and not is_skipped:
+                log.info("Auto-updated missing file: %s" % new_path)
+                yield key, path, new_path
+            elif is_skipped:
+                log.info("Removed missing %s: %s" % (key[0][:-1], os.path.basename(path)))
+                yield key, path, ""
 
     def changed(self, action):
         """ This method is invoked by the UpdateManager each time a change happens (i.e UpdateInterface) """
+        # Secondary indexes for the changed list are now out of date
+        if action.type == "load":
+            self.query_index.clear()
+        elif action.key and isinstance(action.key[0], str):
+            self.query_index.discard(self._data.get(action.key[0].lower()))
+
         if action.type == "insert":
             # Insert new item
             old_vals = self._set(action.key, action.values, add=True)
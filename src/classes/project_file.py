@@ -0,0 +1,136 @@
+"""
+ @file
+ @brief This file contains code to read and transform project data without Qt (for headless exports and worker processes)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import copy
+import json
+import re
+
+from classes.logger import log
+from classes.project_container import is_container, read_container
+from classes.project_paths import PathResolver
+
+# Regular expression for project files with possible corruption
+VERSION_RE = re.compile(r'"openshot-qt".*"2.5.0')
+
+# Regular expression matching likely corruption in project files
+DAMAGE_RE = re.compile(r'/u([0-9a-fA-F]{4})')
+
+# Regular expression used to detect lost slashes, when repairing data
+SLASH_REPAIR_RE = re.compile(r'(["/][.]+)(/u[0-9a-fA-F]{4})')
+
+
+def is_damaged(contents):
+    """ Check if the contents of a project file have the corruption of OpenShot 2.5.0 """
+    return bool(DAMAGE_RE.search(contents) and VERSION_RE.search(contents))
+
+
+def repair_contents(contents):
+    """ Repair lost slashes, then fix all corrupted escapes. Returns the repaired contents,
+    and the number of corrupted escapes. """
+    contents = SLASH_REPAIR_RE.sub(r'\1/\2', contents)
+    return DAMAGE_RE.subn(r'\\u\1', contents)
+
+
+def load_project_file(file_path, sections=("clips", "effects", "files")):
+    """ Load the data of a project file (with absolute paths), without loading it into the app.
+    Compact project files only read the given sections (the history is not needed to export).
+    Damaged files are repaired in memory (the file is repaired when opened in OpenShot). """
+    if is_container(file_path):
+        data = read_container(file_path, sections)
+    else:
+        with open(file_path, "r", encoding="utf-8") as f:
+            contents = f.read()
+        if not contents:
+            raise RuntimeError("Couldn't load project file, no data.")
+        if is_damaged(contents):
+            contents, subs_count = repair_contents(contents)
+            log.info("Repaired {} corruptions in file {} (in memory)".format(subs_count, file_path))
+        data = json.loads(contents)
+    return PathResolver(file_path).make_absolute(data)
+
+
+def scale_keyframe_value(original_value, scale_factor):
+    """Scale keyframe X coordinate by some factor, except for 1 (leave that alone)"""
+    if original_value == 1.0:
+        # This represents the first frame of a clip (so we want to maintain that)
+        return original_value
+    else:
+        # Round to nearest INT
+        return round(original_value * scale_factor)
+
+
+def rescale_keyframes(project_data, scale_factor):
+    """Adjust all keyframe coordinates from previous FPS to new FPS (using a scale factor)
+       and return scaled project data (without modifying project_data)."""
+    log.info('Scale all keyframes by a factor of %s' % scale_factor)
+
+    # Create copy of project data
+    data = copy.deepcopy(project_data)
+
+    # Rescale the the copied project data
+    # Loop through all clips (and look for Keyframe objects)
+    # Scale the X coordinate by factor (which represents the frame #)
+    for clip in data.get('clips', []):
+        for attribute in clip:
+            if type(clip.get(attribute)) == dict and "Points" in clip.get(attribute):
+                for point in clip.get(attribute).get("Points"):
+                    if "co" in point:
+                        point["co"]["X"] = scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
+            if type(clip.get(attribute)) == dict and "red" in clip.get(attribute):
+                for color in clip.get(attribute):
+                    for point in clip.get(attribute).get(color).get("Points"):
+                        if "co" in point:
+                            point["co"]["X"] = scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
+        for effect in clip.get("effects", []):
+            for attribute in effect:
+                if type(effect.get(attribute)) == dict and "Points" in effect.get(attribute):
+                    for point in effect.get(attribute).get("Points"):
+                        if "co" in point:
+                            point["co"]["X"] = scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
+                if type(effect.get(attribute)) == dict and "red" in effect.get(attribute):
+                    for color in effect.get(attribute):
+                        for point in effect.get(attribute).get(color).get("Points"):
+                            if "co" in point:
+                                point["co"]["X"] = scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
+
+    # Loop through all effects/transitions (and look for Keyframe objects)
+    # Scale the X coordinate by factor (which represents the frame #)
+    for effect in data.get('effects', []):
+        for attribute in effect:
+            if type(effect.get(attribute)) == dict and "Points" in effect.get(attribute):
+                for point in effect.get(attribute).get("Points"):
+                    if "co" in point:
+                        point["co"]["X"] = scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
+            if type(effect.get(attribute)) == dict and "red" in effect.get(attribute):
+                for color in effect.get(attribute):
+                    for point in effect.get(attribute).get(color).get("Points"):
+                        if "co" in point:
+                            point["co"]["X"] = scale_keyframe_value(point["co"].get("X", 0.0), scale_factor)
+
+    # return the copied and scaled project data
+    return data
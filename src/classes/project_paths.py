@@ -0,0 +1,150 @@
+"""
+ @file
+ @brief This file contains code to convert the paths of project data between absolute and relative paths
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import os
+
+from classes import info
+from classes.assets import get_assets_path
+
+# Keys of the path fields in project data (files, readers, clip images, and history actions)
+PATH_KEYS = ("path", "image")
+
+
+class PathResolver:
+    """ Converts the path fields of parsed project data between absolute paths, and paths
+    relative to a project file (or @transitions, @emojis and @assets paths). Projects have
+    many paths in the same few folders, so each folder is only resolved once. """
+
+    def __init__(self, file_path):
+        self.project_folder = os.path.dirname(file_path)
+        self.project_assets = get_assets_path(file_path, create_paths=False)
+        self.transitions_path = os.path.join(info.PATH, "transitions")
+        self.emojis_path = os.path.join(info.PATH, "emojis")
+        self.thumbnail_path = info.THUMBNAIL_PATH
+        self.absolute_folders = {}  # folder: absolute folder
+        self.relative_folders = {}  # folder: relative folder
+
+    def to_absolute(self, path):
+        """ Get the absolute path of a project path """
+        if "@transitions" in path:
+            return path.replace("@transitions", self.transitions_path)
+        elif "@emojis" in path:
+            return path.replace("@emojis", os.path.join(self.emojis_path, "color", "svg"))
+        elif "@assets" in path:
+            return path.replace("@assets", self.project_assets)
+
+        folder, file_name = os.path.split(path)
+        if file_name in ("", ".", ".."):
+            return os.path.abspath(os.path.join(self.project_folder, path))
+        absolute_folder = self.absolute_folders.get(folder)
+        if absolute_folder is None:
+            absolute_folder = os.path.abspath(os.path.join(self.project_folder, folder))
+            self.absolute_folders[folder] = absolute_folder
+        return os.path.join(absolute_folder, file_name)
+
+    def to_relative(self, path):
+        """ Get the project path of an absolute path """
+        folder, file_name = os.path.split(path)
+        if file_name in ("", ".", ".."):
+            folder, file_name = os.path.split(os.path.abspath(path))
+            relative_folder = self.get_relative_folder(folder)
+        else:
+            relative_folder = self.relative_folders.get(folder)
+            if relative_folder is None:
+                relative_folder = self.get_relative_folder(os.path.abspath(folder))
+                self.relative_folders[folder] = relative_folder
+        return os.path.join(relative_folder, file_name).replace("\\", "/")
+
+    def get_relative_folder(self, folder_path):
+        """ Get the project path of an absolute folder """
+        if self.thumbnail_path in folder_path:
+            # Thumbnails are saved in the project assets
+            return "thumbnail"
+        elif self.transitions_path in folder_path:
+            # OpenShot transition (in a category folder)
+            return os.path.join("@transitions", os.path.basename(folder_path))
+        elif self.emojis_path in folder_path:
+            # OpenShot emoji
+            return "@emojis"
+        elif self.project_assets in folder_path:
+            # Project asset (i.e. title or blender animation)
+            return folder_path.replace(self.project_assets, "@assets")
+        # Relative to the project folder
+        return os.path.relpath(folder_path, self.project_folder)
+
+    def make_absolute(self, data):
+        """ Convert all paths of parsed project data to absolute paths (in place) """
+        items = [data]
+        while items:
+            item = items.pop()
+            if isinstance(item, dict):
+                if "Points" in item:
+                    # Keyframes (most of a large project) have no paths
+                    continue
+                for key, value in item.items():
+                    if isinstance(value, str):
+                        if key in PATH_KEYS:
+                            item[key] = self.to_absolute(value)
+                    elif isinstance(value, (dict, list)):
+                        items.append(value)
+            else:
+                items.extend(value for value in item if isinstance(value, (dict, list)))
+        return data
+
+    def make_relative(self, data):
+        """ Get project data with relative paths. The data itself is not changed (since it is
+        the current project), so only the dicts and lists which contain paths are copied. """
+        if isinstance(data, dict):
+            if "Points" in data:
+                return data
+            items = data.items()
+        elif isinstance(data, list):
+            items = enumerate(data)
+        else:
+            return data
+
+        converted = None
+        for key, value in items:
+            if isinstance(value, str):
+                if key not in PATH_KEYS:
+                    continue
+                new_value = self.to_relative(value)
+            elif isinstance(value, (dict, list)):
+                new_value = self.make_relative(value)
+            else:
+                continue
+            if new_value is not value:
+                if converted is None:
+                    converted = {}
+                converted[key] = new_value
+
+        if not converted:
+            return data
+        elif isinstance(data, dict):
+            return dict(data, **converted)
+        return [converted.get(index, value) for index, value in enumerate(data)]
@@ -0,0 +1,181 @@
+"""
+ @file
+ @brief This file contains the proxy manager (low resolution copies of large video files, used by the preview)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from classes import info
+from classes import settings
+from classes.app import get_app
+from classes.logger import log
+from classes.media_cache import media_cache, get_signature
+from classes.proxy_encoder import PROXY_HEIGHT, get_proxy_size, create_proxy
+
+# Only video files at least this tall get a proxy (by default)
+PROXY_MIN_HEIGHT = 1440
+
+# Number of worker processes creating proxies
+PROXY_WORKERS = 1
+
+
+def get_proxy_path(source_path):
+    """ Get the path of the proxy of a file. Proxies are stored by the signature of the original
+    (the same as its cached metadata), so a changed file gets a new proxy, and projects share proxies. """
+    signature = get_signature(source_path, media_cache.partial_hash)
+    return os.path.join(info.PROXY_PATH, "%s.mov" % hashlib.sha1(signature.encode("utf-8")).hexdigest())
+
+
+def needs_proxy(file_data, min_height=PROXY_MIN_HEIGHT):
+    """ Check if a file is a video which is large enough to need a proxy """
+    return (file_data.get("media_type") == "video" and not file_data.get("has_single_image")
+            and int(file_data.get("height") or 0) >= min_height)
+
+
+class ProxyManager:
+    """ Creates low resolution, intra-frame proxies of large video files (in background worker
+    processes), after they are imported. Finished proxies are stored in the "proxy" attribute of
+    the file records, and the preview (TimelineSync and the player) reads the proxy instead of the
+    original file. Exports always read the original files. """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.paths = {}  # Proxy paths (by original path)
+        self.jobs = {}  # Running proxy jobs (futures, by original path)
+        self.pool = None
+
+    def get_pool(self):
+        """ Get the pool of worker processes (started when first needed) """
+        if not self.pool:
+            try:
+                # Spawn workers (forking a process with Qt and libopenshot threads is not safe)
+                self.pool = ProcessPoolExecutor(max_workers=PROXY_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError, NotImplementedError):
+                log.warning("Failed to start proxy worker processes, using threads", exc_info=1)
+                self.pool = ThreadPoolExecutor(max_workers=PROXY_WORKERS)
+        return self.pool
+
+    def is_enabled(self, file_data):
+        s = settings.get_settings()
+        return bool(s.get("proxy-enabled")) and needs_proxy(file_data, int(s.get("proxy-min-height") or PROXY_MIN_HEIGHT))
+
+    def get_preview_path(self, path):
+        """ Get the path of the file to preview (the proxy of a file, if any) """
+        with self.lock:
+            return self.paths.get(path, path)
+
+    def set_proxy(self, source_path, proxy_path):
+        with self.lock:
+            self.paths[source_path] = proxy_path
+
+    def request(self, file_data):
+        """ Create the proxy of a file (if it needs one) in a worker process. ProxyReady is
+        emitted when the proxy is ready. """
+        if not self.is_enabled(file_data):
+            return
+        source_path = file_data["path"]
+        try:
+            proxy_path = get_proxy_path(source_path)
+        except OSError:
+            return
+
+        if os.path.exists(proxy_path):
+            # Proxy created earlier (i.e. by another project)
+            width, height = get_proxy_size(file_data["width"], file_data["height"])
+            self.set_proxy(source_path, proxy_path)
+            get_app().window.ProxyReady.emit(file_data["id"], {"path": proxy_path, "width": width, "height": height})
+            return
+
+        with self.lock:
+            if source_path in self.jobs:
+                return
+            log.info("Creating proxy of %s" % source_path)
+            future = self.get_pool().submit(create_proxy, source_path, proxy_path, PROXY_HEIGHT)
+            self.jobs[source_path] = future
+        future.add_done_callback(partial(self.proxy_finished, file_data["id"], source_path))
+
+    def proxy_finished(self, file_id, source_path, future):
+        """ Callback when a proxy is created (called from a pool thread) """
+        with self.lock:
+            self.jobs.pop(source_path, None)
+        if future.cancelled():
+            return
+        try:
+            proxy = future.result()
+        except Exception:
+            log.error("Failed to create proxy of %s" % source_path, exc_info=1)
+            return
+        self.set_proxy(source_path, proxy["path"])
+        get_app().window.ProxyReady.emit(file_id, proxy)
+
+    def load(self, files):
+        """ Use the proxies of the files of a project (and create missing proxies) """
+        self.cancel_all()
+        with self.lock:
+            self.paths = {}
+        missing = []
+        for file_data in files:
+            proxy = file_data.get("proxy")
+            if proxy and os.path.exists(proxy.get("path", "")):
+                self.set_proxy(file_data["path"], proxy["path"])
+            elif self.is_enabled(file_data):
+                missing.append(file_data)
+        for file_data in missing:
+            try:
+                proxy_path = get_proxy_path(file_data["path"])
+            except OSError:
+                continue
+            if os.path.exists(proxy_path):
+                # Don't update the file records while the project is loading
+                self.set_proxy(file_data["path"], proxy_path)
+            else:
+                self.request(file_data)
+
+    def cancel_all(self):
+        """ Cancel proxies which are not started yet """
+        with self.lock:
+            for future in list(self.jobs.values()):
+                future.cancel()
+
+    def shutdown(self):
+        """ Stop creating proxies (unfinished proxies are created again when needed) """
+        self.cancel_all()
+        if not self.pool:
+            return
+        # Running proxies can take minutes, so stop the worker processes instead of waiting
+        for process in list((getattr(self.pool, "_processes", None) or {}).values()):
+            process.terminate()
+        self.pool.shutdown(wait=False)
+        self.pool = None
+
+
+# Proxies of the current project
+proxy_manager = ProxyManager()
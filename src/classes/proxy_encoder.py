@@ -0,0 +1,79 @@
+"""
+ @file
+ @brief This file contains the proxy encoder (which runs in worker processes, without the UI)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import os
+
+import openshot  # Python module for libopenshot (required video editing module installed separately)
+
+from classes.logger import log
+
+# Height of proxy files (the width keeps the aspect ratio of the original)
+PROXY_HEIGHT = 540
+
+# Video bit rate of proxy files (MJPEG, so each frame is a keyframe)
+PROXY_VIDEO_BITRATE = 15000000
+
+
+def get_proxy_size(width, height, max_height=PROXY_HEIGHT):
+    """ Get the (even) size of a proxy, keeping the aspect ratio of the original """
+    scale = min(1.0, float(max_height) / float(height))
+    return max(2, round(width * scale / 2.0) * 2), max(2, round(height * scale / 2.0) * 2)
+
+
+def create_proxy(source_path, proxy_path, max_height=PROXY_HEIGHT):
+    """ Transcode a media file to a low resolution, intra-frame (MJPEG) proxy with the same
+    frame rate, length and audio, so every frame of the proxy matches the same frame of the
+    original (and seeking is fast). The proxy is written to a temporary file and renamed when
+    finished, so a partial proxy is never used. Returns the proxy details. """
+    clip = openshot.Clip(source_path)
+    clip.Open()
+    reader = clip.Reader()
+    reader_info = reader.info
+    width, height = get_proxy_size(reader_info.width, reader_info.height, max_height)
+    temp_path = "%s.part%s" % os.path.splitext(proxy_path)
+
+    try:
+        writer = openshot.FFmpegWriter(temp_path)
+        writer.SetVideoOptions(True, "mjpeg", reader_info.fps, width, height, reader_info.pixel_ratio,
+                               False, False, PROXY_VIDEO_BITRATE)
+        if reader_info.has_audio:
+            writer.SetAudioOptions(True, "pcm_s16le", reader_info.sample_rate, reader_info.channels,
+                                   reader_info.channel_layout, 0)
+        writer.PrepareStreams()
+        writer.Open()
+        for frame in range(1, reader_info.video_length + 1):
+            writer.WriteFrame(reader.GetFrame(frame))
+        writer.Close()
+        os.replace(temp_path, proxy_path)
+    finally:
+        clip.Close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    log.info("Created %sx%s proxy of %s" % (width, height, source_path))
+    return {"path": proxy_path, "width": width, "height": height}
@@ -27,6 +27,7 @@
 
 import os
 import copy
+from types import MappingProxyType
 
 from classes import info
 from classes.app import get_app
@@ -52,6 +53,10 @@ class QueryObject:
     def save(self, OBJECT_TYPE):
         """ Save the object back to the project data store """
 
+        # Read-only query results reference live project data, so save a copy
+        if isinstance(self.data, MappingProxyType):
+            self.data = copy.deepcopy(dict(self.data))
+
         # Insert or Update this data into the project data store
         if not self.id and self.type == "insert":
 
@@ -91,8 +96,10 @@ class QueryObject:
         # Needs to be overwritten in each derived class
         return None
 
-    def filter(OBJECT_TYPE, **kwargs):
-        """ Take any arguments given as filters, and find a list of matching objects """
+    def filter(OBJECT_TYPE, read_only=False, **kwargs):
+        """ Take any arguments given as filters, and find a list of matching objects.
+        With read_only=True, the data of each match is a read-only view of the project data
+        (instead of a deep copy), which is much faster when only reading a few attributes. """
 
         # Get a list of all objects of this type
         parent = project.get(OBJECT_TYPE.object_key)
@@ -102,8 +109,8 @@ class QueryObject:
 
         matching_objects = []
 
-        # Loop through all children objects
-        for child in parent:
+        # Loop through all possible matches (narrowed down by project data indexes)
+        for child in project.find_candidates(parent, kwargs):
 
             # Protect against non-iterable/subscriptables
             if not child:
@@ -130,18 +137,21 @@ class QueryObject:
                 object = OBJECT_TYPE()
                 object.id = child["id"]
                 object.key = [OBJECT_TYPE.object_name, {"id": object.id}]
-                object.data = copy.deepcopy(child)  # copy of object
+                if read_only:
+                    object.data = MappingProxyType(child)  # view of object
+                else:
+                    object.data = copy.deepcopy(child)  # copy of object
                 object.type = "update"
                 matching_objects.append(object)
 
         # Return matching objects
         return matching_objects
 
-    def get(OBJECT_TYPE, **kwargs):
+    def get(OBJECT_TYPE, read_only=False, **kwargs):
         """ Take any arguments given as filters, and find the first matching object """
 
         # Look for matching objects
-        matching_objects = QueryObject.filter(OBJECT_TYPE, **kwargs)
+        matching_objects = QueryObject.filter(OBJECT_TYPE, read_only=read_only, **kwargs)
 
         if matching_objects:
             return matching_objects[0]
@@ -162,13 +172,13 @@ class Clip(QueryObject):
         """ Delete the object from the project data store """
         super().delete(Clip)
 
-    def filter(**kwargs):
+    def filter(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find a list of matching objects """
-        return QueryObject.filter(Clip, **kwargs)
+        return QueryObject.filter(Clip, read_only=read_only, **kwargs)
 
-    def get(**kwargs):
+    def get(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find the first matching object """
-        return QueryObject.get(Clip, **kwargs)
+        return QueryObject.get(Clip, read_only=read_only, **kwargs)
 
     def title(self):
         """ Get the translated display title of this item """
@@ -188,13 +198,13 @@ class Transition(QueryObject):
         """ Delete the object from the project data store """
         super().delete(Transition)
 
-    def filter(**kwargs):
+    def filter(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find a list of matching objects """
-        return QueryObject.filter(Transition, **kwargs)
+        return QueryObject.filter(Transition, read_only=read_only, **kwargs)
 
-    def get(**kwargs):
+    def get(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find the first matching object """
-        return QueryObject.get(Transition, **kwargs)
+        return QueryObject.get(Transition, read_only=read_only, **kwargs)
 
     def title(self):
         """ Get the translated display title of this item """
@@ -231,13 +241,13 @@ class File(QueryObject):
         """ Delete the object from the project data store """
         super().delete(File)
 
-    def filter(**kwargs):
+    def filter(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find a list of matching objects """
-        return QueryObject.filter(File, **kwargs)
+        return QueryObject.filter(File, read_only=read_only, **kwargs)
 
-    def get(**kwargs):
+    def get(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find the first matching object """
-        return QueryObject.get(File, **kwargs)
+        return QueryObject.get(File, read_only=read_only, **kwargs)
 
     def absolute_path(self):
         """ Get absolute file path of file """
@@ -281,13 +291,13 @@ class Marker(QueryObject):
         """ Delete the object from the project data store """
         super().delete(Marker)
 
-    def filter(**kwargs):
+    def filter(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find a list of matching objects """
-        return QueryObject.filter(Marker, **kwargs)
+        return QueryObject.filter(Marker, read_only=read_only, **kwargs)
 
-    def get(**kwargs):
+    def get(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find the first matching object """
-        return QueryObject.get(Marker, **kwargs)
+        return QueryObject.get(Marker, read_only=read_only, **kwargs)
 
 
 class Track(QueryObject):
@@ -303,13 +313,13 @@ class Track(QueryObject):
         """ Delete the object from the project data store """
         super().delete(Track)
 
-    def filter(**kwargs):
+    def filter(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find a list of matching objects """
-        return QueryObject.filter(Track, **kwargs)
+        return QueryObject.filter(Track, read_only=read_only, **kwargs)
 
-    def get(**kwargs):
+    def get(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find the first matching object """
-        return QueryObject.get(Track, **kwargs)
+        return QueryObject.get(Track, read_only=read_only, **kwargs)
 
 
 class Effect(QueryObject):
@@ -325,7 +335,7 @@ class Effect(QueryObject):
         """ Delete the object from the project data store """
         super().delete(Effect)
 
-    def filter(**kwargs):
+    def filter(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find a list of matching objects """
 
         # Get a list of clips
@@ -351,7 +361,7 @@ class Effect(QueryObject):
                             object = Effect()
                             object.id = child["id"]
                             object.key = ["clips", {"id": clip["id"]}, "effects", {"id": object.id}]
-                            object.data = child
+                            object.data = MappingProxyType(child) if read_only else child
                             object.type = "update"
                             object.parent = clip
                             matching_objects.append(object)
@@ -363,10 +373,10 @@ class Effect(QueryObject):
         """ Get the translated display title of this item """
         return self.data.get("name") or self.data.get("type")
 
-    def get(**kwargs):
+    def get(read_only=False, **kwargs):
         """ Take any arguments given as filters, and find the first matching object """
         # Look for matching objects
-        matching_objects = Effect.filter(**kwargs)
+        matching_objects = Effect.filter(read_only=read_only, **kwargs)
 
         if matching_objects:
             return matching_objects[0]
@@ -0,0 +1,150 @@
+"""
+ @file
+ @brief This file contains a pool of open libopenshot readers (shared by thumbnails and waveforms)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock, Timer
+
+import openshot  # Python module for libopenshot (required video editing module installed separately)
+
+from classes.logger import log
+
+# Max number of open readers kept (while not in use)
+MAX_IDLE_READERS = 8
+
+# Close readers which have not been used for this many seconds
+IDLE_TIMEOUT = 60.0
+
+
+class ReaderPool:
+    """ A pool of open openshot.Clip objects, keyed by file path. Opening a reader probes the
+    file (and sets up the decoder), so reusing readers makes repeated requests for the same file
+    (i.e. thumbnails of many frames, or waveforms of many clips) much faster. Each reader is only
+    used by one thread at a time. """
+
+    def __init__(self, max_idle=MAX_IDLE_READERS, idle_timeout=IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.idle = []  # List of (key, clip, last used time), oldest first
+        self.lock = Lock()
+        self.sweep_timer = None  # Timer which closes idle readers after they expire
+
+    def get_key(self, file_path, video):
+        """ Readers are only reused for the same version of a file (and the same streams) """
+        try:
+            stat = os.stat(file_path)
+            return (file_path, video, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (file_path, video, None, None)
+
+    def acquire(self, file_path, video=True):
+        """ Get an open clip for a file path (from the pool, or by opening a new one) """
+        key = self.get_key(file_path, video)
+        with self.lock:
+            self.close_expired()
+            for index in range(len(self.idle) - 1, -1, -1):
+                if self.idle[index][0] == key:
+                    clip = self.idle.pop(index)[1]
+                    return key, clip
+
+        # Open a new clip (outside of the lock, since this can be slow)
+        clip = openshot.Clip(file_path)
+        clip.Open()
+        if not video:
+            # Disable video stream (for speed improvement)
+            clip.Reader().info.has_video = False
+        return key, clip
+
+    def release(self, key, clip):
+        """ Return an open clip to the pool (closing the least recently used ones, if needed) """
+        with self.lock:
+            self.idle.append((key, clip, time.monotonic()))
+            while len(self.idle) > self.max_idle:
+                self.close_clip(self.idle.pop(0))
+            self.close_expired()
+            self.schedule_sweep()
+
+    def discard(self, clip):
+        """ Close a clip which can't be reused (i.e. after an error) """
+        try:
+            clip.Close()
+        except Exception:
+            log.debug("Failed to close pooled reader", exc_info=1)
+
+    @contextmanager
+    def reader(self, file_path, video=True):
+        """ Use an open clip for a file path, and return it to the pool afterwards """
+        key, clip = self.acquire(file_path, video)
+        try:
+            yield clip
+        except Exception:
+            self.discard(clip)
+            raise
+        else:
+            self.release(key, clip)
+
+    def close_expired(self):
+        """ Close readers which have been idle too long (the lock must be held) """
+        expire_time = time.monotonic() - self.idle_timeout
+        while self.idle and self.idle[0][2] < expire_time:
+            self.close_clip(self.idle.pop(0))
+
+    def schedule_sweep(self):
+        """ Start a timer which closes the oldest idle reader when it expires, so idle readers are
+        closed even if the pool is not used again (the lock must be held) """
+        if self.idle and not self.sweep_timer:
+            delay = max(0.0, self.idle[0][2] + self.idle_timeout - time.monotonic())
+            self.sweep_timer = Timer(delay + 0.1, self.sweep)
+            self.sweep_timer.daemon = True
+            self.sweep_timer.start()
+
+    def sweep(self):
+        """ Close expired readers (called by the sweep timer) """
+        with self.lock:
+            self.sweep_timer = None
+            self.close_expired()
+            self.schedule_sweep()
+
+    def close_clip(self, idle_item):
+        """ Close an idle clip """
+        key, clip, _ = idle_item
+        log.debug("Closing pooled reader: %s" % key[0])
+        self.discard(clip)
+
+    def clear(self):
+        """ Close all idle readers """
+        with self.lock:
+            while self.idle:
+                self.close_clip(self.idle.pop(0))
+            if self.sweep_timer:
+                self.sweep_timer.cancel()
+                self.sweep_timer = None
+
+
+# Readers shared by thumbnails and waveforms
+reader_pool = ReaderPool()
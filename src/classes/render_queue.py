@@ -0,0 +1,318 @@
+"""
+ @file
+ @brief This file contains the render queue (export jobs, saved to disk so they can be resumed)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from classes import info
+from classes.export_engine import SegmentedExportEngine, get_resume_segment_frames
+from classes.logger import log
+
+# Status of render jobs
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+
+class RenderJob:
+    """ An export job of the render queue. Each job has a folder, with the job state (job.json),
+    a snapshot of the project data (project.json, so later edits don't change queued exports),
+    and the finished segments of the export (until the job is completed). """
+
+    def __init__(self, folder, job_id=None):
+        self.folder = folder
+        self.id = job_id or uuid.uuid4().hex
+        self.name = ""
+        self.export_settings = {}
+        self.processes = 1
+        self.segment_frames = None  # Length of each segment (the same each time the job is resumed)
+        self.status = JOB_QUEUED
+        self.completed_segments = []
+        self.error = None
+        self.created = time.time()
+        self.progress = 0.0
+        self.engine = None
+
+    @property
+    def job_folder(self):
+        return os.path.join(self.folder, self.id)
+
+    @property
+    def state_path(self):
+        return os.path.join(self.job_folder, "job.json")
+
+    @property
+    def project_path(self):
+        return os.path.join(self.job_folder, "project.json")
+
+    @property
+    def work_folder(self):
+        return os.path.join(self.job_folder, "segments")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "export_settings": self.export_settings,
+            "processes": self.processes,
+            "segment_frames": self.segment_frames,
+            "status": self.status,
+            "completed_segments": sorted(self.completed_segments),
+            "error": self.error,
+            "created": self.created,
+        }
+
+    def load_dict(self, data):
+        self.id = data.get("id", self.id)
+        self.name = data.get("name", "")
+        self.export_settings = data.get("export_settings", {})
+        self.processes = data.get("processes", 1)
+        self.segment_frames = data.get("segment_frames")
+        self.status = data.get("status", JOB_QUEUED)
+        self.completed_segments = data.get("completed_segments", [])
+        self.error = data.get("error")
+        self.created = data.get("created", self.created)
+        return self
+
+    def save(self):
+        """ Save the job state (written to a temp file first, so a crash never leaves a partial file) """
+        os.makedirs(self.job_folder, exist_ok=True)
+        temp_path = "%s.tmp" % self.state_path
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(temp_path, self.state_path)
+
+    def save_project(self, project_data):
+        """ Save the snapshot of the project data """
+        os.makedirs(self.job_folder, exist_ok=True)
+        with open(self.project_path, "w", encoding="utf-8") as f:
+            json.dump(project_data, f)
+
+    def load_project(self):
+        with open(self.project_path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+class RenderQueue:
+    """ Runs export jobs one after another (or a few at a time), in worker threads. Jobs are
+    saved to disk (with the last finished segment), so jobs interrupted by a crash, by closing
+    OpenShot, or by cancelling, are resumed from their last finished segment. """
+
+    def __init__(self, folder=None, max_running=1, job_callback=None):
+        self.folder = folder or info.RENDER_QUEUE_PATH
+        self.max_running = max(1, max_running)
+        self.jobs = []
+        self.lock = threading.RLock()
+        self.stopped = False
+
+        # Callback (called from worker threads) when the status or progress of a job changes: job_callback(job)
+        self.job_callback = job_callback
+
+    def load(self):
+        """ Load saved jobs. Jobs which were running (i.e. interrupted by a crash) are queued again. """
+        with self.lock:
+            self.jobs = []
+            for job_id in os.listdir(self.folder) if os.path.exists(self.folder) else []:
+                job = RenderJob(self.folder, job_id)
+                try:
+                    with open(job.state_path, encoding="utf-8") as f:
+                        job.load_dict(json.load(f))
+                except (OSError, ValueError):
+                    log.warning("Failed to load render job: %s" % job.job_folder, exc_info=1)
+                    continue
+                if job.status == JOB_RUNNING:
+                    log.info("Resuming interrupted render job: %s" % job.name)
+                    job.status = JOB_QUEUED
+                    job.save()
+                self.jobs.append(job)
+            self.jobs.sort(key=lambda job: job.created)
+        return self.jobs
+
+    def add(self, project_data, export_settings, name=None, processes=1):
+        """ Add an export job to the queue (and start it, if possible) """
+        job = RenderJob(self.folder)
+        job.name = name or os.path.basename(export_settings.get("path", ""))
+        job.export_settings = export_settings
+        job.processes = processes
+        fps = export_settings.get("video", {}).get("fps")
+        if fps:
+            job.segment_frames = get_resume_segment_frames(fps)
+        job.save_project(project_data)
+        job.save()
+        with self.lock:
+            self.jobs.append(job)
+        log.info("Added render job: %s" % job.name)
+        self.notify(job)
+        self.start_next()
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            for job in self.jobs:
+                if job.id == job_id:
+                    return job
+
+    def start_next(self):
+        """ Start queued jobs (up to max_running at once) """
+        with self.lock:
+            if self.stopped:
+                return
+            running = [job for job in self.jobs if job.status == JOB_RUNNING]
+            for job in self.jobs:
+                if len(running) >= self.max_running:
+                    break
+                if job.status == JOB_QUEUED:
+                    self.start_job(job)
+                    running.append(job)
+
+    def start_job(self, job):
+        """ Start (or resume) a job in a worker thread """
+        try:
+            project_data = job.load_project()
+        except (OSError, ValueError) as ex:
+            log.error("Failed to load project of render job: %s" % job.name, exc_info=1)
+            job.status = JOB_FAILED
+            job.error = str(ex)
+            job.save()
+            self.notify(job)
+            return
+
+        job.status = JOB_RUNNING
+        job.error = None
+        job.save()
+        job.engine = SegmentedExportEngine(project_data, job.export_settings,
+                                           progress_callback=lambda *args: self.job_progress(job, *args),
+                                           processes=job.processes,
+                                           work_folder=job.work_folder,
+                                           completed_segments=job.completed_segments,
+                                           segment_callback=lambda index: self.segment_finished(job, index),
+                                           segment_frames=job.segment_frames)
+        job.engine.start(finished_callback=lambda engine: self.job_finished(job))
+        log.info("Started render job: %s" % job.name)
+        self.notify(job)
+
+    def job_progress(self, job, frame, start_frame, end_frame, seconds_run):
+        job.progress = (frame - start_frame) / max(1, end_frame - start_frame)
+        self.notify(job)
+
+    def segment_finished(self, job, index):
+        """ Save the finished segments of a job (so it can be resumed from here) """
+        with self.lock:
+            if index not in job.completed_segments:
+                job.completed_segments.append(index)
+            job.save()
+
+    def job_finished(self, job):
+        """ Callback when the engine of a job is done (called from its worker thread) """
+        engine = job.engine
+        with self.lock:
+            job.engine = None
+            if engine.error:
+                job.status = JOB_FAILED
+                job.error = str(engine.error)
+            elif engine.completed:
+                job.status = JOB_COMPLETED
+                job.progress = 1.0
+                job.completed_segments = []
+                shutil.rmtree(job.work_folder, True)
+            elif job.status == JOB_RUNNING:
+                # Stopped by shutdown(), resume next time
+                job.status = JOB_QUEUED
+            job.save()
+        log.info("Render job %s: %s" % (job.status, job.name))
+        self.notify(job)
+        self.start_next()
+
+    def cancel(self, job_id):
+        """ Cancel a job (its finished segments are kept, so it can be resumed) """
+        with self.lock:
+            job = self.get(job_id)
+            if job and job.status in [JOB_QUEUED, JOB_RUNNING]:
+                job.status = JOB_CANCELLED
+                job.save()
+                if job.engine:
+                    job.engine.cancel()
+                self.notify(job)
+
+    def resume(self, job_id):
+        """ Queue a cancelled or failed job again """
+        with self.lock:
+            job = self.get(job_id)
+            if job and job.status in [JOB_CANCELLED, JOB_FAILED] and not job.engine:
+                job.status = JOB_QUEUED
+                job.save()
+                self.notify(job)
+        self.start_next()
+
+    def remove(self, job_id):
+        """ Cancel a job, and remove it (and its files) from the queue """
+        with self.lock:
+            job = self.get(job_id)
+            if not job:
+                return
+            engine = job.engine
+            if engine:
+                job.status = JOB_CANCELLED
+                engine.cancel()
+            self.jobs.remove(job)
+        if engine:
+            engine.wait()
+        shutil.rmtree(job.job_folder, True)
+
+    def shutdown(self):
+        """ Stop running jobs (they stay queued, and are resumed the next time the queue is loaded) """
+        with self.lock:
+            self.stopped = True
+            engines = [job.engine for job in self.jobs if job.engine]
+            for engine in engines:
+                engine.cancel()
+        for engine in engines:
+            engine.wait()
+
+    def wait(self):
+        """ Wait until no jobs are running (or queued) """
+        while True:
+            with self.lock:
+                engines = [job.engine for job in self.jobs if job.engine]
+                queued = [job for job in self.jobs if job.status == JOB_QUEUED]
+            if not engines and (not queued or self.stopped):
+                return
+            for engine in engines:
+                engine.wait()
+            if not engines:
+                self.start_next()
+                time.sleep(0.1)
+
+    def notify(self, job):
+        if self.job_callback:
+            self.job_callback(job)
@@ -0,0 +1,291 @@
+"""
+ @file
+ @brief This file contains the smart render analysis (finding timeline spans which can be copied from the source files, without re-encoding)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import json
+import os
+import shutil
+import subprocess
+from fractions import Fraction
+
+from classes.logger import log
+
+# Min length (in seconds) of a copied span (shorter spans are rendered)
+SMART_RENDER_MIN_SECONDS = 2.0
+
+# Codec (as named by ffprobe) written by each video encoder
+ENCODER_CODECS = {
+    "libx264": "h264",
+    "h264_nvenc": "h264",
+    "h264_qsv": "h264",
+    "h264_vaapi": "h264",
+    "libx265": "hevc",
+    "hevc_nvenc": "hevc",
+    "hevc_qsv": "hevc",
+    "hevc_vaapi": "hevc",
+    "libvpx": "vp8",
+    "libvpx-vp9": "vp9",
+    "libaom-av1": "av1",
+}
+
+# Clip properties which must be constant (and equal to these values) for a clip to be copied
+PASSTHROUGH_PROPERTIES = {
+    "alpha": 1.0,
+    "scale_x": 1.0,
+    "scale_y": 1.0,
+    "location_x": 0.0,
+    "location_y": 0.0,
+    "rotation": 0.0,
+    "shear_x": 0.0,
+    "shear_y": 0.0,
+    "crop_x": 0.0,
+    "crop_y": 0.0,
+    "crop_width": 1.0,
+    "crop_height": 1.0,
+    "origin_x": 0.5,
+    "origin_y": 0.5,
+    "perspective_c1_x": -1.0,
+    "perspective_c1_y": -1.0,
+    "perspective_c2_x": -1.0,
+    "perspective_c2_y": -1.0,
+    "perspective_c3_x": -1.0,
+    "perspective_c3_y": -1.0,
+    "perspective_c4_x": -1.0,
+    "perspective_c4_y": -1.0,
+}
+
+# Other clip properties which must have these values for a clip to be copied
+# (a clip showing its waveform renders no video frames, and anchor is the canvas, and gravity the center)
+PASSTHROUGH_SETTINGS = {
+    "waveform": False,
+    "anchor": 0,
+    "gravity": 4,
+}
+
+# Stream parameters which must match for copied and rendered segments to be joined (without re-encoding)
+CODEC_PARAMETERS = ("codec_name", "profile", "level", "pix_fmt", "width", "height", "time_base", "codec_tag_string",
+                    "extradata_hash", "color_range", "color_space", "color_transfer", "color_primaries", "field_order")
+
+# Profile numbers of the encoders (as named by ffprobe), used to encode rendered segments like the copied video
+ENCODER_PROFILES = {
+    "h264": {"Constrained Baseline": 578, "Baseline": 66, "Main": 77, "Extended": 88, "High": 100, "High 10": 110},
+    "hevc": {"Main": 1, "Main 10": 2},
+}
+
+
+def get_ffprobe_path():
+    """ Get the path of the ffprobe executable (used to find keyframes of source files), or None """
+    return shutil.which("ffprobe")
+
+
+def get_fraction(fps):
+    return Fraction(int(fps["num"]), int(fps["den"]))
+
+
+def is_constant(keyframe, value):
+    """ Check if a keyframe (i.e. {"Points": [...]}) always has a value (a keyframe without points is default) """
+    if not isinstance(keyframe, dict):
+        return True
+    return all(abs(float(point["co"]["Y"]) - value) < 1e-6 for point in keyframe.get("Points", []))
+
+
+def get_clip_frames(clip, fps):
+    """ Get the first and last timeline frames of a clip (or transition) """
+    start_frame = round(float(clip.get("position", 0.0)) * fps) + 1
+    end_frame = start_frame + round((float(clip.get("end", 0.0)) - float(clip.get("start", 0.0))) * fps) - 1
+    return start_frame, end_frame
+
+
+def has_video(clip):
+    """ Check if a clip is visible (audio only clips don't affect the video) """
+    reader = clip.get("reader", {})
+    if not reader.get("has_video", True):
+        return False
+    points = clip.get("has_video", {}).get("Points", []) if isinstance(clip.get("has_video"), dict) else []
+    return not points or any(float(point["co"]["Y"]) != 0.0 for point in points)
+
+
+def is_passthrough_clip(clip, video_settings):
+    """ Check if the frames of a clip are exactly the frames of its source file: an untouched
+    video file (no effects, default properties, no time mapping), already in the export codec,
+    size and frame rate """
+    reader = clip.get("reader", {})
+    if reader.get("type") != "FFmpegReader" or reader.get("has_single_image") or not reader.get("has_video"):
+        return False
+    if clip.get("effects"):
+        return False
+    if clip.get("time", {}).get("Points") if isinstance(clip.get("time"), dict) else False:
+        return False
+    if not all(is_constant(clip.get(name), value) for name, value in PASSTHROUGH_PROPERTIES.items()):
+        return False
+    if any(clip.get(name, value) != value for name, value in PASSTHROUGH_SETTINGS.items()):
+        return False
+    if (reader.get("width"), reader.get("height")) != (video_settings.get("width"), video_settings.get("height")):
+        return False
+    if video_settings.get("pixel_ratio") and reader.get("pixel_ratio") and \
+            get_fraction(reader["pixel_ratio"]) != get_fraction(video_settings["pixel_ratio"]):
+        # Frames are scaled to the display ratio of the export
+        return False
+    if not reader.get("fps") or get_fraction(reader["fps"]) != get_fraction(video_settings["fps"]):
+        return False
+    vcodec = video_settings.get("vcodec")
+    return reader.get("vcodec") == ENCODER_CODECS.get(vcodec, vcodec)
+
+
+def subtract_ranges(start_frame, end_frame, ranges):
+    """ Get the parts of a range of frames which are not covered by other ranges """
+    parts = []
+    for range_start, range_end in sorted(ranges):
+        if range_end < start_frame or range_start > end_frame:
+            continue
+        if range_start > start_frame:
+            parts.append((start_frame, range_start - 1))
+        start_frame = max(start_frame, range_end + 1)
+    if start_frame <= end_frame:
+        parts.append((start_frame, end_frame))
+    return parts
+
+
+def find_passthrough_spans(project_data, start_frame, end_frame, video_settings):
+    """ Find the spans of exported frames which only show a single passthrough clip (no other
+    visible clips or transitions), as a list of dicts with the timeline frames, the clip, and
+    the source time (in seconds) of the first frame """
+    if get_fraction(video_settings["fps"]) != get_fraction(project_data.get("fps", video_settings["fps"])):
+        # Frames are only copied if the export frame rate matches the project
+        return []
+    fps = float(get_fraction(video_settings["fps"]))
+
+    visible_ranges = [(clip, get_clip_frames(clip, fps)) for clip in project_data.get("clips", []) if has_video(clip)]
+    transition_ranges = [get_clip_frames(effect, fps) for effect in project_data.get("effects", [])]
+
+    spans = []
+    for clip, (clip_start, clip_end) in visible_ranges:
+        if not is_passthrough_clip(clip, video_settings):
+            continue
+        other_ranges = [frames for other_clip, frames in visible_ranges if other_clip is not clip] + transition_ranges
+        for span_start, span_end in subtract_ranges(max(start_frame, clip_start), min(end_frame, clip_end), other_ranges):
+            spans.append({
+                "start_frame": span_start,
+                "end_frame": span_end,
+                "clip": clip,
+                "source_seconds": float(clip.get("start", 0.0)) + (span_start - clip_start) / fps,
+            })
+    return sorted(spans, key=lambda span: span["start_frame"])
+
+
+def run_ffprobe(path, entries, options=None):
+    """ Get entries of the first video stream of a file (as parsed JSON), or None if the file can't be probed """
+    command = [get_ffprobe_path(), "-v", "error", "-select_streams", "v:0", "-show_data_hash", "MD5",
+               "-show_entries", entries] + (options or []) + ["-of", "json", path]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        log.warning("Failed to probe %s: %s" % (path, result.stderr.decode("utf-8", "replace")[-500:]))
+        return None
+    return json.loads(result.stdout.decode("utf-8", "replace"))
+
+
+def get_codec_parameters(stream):
+    """ Get the parameters of a video stream which must match to join it with other streams """
+    return {name: stream.get(name) for name in CODEC_PARAMETERS}
+
+
+def probe_codec_parameters(path):
+    """ Get the codec parameters of the video stream of a file (or None if it can't be probed) """
+    probe = run_ffprobe(path, "stream=%s" % ",".join(CODEC_PARAMETERS))
+    if not probe or not probe.get("streams"):
+        return None
+    return get_codec_parameters(probe["streams"][0])
+
+
+def get_encoder_options(stream):
+    """ Get the encoder options (profile and level) to encode video like a stream, as a dict """
+    options = {}
+    profile = ENCODER_PROFILES.get(stream.get("codec_name"), {}).get(stream.get("profile"))
+    if profile:
+        options["profile"] = profile
+    if stream.get("level") and int(stream["level"]) > 0:
+        options["level"] = int(stream["level"])
+    return options
+
+
+def probe_video(path, start_seconds, end_seconds):
+    """ Get the video stream info of a file, and its keyframe times (in seconds from the start of
+    the stream) between two times, using ffprobe. Returns None if the file can't be probed. """
+    probe = run_ffprobe(path, "stream=%s,r_frame_rate,start_time:packet=pts_time,flags" % ",".join(CODEC_PARAMETERS),
+                        ["-read_intervals", "%.3f%%%.3f" % (max(0.0, start_seconds - 1.0), end_seconds + 1.0)])
+    if not probe or not probe.get("streams"):
+        return None
+
+    stream = probe["streams"][0]
+    stream_start = float(stream.get("start_time") or 0.0)
+    stream["start_time"] = stream_start
+    stream["keyframes"] = sorted(float(packet["pts_time"]) - stream_start for packet in probe.get("packets", [])
+                                 if "K" in packet.get("flags", "") and packet.get("pts_time") not in [None, "N/A"])
+    return stream
+
+
+def get_copy_range(span, keyframes, fps, min_frames):
+    """ Get the frames of a span which can be copied: from its first keyframe to (just before) its
+    last keyframe, so the copied frames never depend on frames outside of the span. Keyframes
+    which are not on a frame boundary are ignored. Returns (start frame, end frame) or None. """
+    frames = []
+    for keyframe in keyframes:
+        offset = (keyframe - span["source_seconds"]) * fps
+        if abs(offset - round(offset)) < 0.01:
+            frame = span["start_frame"] + round(offset)
+            if span["start_frame"] <= frame <= span["end_frame"] + 1:
+                frames.append(frame)
+    if len(frames) < 2 or frames[-1] - frames[0] < min_frames:
+        return None
+    return frames[0], frames[-1] - 1
+
+
+def plan_segments(start_frame, end_frame, copy_ranges):
+    """ Split exported frames into spans which are copied and spans which are rendered. copy_ranges
+    is a sorted list of (start frame, end frame, span), and the result is a list of
+    (start frame, end frame, span or None), in order, covering all frames. """
+    segments = []
+    next_frame = start_frame
+    for copy_start, copy_end, span in copy_ranges:
+        if copy_start > next_frame:
+            segments.append((next_frame, copy_start - 1, None))
+        segments.append((copy_start, copy_end, span))
+        next_frame = copy_end + 1
+    if next_frame <= end_frame:
+        segments.append((next_frame, end_frame, None))
+    return segments
+
+
+def copy_segment(source_path, source_seconds, frames, output_path):
+    """ Copy frames of the video stream of a file (starting at a keyframe) without re-encoding """
+    command = [shutil.which("ffmpeg"), "-y", "-v", "error", "-ss", "%.6f" % source_seconds, "-i", source_path,
+               "-map", "0:v:0", "-c", "copy", "-frames:v", str(frames), "-an", "-sn", "-dn",
+               "-avoid_negative_ts", "make_zero", output_path]
+    log.info("Copying %s frames of %s: %s" % (frames, os.path.basename(source_path), command))
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError("Failed to copy video of %s: %s" % (source_path, result.stderr.decode("utf-8", "replace")[-1000:]))
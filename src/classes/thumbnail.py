@@ -27,15 +27,22 @@
 
 import os
 import re
-import openshot
 import socket
-import time
-from threading import Thread
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, Thread
 from classes import info
 from classes.query import File
 from classes.logger import log
+from classes.readers import reader_pool
+from classes.thumbnail_store import thumbnail_store
 from http.server import BaseHTTPRequestHandler, HTTPServer
-from socketserver import ThreadingMixIn
+
+# Max number of thumbnail requests processed at the same time
+THUMBNAIL_WORKERS = max(2, min(4, os.cpu_count() or 1))
+
+# Max size of encoded thumbnail images kept in memory (in bytes)
+THUMBNAIL_CACHE_SIZE = 64 * 1024 * 1024
 
 # Regex for parsing URLs: (examples)
 #  http://127.0.0.1:33723/thumbnails/9ATJTBQ71V/1/path/no-cache/
@@ -49,38 +56,134 @@ REGEX_THUMBNAIL_URL = re.compile(r"/thumbnails/(?P<file_id>.+?)/(?P<file_frame>\
 def GenerateThumbnail(file_path, thumb_path, thumbnail_frame, width, height, mask, overlay):
     """Create thumbnail image, and check for rotate metadata (if any)"""
 
-    # Create a clip object and get the reader
-    clip = openshot.Clip(file_path)
-    reader = clip.Reader()
+    # Get an open clip (and reader) from the pool
+    with reader_pool.reader(file_path) as clip:
+        reader = clip.Reader()
+
+        # Get the 'rotate' metadata (if any)
+        rotate = 0.0
+        try:
+            if reader.info.metadata.count("rotate"):
+                rotate_data = reader.info.metadata.find("rotate").value()[1]
+                rotate = float(rotate_data)
+        except ValueError as ex:
+            log.warning("Could not parse rotation value {}: {}".format(rotate_data, ex))
+        except Exception:
+            log.warning("Error reading rotation metadata from {}".format(file_path), exc_info=1)
+
+        # Create thumbnail folder (if needed)
+        parent_path = os.path.dirname(thumb_path)
+        if not os.path.exists(parent_path):
+            os.mkdir(parent_path)
+
+        # Save thumbnail image (the reader is returned to the pool, instead of closed)
+        reader.GetFrame(thumbnail_frame).Thumbnail(thumb_path, width, height, mask, overlay, "#000", False, "png", 85, rotate)
+
+
+class ThumbnailCache:
+    """ In-memory LRU cache of encoded thumbnail images (PNG bytes), limited by total size.
+    Concurrent requests for the same thumbnail share a single load (or generation). """
+
+    def __init__(self, max_size=THUMBNAIL_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.images = OrderedDict()  # thumbnail path: (modified time, image data)
+        self.pending = {}  # (thumbnail path, regenerate): Future of image data
+        self.lock = Lock()
+
+    def get(self, thumb_path):
+        """ Get the cached image data of a thumbnail (if it has not changed on disk) """
+        try:
+            modified = os.stat(thumb_path).st_mtime_ns
+        except OSError:
+            modified = None
+        with self.lock:
+            cached = self.images.get(thumb_path)
+            if cached and cached[0] == modified:
+                self.images.move_to_end(thumb_path)
+                return cached[1]
+
+    def add(self, thumb_path, image_data):
+        """ Add the image data of a thumbnail to the cache (removing the least recently used images) """
+        try:
+            modified = os.stat(thumb_path).st_mtime_ns
+        except OSError:
+            return
+        with self.lock:
+            self.remove(thumb_path)
+            if len(image_data) > self.max_size:
+                return
+            self.images[thumb_path] = (modified, image_data)
+            self.size += len(image_data)
+            while self.size > self.max_size:
+                _, (_, oldest_data) = self.images.popitem(last=False)
+                self.size -= len(oldest_data)
+
+    def remove(self, thumb_path):
+        """ Remove a thumbnail from the cache (the lock must be held) """
+        cached = self.images.pop(thumb_path, None)
+        if cached:
+            self.size -= len(cached[1])
+
+    def load(self, thumb_path, load_func, regenerate=False):
+        """ Get the image data of a thumbnail from the cache, or by calling load_func(). If the same
+        thumbnail is already loading (in another thread), wait for that result instead. """
+        if not regenerate:
+            image_data = self.get(thumb_path)
+            if image_data is not None:
+                return image_data
+
+        key = (thumb_path, regenerate)
+        with self.lock:
+            future = self.pending.get(key)
+            is_loading = future is None
+            if is_loading:
+                future = Future()
+                self.pending[key] = future
+        if not is_loading:
+            return future.result()
 
-    # Open reader
-    reader.Open()
+        try:
+            image_data = load_func()
+            self.add(thumb_path, image_data)
+            future.set_result(image_data)
+            return image_data
+        except Exception as ex:
+            future.set_exception(ex)
+            raise
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
 
-    # Get the 'rotate' metadata (if any)
-    rotate = 0.0
-    try:
-        if reader.info.metadata.count("rotate"):
-            rotate_data = reader.info.metadata.find("rotate").value()[1]
-            rotate = float(rotate_data)
-    except ValueError as ex:
-        log.warning("Could not parse rotation value {}: {}".format(rotate_data, ex))
-    except Exception:
-        log.warning("Error reading rotation metadata from {}".format(file_path), exc_info=1)
 
-    # Create thumbnail folder (if needed)
-    parent_path = os.path.dirname(thumb_path)
-    if not os.path.exists(parent_path):
-        os.mkdir(parent_path)
+# Thumbnails shared by all requests
+thumbnail_cache = ThumbnailCache()
 
-    # Save thumbnail image and close readers
-    reader.GetFrame(thumbnail_frame).Thumbnail(thumb_path, width, height, mask, overlay, "#000", False, "png", 85, rotate)
-    reader.Close()
-    clip.Close()
 
+class httpThumbnailServer(HTTPServer):
+    """ This class handles requests with a limited pool of worker threads
+        (so many requests at once don't all decode video at the same time). """
 
-class httpThumbnailServer(ThreadingMixIn, HTTPServer):
-    """ This class allows to handle requests in separated threads.
-        No further content needed, don't touch this. """
+    def __init__(self, server_address, RequestHandlerClass, max_workers=THUMBNAIL_WORKERS):
+        HTTPServer.__init__(self, server_address, RequestHandlerClass)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def process_request(self, request, client_address):
+        """ Queue request for the next available worker thread """
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        """ Handle request in a worker thread (same as ThreadingMixIn) """
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self.executor.shutdown(wait=False)
 
 
 class httpThumbnailServerThread(Thread):
@@ -99,6 +202,7 @@ class httpThumbnailServerThread(Thread):
         self.running = False
         log.info('Shutting down thumbnail server: %s' % str(self.server_address))
         self.thumbServer.shutdown()
+        self.thumbServer.server_close()
 
     def run(self):
         self.running = True
@@ -106,7 +210,6 @@ class httpThumbnailServerThread(Thread):
         # Start listening for HTTP requests (and check for shutdown every 0.5 seconds)
         self.server_address = ('127.0.0.1', self.find_free_port())
         self.thumbServer = httpThumbnailServer(self.server_address, httpThumbnailHandler)
-        self.thumbServer.daemon_threads = True
         log.info(
             "Starting thumbnail server listening on port %d",
             self.server_address[1])
@@ -184,32 +287,42 @@ class httpThumbnailHandler(BaseHTTPRequestHandler):
             # Try with ID and frame # in filename (for backwards compatibility)
             thumb_path = os.path.join(info.THUMBNAIL_PATH, "%s-%s.png" % (file_id, file_frame))
 
-        if not os.path.exists(thumb_path) or no_cache:
-            # Generate thumbnail (since we can't find it)
-
-            # Determine if video overlay should be applied to thumbnail
-            overlay_path = ""
-            if file.data["media_type"] == "video":
-                overlay_path = os.path.join(info.IMAGES_PATH, "overlay.png")
-
-            # Create thumbnail image
-            GenerateThumbnail(
-                file_path,
-                thumb_path,
-                file_frame,
-                98, 64,
-                mask_path,
-                overlay_path)
+        def load_thumbnail():
+            if not os.path.exists(thumb_path) or no_cache:
+                # Thumbnails of the same source content are shared by all projects
+                rotate = file.data.get("metadata", {}).get("rotate", 0)
+                store_key = thumbnail_store.get_key(file_path, file_frame, 98, 64, rotate)
+                if no_cache or not thumbnail_store.get(store_key, thumb_path):
+                    # Generate thumbnail (since we can't find it)
+
+                    # Determine if video overlay should be applied to thumbnail
+                    overlay_path = ""
+                    if file.data["media_type"] == "video":
+                        overlay_path = os.path.join(info.IMAGES_PATH, "overlay.png")
+
+                    # Create thumbnail image
+                    GenerateThumbnail(
+                        file_path,
+                        thumb_path,
+                        file_frame,
+                        98, 64,
+                        mask_path,
+                        overlay_path)
+                    if os.path.exists(thumb_path):
+                        thumbnail_store.put(store_key, thumb_path)
+
+            if not os.path.exists(thumb_path):
+                return b""
+            with open(thumb_path, 'rb') as f:
+                return f.read()
+
+        # Get thumbnail image (from memory, disk, or by generating it)
+        image_data = thumbnail_cache.load(thumb_path, load_thumbnail, regenerate=bool(no_cache))
 
         # Send message back to client
-        if os.path.exists(thumb_path):
+        if image_data:
             if not only_path:
-                self.wfile.write(open(thumb_path, 'rb').read())
+                self.wfile.write(image_data)
             else:
                 self.wfile.write(bytes(thumb_path, "utf-8"))
 
-        # Pause processing of request (since we don't currently use thread pooling, this allows
-        # the threads to be processed without choking the CPU as much
-        # TODO: Make HTTPServer work with a limited thread pool and remove this sleep() hack.
-        time.sleep(0.01)
-
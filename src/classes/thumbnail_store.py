@@ -0,0 +1,146 @@
+"""
+ @file
+ @brief This file contains a persistent store of thumbnail images, shared by all projects
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from classes import info
+from classes.logger import log
+from classes.media_cache import get_signature
+
+# Max total size of stored thumbnail images (in bytes)
+THUMBNAIL_STORE_SIZE = 512 * 1024 * 1024
+
+
+class ThumbnailStore:
+    """ Thumbnail images saved in the user folder, keyed by the signature of the source file
+    (its content), the frame number, the image size and the rotation. Project thumbnails (which
+    are named by file ID) are copied from this store, so reopening a project (or importing the
+    same footage again) does not decode any frames. The least recently used images are removed
+    when the total size is over budget. """
+
+    def __init__(self, folder=info.THUMBNAIL_STORE_PATH, max_size=THUMBNAIL_STORE_SIZE, partial_hash=False):
+        self.folder = folder
+        self.max_size = max_size
+        self.partial_hash = partial_hash
+        self.entries = None  # image path: size (least recently used first)
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get_key(self, file_path, frame, width, height, rotate=0):
+        """ Get the key of a thumbnail (or None, if the source file is missing) """
+        try:
+            signature = get_signature(file_path, self.partial_hash)
+        except OSError:
+            return None
+        key = "%s|%s|%sx%s|%s" % (signature, frame, width, height, rotate)
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get_image_path(self, key):
+        return os.path.join(self.folder, key[:2], "%s.png" % key)
+
+    def load_entries(self):
+        """ Scan the store folder (once), ordering images by last use (the lock must be held) """
+        if self.entries is not None:
+            return
+        images = []
+        os.makedirs(self.folder, exist_ok=True)
+        for sub_folder in os.scandir(self.folder):
+            if not sub_folder.is_dir():
+                continue
+            for entry in os.scandir(sub_folder.path):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    images.append((stat.st_mtime, entry.path, stat.st_size))
+        images.sort()
+        self.entries = OrderedDict((image_path, size) for _, image_path, size in images)
+        self.size = sum(self.entries.values())
+
+    def get(self, key, thumb_path):
+        """ Copy a stored thumbnail to thumb_path. Returns False if it is not stored. """
+        if not key:
+            return False
+        image_path = self.get_image_path(key)
+        with self.lock:
+            self.load_entries()
+            if image_path not in self.entries:
+                return False
+            self.entries.move_to_end(image_path)
+        try:
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            shutil.copyfile(image_path, thumb_path)
+            # Modified time is the last use (which orders images after a restart)
+            now = time.time()
+            os.utime(image_path, (now, now))
+            return True
+        except OSError:
+            log.debug("Failed to copy stored thumbnail %s" % image_path, exc_info=1)
+            with self.lock:
+                self.remove(image_path)
+            return False
+
+    def put(self, key, thumb_path):
+        """ Save a copy of a generated thumbnail (removing the least recently used images) """
+        if not key or not self.max_size:
+            return
+        image_path = self.get_image_path(key)
+        try:
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            temp_path = "%s.%s-%s.tmp" % (image_path, os.getpid(), threading.get_ident())
+            shutil.copyfile(thumb_path, temp_path)
+            os.replace(temp_path, image_path)
+            size = os.path.getsize(image_path)
+        except OSError:
+            log.warning("Failed to store thumbnail of %s" % thumb_path, exc_info=1)
+            return
+
+        with self.lock:
+            self.load_entries()
+            self.size -= self.entries.pop(image_path, 0)
+            self.entries[image_path] = size
+            self.size += size
+            while self.size > self.max_size and self.entries:
+                oldest_path = next(iter(self.entries))
+                self.remove(oldest_path)
+                try:
+                    os.remove(oldest_path)
+                except OSError:
+                    pass
+
+    def remove(self, image_path):
+        """ Forget a stored image (the lock must be held) """
+        if self.entries is not None and image_path in self.entries:
+            self.size -= self.entries.pop(image_path)
+
+
+# Thumbnails shared by all projects
+thumbnail_store = ThumbnailStore()
@@ -25,6 +25,7 @@
  along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
  """
 
+import json
 import time
 import openshot  # Python module for libopenshot (required video editing module installed separately)
 
@@ -32,6 +33,7 @@ from classes.updates import UpdateInterface
 from classes.logger import log
 from classes.app import get_app
 from classes import settings
+from classes.proxies import proxy_manager
 
 
 class TimelineSync(UpdateInterface):
@@ -72,18 +74,70 @@ class TimelineSync(UpdateInterface):
         # Connect to signal
         self.window.MaxSizeChanged.connect(self.MaxSizeChangedCB)
 
+    def ignore_action(self, action):
+        """ Is this a change which doesn't affect libopenshot """
+        return len(action.key) >= 1 and action.key[0].lower() in ["files", "history", "markers", "layers", "export_path", "import_path", "scale", "profile"]
+
+    def use_proxy(self, clip):
+        """ Get the data of a clip which reads the proxy of its file (if any) instead of the original """
+        reader = clip.get("reader")
+        if not isinstance(reader, dict) or not reader.get("path"):
+            return clip
+        proxy_path = proxy_manager.get_preview_path(reader["path"])
+        if proxy_path == reader["path"]:
+            return clip
+        return dict(clip, reader=dict(reader, path=proxy_path))
+
+    def get_preview_change(self, action):
+        """ Get a change (as a dict) for the preview timeline, with clips reading proxies """
+        change = action.to_dict(include_old_values=False)
+        key = change.get("key") or []
+        if key and key[0] == "clips" and len(key) <= 2 and isinstance(change.get("value"), dict):
+            change = dict(change, value=self.use_proxy(change["value"]))
+        return change
+
+    def is_proxy_change(self, action):
+        """ Is this a new proxy of a file """
+        return action.type == "update" and len(action.key) >= 1 and action.key[0] == "files" \
+            and isinstance(action.values, dict) and "proxy" in action.values
+
+    def proxy_changed(self, action):
+        """ Switch the clips of a file to its new proxy """
+        file_id = action.key[1].get("id") if len(action.key) > 1 and isinstance(action.key[1], dict) else None
+        clips = [clip for clip in self.app.project.get("clips") if clip.get("file_id") == file_id]
+        if not clips:
+            return
+        log.info("Using proxy for %s clips of file %s" % (len(clips), file_id))
+        json_diff = json.dumps([{"type": "update", "key": ["clips", {"id": clip["id"]}], "value": self.use_proxy(clip),
+                                 "partial": False} for clip in clips])
+        try:
+            self.timeline.ApplyJsonDiff(json_diff)
+        except Exception as e:
+            log.info("Error applying JSON to timeline object in libopenshot: %s. %s" % (e, json_diff))
+        self.window.refreshFrameSignal.emit()
+
     def changed(self, action):
         """ This method is invoked by the UpdateManager each time a change happens (i.e UpdateInterface) """
 
+        # Switch clips to a new proxy
+        if self.is_proxy_change(action):
+            self.proxy_changed(action)
+            return
+
         # Ignore changes that don't affect libopenshot
-        if len(action.key) >= 1 and action.key[0].lower() in ["files", "history", "markers", "layers", "export_path", "import_path", "scale", "profile"]:
+        if self.ignore_action(action):
             return
 
         # Pass the change to the libopenshot timeline
         try:
             if action.type == "load":
+                # Use the proxies of the project files (if any) for previews
+                project = action.to_dict(only_value=True)
+                proxy_manager.load(project.get("files", []))
+                project = dict(project, clips=[self.use_proxy(clip) for clip in project.get("clips", [])])
+
                 # This JSON is initially loaded to libopenshot to update the timeline
-                self.timeline.SetJson(action.json(only_value=True))
+                self.timeline.SetJson(json.dumps(project))
                 self.timeline.Open()  # Re-Open the Timeline reader
 
                 # The timeline's profile changed, so update all clips
@@ -94,11 +148,29 @@ class TimelineSync(UpdateInterface):
 
             else:
                 # This JSON DIFF is passed to libopenshot to update the timeline
-                self.timeline.ApplyJsonDiff(action.json(is_array=True))
+                self.timeline.ApplyJsonDiff(json.dumps([self.get_preview_change(action)]))
 
         except Exception as e:
             log.info("Error applying JSON to timeline object in libopenshot: %s. %s" % (e, action.json(is_array=True)))
 
+    def changed_batch(self, actions):
+        """ This method is invoked by the UpdateManager with a batch of changes (i.e. a transaction).
+        All changes are passed to libopenshot as a single JSON DIFF. """
+        for action in actions:
+            if self.is_proxy_change(action):
+                self.proxy_changed(action)
+        actions = [action for action in actions if not self.ignore_action(action)]
+        if any(action.type == "load" for action in actions):
+            super().changed_batch(actions)
+            return
+
+        if actions:
+            json_diff = json.dumps([self.get_preview_change(action) for action in actions])
+            try:
+                self.timeline.ApplyJsonDiff(json_diff)
+            except Exception as e:
+                log.info("Error applying JSON to timeline object in libopenshot: %s. %s" % (e, json_diff))
+
     def MaxSizeChangedCB(self, new_size):
         """Callback for max sized change (i.e. max size of video widget)"""
         while not self.window.initialized:
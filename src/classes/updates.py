@@ -28,8 +28,11 @@
  """
 
 from classes.logger import log
+from contextlib import contextmanager
 import copy
 import json
+import os
+import zlib
 
 
 class UpdateWatcher:
@@ -44,12 +47,78 @@ class UpdateWatcher:
 class UpdateInterface:
     """ Interface for classes that listen for changes (insert, update, and delete). """
 
+    # Receive each change immediately, even inside a transaction (instead of a single
+    # batch when the transaction ends). Used by the project data, so later changes
+    # in a transaction can read the results of earlier ones.
+    immediate_updates = False
+
     def changed(self, action):
         """ This method is invoked each time the UpdateManager is changed.
         The action contains all the details of what changed,
         including the type of change (insert, update, or delete). """
         raise NotImplementedError("changed() not implemented in UpdateInterface implementer.")
 
+    def changed_batch(self, actions):
+        """ This method is invoked with a list of changes which happened together
+        (i.e. a transaction, or undo/redo of a transaction). Listeners can override
+        this to handle the whole batch at once. """
+        for action in actions:
+            self.changed(action)
+
+
+def get_history_path(file_path):
+    """ Get the path of the history file which is saved next to a project file """
+    from classes.assets import get_assets_path
+    return os.path.join(get_assets_path(file_path), "history.txt")
+
+
+def diff_values(source, target, path=None):
+    """ Get a list of patch operations (JSON-patch style) which transform source into target.
+    Nested dictionaries (and lists of the same length) are compared item by item,
+    so only the changed values are copied into the patch. """
+    path = path or []
+    if isinstance(source, dict) and isinstance(target, dict):
+        patch = []
+        for key, value in source.items():
+            if key not in target:
+                patch.append({"op": "remove", "path": path + [key]})
+            elif value != target[key]:
+                patch.extend(diff_values(value, target[key], path + [key]))
+        for key, value in target.items():
+            if key not in source:
+                patch.append({"op": "replace", "path": path + [key], "value": copy.deepcopy(value)})
+        return patch
+
+    if isinstance(source, list) and isinstance(target, list) and len(source) == len(target):
+        patch = []
+        for index, value in enumerate(source):
+            if value != target[index]:
+                patch.extend(diff_values(value, target[index], path + [index]))
+        return patch
+
+    return [{"op": "replace", "path": path, "value": copy.deepcopy(target)}]
+
+
+def patch_values(data, patch):
+    """ Apply a list of patch operations (from diff_values) to data, and return the patched data """
+    for operation in patch:
+        path = operation["path"]
+        if not path:
+            # Replace entire value
+            data = copy.deepcopy(operation.get("value"))
+            continue
+
+        # Find parent of patched value
+        parent = data
+        for key in path[:-1]:
+            parent = parent[key]
+
+        if operation["op"] == "remove":
+            del parent[path[-1]]
+        else:
+            parent[path[-1]] = copy.deepcopy(operation.get("value"))
+    return data
+
 
 class UpdateAction:
     """A data structure representing a single update manager action,
@@ -60,33 +129,143 @@ class UpdateAction:
         self.key = key  # list which contains the path to the item, for example: ["clips",{"id":"123"}]
         self.values = values
         self.old_values = None
+        self.reverse_patch = None  # patch from values to old_values (used instead of old_values, once compacted)
         self.partial_update = partial_update
+        self.size = 0  # approximate size of serialized action (in bytes)
+        self.history_id = None  # line id of this action in the saved history file (if any)
+        self.actions = []  # list of grouped actions (for 'group' actions, created by transactions)
+
+    @property
+    def values(self):
+        """ New values (decompressed, if this action was compacted) """
+        if self._values_data is not None:
+            return json.loads(zlib.decompress(self._values_data).decode("utf-8"))
+        return self._values
+
+    @values.setter
+    def values(self, values):
+        self._values = values
+        self._values_data = None  # compressed JSON of values (used instead of values, once compacted)
+
+    @property
+    def old_values(self):
+        """ Previous values (rebuilt from the reverse patch, if this action was compacted) """
+        if self._old_values is None and self.reverse_patch is not None:
+            values = self.values if self._values_data is not None else copy.deepcopy(self._values)
+            return patch_values(values, self.reverse_patch)
+        return self._old_values
+
+    @old_values.setter
+    def old_values(self, old_vals):
+        self._old_values = old_vals
+        self.reverse_patch = None
 
     def set_old_values(self, old_vals):
         self.old_values = old_vals
 
-    def json(self, is_array=False, only_value=False):
-        """ Get the JSON string representing this UpdateAction """
+    def compact(self):
+        """ Reduce the memory used by this action (once it has been applied), by only keeping changed
+        values (compressed), and a patch to rebuild the old values (instead of a full copy). """
+        if self.type == "group":
+            for action in self.actions:
+                action.compact()
+            self.size = sum(action.size for action in self.actions)
+            return
 
-        # Build the dictionary to be serialized
+        if self._values_data is not None:
+            # Already compacted
+            return
+
+        if self.type == "update" and isinstance(self._values, dict) and isinstance(self._old_values, dict):
+            values = self._values
+            old_values = self._old_values
+
+            if "id" in values:
+                # Only keep top-level keys of objects (clips, effects, etc...) which changed (and the id)
+                values = {k: v for k, v in values.items() if k == "id" or k not in old_values or old_values[k] != v}
+            old_values = {k: old_values[k] for k in values if k in old_values}
+
+            # Store the (usually much smaller) patch to reverse the changed values
+            reverse_patch = diff_values(values, old_values)
+
+            # Store a compressed copy of the new values (which are only needed for redo, or saving history)
+            values_json = json.dumps(values).encode("utf-8")
+            self._values = None
+            self._values_data = zlib.compress(values_json)
+            self._old_values = None
+            self.reverse_patch = reverse_patch
+            self.size = len(self._values_data) + len(json.dumps(reverse_patch))
+        else:
+            # Track approximate size of action
+            self.size = len(json.dumps(self._values)) + len(json.dumps(self._old_values))
+
+    def expand(self):
+        """ Decompress the values of a compacted action (before it is applied again) """
+        for action in self.actions:
+            action.expand()
+        if self._values_data is not None:
+            reverse_patch = self.reverse_patch
+            self.values = self.values
+            self.reverse_patch = reverse_patch
+
+    def to_dict(self, only_value=False, compact=False, include_old_values=True):
+        """ Get a dictionary representing this UpdateAction (ready to be serialized). Values are not
+        copied, so the returned dictionary should not be modified. When compact is True, the reverse
+        patch (if any) is used instead of the full old values. """
+        if self.type == "group":
+            return {"type": self.type,
+                    "key": self.key,
+                    "actions": [action.to_dict(compact=compact, include_old_values=include_old_values)
+                                for action in self.actions]}
+
+        # Always remove 'history' key (if found). This prevents nested "history"
+        # attributes when a project dict is loaded.
+        values = self.values
+        if isinstance(values, dict) and "history" in values:
+            values = {k: v for k, v in values.items() if k != "history"}
         if only_value:
-            data_dict = copy.deepcopy(self.values)
+            return values
+
+        data_dict = {"type": self.type,
+                     "key": self.key,
+                     "value": values,
+                     "partial": self.partial_update}
+        if not include_old_values:
+            pass
+        elif compact and self._old_values is None and self.reverse_patch is not None:
+            data_dict["reverse_patch"] = self.reverse_patch
         else:
-            data_dict = {"type": self.type,
-                         "key": self.key,
-                         "value": copy.deepcopy(self.values),
-                         "partial": self.partial_update,
-                         "old_values": copy.deepcopy(self.old_values)}
-
-            # Always remove 'history' key (if found). This prevents nested "history"
-            # attributes when a project dict is loaded.
-            try:
-                if isinstance(data_dict.get("value"), dict) and "history" in data_dict.get("value"):
-                    data_dict.get("value").pop("history", None)
-                if isinstance(data_dict.get("old_values"), dict) and "history" in data_dict.get("old_values"):
-                    data_dict.get("old_values").pop("history", None)
-            except Exception as ex:
-                log.warning('Failed to clear history attribute from undo/redo data. {}'.format(ex))
+            old_values = self.old_values
+            if isinstance(old_values, dict) and "history" in old_values:
+                old_values = {k: v for k, v in old_values.items() if k != "history"}
+            data_dict["old_values"] = old_values
+        return data_dict
+
+    def load_dict(self, update_action_dict):
+        """ Load this UpdateAction from a dictionary (the values are used without copying) """
+
+        # Set the Update Action properties
+        self.type = update_action_dict.get("type")
+        self.key = update_action_dict.get("key")
+        self.values = update_action_dict.get("value")
+        self.old_values = update_action_dict.get("old_values")
+        self.reverse_patch = update_action_dict.get("reverse_patch")
+        self.partial_update = update_action_dict.get("partial")
+        self.actions = [UpdateAction().load_dict(action_dict) for action_dict in update_action_dict.get("actions", [])]
+
+        # Always remove 'history' key (if found). This prevents nested "history"
+        # attributes when a project dict is loaded.
+        if isinstance(self._values, dict):
+            self._values.pop("history", None)
+        if isinstance(self._old_values, dict):
+            self._old_values.pop("history", None)
+        return self
+
+    def json(self, is_array=False, only_value=False, include_old_values=True):
+        """ Get the JSON string representing this UpdateAction """
+
+        # Build the dictionary to be serialized
+        data_dict = self.to_dict(only_value=only_value, include_old_values=include_old_values)
 
         if not is_array:
             # Use a JSON Object as the root object
@@ -102,24 +281,7 @@ class UpdateAction:
         """ Load this UpdateAction from a JSON string """
 
         # Load JSON string
-        update_action_dict = json.loads(value, strict=False)
-
-        # Set the Update Action properties
-        self.type = update_action_dict.get("type")
-        self.key = update_action_dict.get("key")
-        self.values = update_action_dict.get("value")
-        self.old_values = update_action_dict.get("old_values")
-        self.partial_update = update_action_dict.get("partial")
-
-        # Always remove 'history' key (if found). This prevents nested "history"
-        # attributes when a project dict is loaded.
-        try:
-            if isinstance(self.values, dict) and "history" in self.values:
-                self.values.pop("history", None)
-            if isinstance(self.old_values, dict) and "history" in self.old_values:
-                self.old_values.pop("history", None)
-        except Exception as ex:
-            log.warning('Failed to clear history attribute from undo/redo data. {}'.format(ex))
+        self.load_dict(json.loads(value, strict=False))
 
 
 class UpdateManager:
@@ -136,38 +298,128 @@ class UpdateManager:
         self.ignore_history = False  # Ignore saving actions to history, to prevent a huge undo/redo list
         self.last_action = None  # The last action processed
         self.pending_action = None  # Last action not added to actionHistory list
+        self.history_size = 0  # Approximate size of actionHistory (in bytes)
+        self.history_size_limit = 0  # Max size of actionHistory (in bytes), 0 is unlimited
+        self.pending_history = None  # Saved history not loaded yet (loaded on the first undo or redo)
+        self.history_file = None  # History file which the history_id of each action refers to
+        self.history_file_next_id = 0  # Next available line id in the history file
+        self.history_file_count = 0  # Number of lines in the history file
+        self.transaction_depth = 0  # Number of open transactions (see transaction())
+        self.transaction_actions = []  # Actions performed in the current transaction
 
     def load_history(self, project):
-        """Load history from project"""
+        """Load history from project. The history is not parsed until it is needed (i.e. the first
+        undo or redo), and actions saved in a history file are only read at that point."""
         self.reset()
 
         # Get history from project data
-        history = project.get("history")
+        history = project.get("history") or {}
+        saved_file = history.get("file")
+        file_path = getattr(project, "current_filepath", None)
+        if saved_file and not (file_path and os.path.exists(get_history_path(file_path))):
+            # The project refers to a history file which is not available (i.e. the project was copied alone)
+            log.warning("History file of project %s is missing, %d undo and %d redo actions were lost" % (
+                file_path, len(saved_file.get("undo", [])), len(saved_file.get("redo", []))))
+            saved_file = None
+        if saved_file:
+            # Actions are saved in the history file (by line id)
+            self.history_file = get_history_path(file_path)
+            self.history_file_next_id = saved_file.get("next", 0)
+            self.history_file_count = saved_file.get("count", 0)
+            self.pending_history = {"undo": list(saved_file.get("undo", [])),
+                                    "redo": list(saved_file.get("redo", [])),
+                                    "project": project,
+                                    "file_path": file_path}
+        else:
+            # Actions are saved in the project data
+            self.pending_history = {"undo": list(history.get("undo", [])),
+                                    "redo": list(history.get("redo", []))}
+
+        # Notify watchers of new status
+        self.update_watchers()
+
+    def load_pending_history(self):
+        """Load the history (if any) which was not loaded yet by load_history()"""
+        pending = self.pending_history
+        if not pending:
+            return
+        self.pending_history = None
+
+        if "file_path" in pending:
+            # Read the saved actions from the history file
+            action_dicts = self.read_history_file(pending["project"], pending["file_path"],
+                                                  set(pending["undo"] + pending["redo"]))
+            redo_list = [action_dicts.get(history_id) for history_id in pending["redo"]]
+            undo_list = [action_dicts.get(history_id) for history_id in pending["undo"]]
+            missing_count = redo_list.count(None) + undo_list.count(None)
+            if missing_count:
+                log.warning("%d actions are missing from history file %s (the history file doesn't match the project)"
+                            % (missing_count, get_history_path(pending["file_path"])))
+            if None in redo_list:
+                # Redo actions (which come after the undo actions) must all be available
+                redo_list = []
+            if None in undo_list:
+                # Only keep the undo actions after the last missing one
+                undo_list = undo_list[len(undo_list) - undo_list[::-1].index(None):]
+        else:
+            redo_list = pending["redo"]
+            undo_list = pending["undo"]
 
         # Loop through each, and load serialized data into updateAction objects
         # Ignore any load actions or history update actions
-        for actionDict in history.get("redo", []):
-            action = UpdateAction()
-            action.load_json(json.dumps(actionDict))
-            if action.type != "load" and action.key[0] != "history":
-                self.redoHistory.append(action)
+        redo_actions = []
+        for actionDict in redo_list:
+            action = UpdateAction().load_dict(actionDict)
+            action.history_id = actionDict.get("history_id")
+            if action.type != "load" and action.key[:1] != ["history"]:
+                action.compact()
+                redo_actions.append(action)
             else:
                 log.info("Loading redo history, skipped key: %s" % str(action.key))
-        for actionDict in history.get("undo", []):
-            action = UpdateAction()
-            action.load_json(json.dumps(actionDict))
-            if action.type != "load" and action.key[0] != "history":
-                self.actionHistory.append(action)
+        undo_actions = []
+        for actionDict in undo_list:
+            action = UpdateAction().load_dict(actionDict)
+            action.history_id = actionDict.get("history_id")
+            if action.type != "load" and action.key[:1] != ["history"]:
+                action.compact()
+                self.history_size += action.size
+                undo_actions.append(action)
             else:
                 log.info("Loading undo history, skipped key: %s" % str(action.key))
 
-        # Notify watchers of new status
-        self.update_watchers()
+        # Saved actions are older than any actions performed since the project was loaded
+        self.redoHistory[:0] = redo_actions
+        self.actionHistory[:0] = undo_actions
+        self.trim_history()
 
-    def save_history(self, project, history_length):
-        """Save history to project"""
-        redo_list = []
-        undo_list = []
+    def read_history_file(self, project, file_path, history_ids):
+        """Read actions (by line id) from the history file of a project"""
+        action_dicts = {}
+        history_path = get_history_path(file_path)
+        try:
+            with open(history_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    history_id, _, contents = line.partition("\t")
+                    if not history_id.isdigit() or int(history_id) not in history_ids:
+                        # Only parse the actions which are needed
+                        continue
+                    try:
+                        action_dict = json.loads(contents, strict=False)
+                    except ValueError:
+                        log.warning("Skipping damaged history entry %s in %s" % (history_id, history_path))
+                        continue
+                    # Convert any paths to absolute
+                    action_dict = project.convert_paths_to_absolute(file_path, action_dict)
+                    action_dict["history_id"] = int(history_id)
+                    action_dicts[int(history_id)] = action_dict
+        except OSError as ex:
+            log.warning("Couldn't read history file %s: %s" % (history_path, ex))
+        return action_dicts
+
+    def save_history(self, project, history_length, file_path=None):
+        """Save history to project. If a project file_path is given, the actions are appended to a
+        history file next to the project (only actions which were not saved before are written),
+        and the project data only references them by line id."""
 
         # Loop through each updateAction object and serialize
         # Ignore any load actions or history update actions
@@ -175,33 +427,126 @@ class UpdateManager:
         if history_length_int == 0:
             self.update_untracked(["history"], {"redo": [], "undo": []})
             return
-        for action in self.redoHistory[-history_length_int:]:
-            if action.type != "load" and action.key[0] != "history":
-                actionDict = json.loads(action.json(), strict=False)
-                redo_list.append(actionDict)
-            else:
-                log.info("Saving redo history, skipped key: %s" % str(action.key))
-        for action in self.actionHistory[-history_length_int:]:
-            if action.type != "load" and action.key[0] != "history":
-                actionDict = json.loads(action.json(), strict=False)
-                undo_list.append(actionDict)
-            else:
-                log.info("Saving undo history, skipped key: %s" % str(action.key))
 
-        # Set history data in project
-        self.update_untracked(["history"], {"redo": redo_list, "undo": undo_list})
+        history_path = get_history_path(file_path) if file_path else None
+        pending = self.pending_history
+        if pending and not (history_path and "file_path" in pending and history_path == self.history_file):
+            # Saved history can only be passed through unparsed to the same history file
+            self.load_pending_history()
+            pending = None
+
+        if not history_path:
+            # Save full actions in the project data
+            redo_list = []
+            undo_list = []
+            for action in self.redoHistory[-history_length_int:]:
+                if action.type != "load" and action.key[:1] != ["history"]:
+                    redo_list.append(action.to_dict())
+                else:
+                    log.info("Saving redo history, skipped key: %s" % str(action.key))
+            for action in self.actionHistory[-history_length_int:]:
+                if action.type != "load" and action.key[:1] != ["history"]:
+                    undo_list.append(action.to_dict())
+                else:
+                    log.info("Saving undo history, skipped key: %s" % str(action.key))
+
+            # Set history data in project
+            self.update_untracked(["history"], {"redo": redo_list, "undo": undo_list})
+            return
+
+        if history_path != self.history_file or not os.path.exists(history_path):
+            # New history file (i.e. Save As), so all actions need to be written
+            self.history_file = history_path
+            self.history_file_next_id = 0
+            self.history_file_count = 0
+            for action in self.redoHistory + self.actionHistory:
+                action.history_id = None
+            if os.path.exists(history_path):
+                os.unlink(history_path)
+
+        # Append actions which have not been saved yet to the history file
+        redo_actions = [action for action in self.redoHistory[-history_length_int:]
+                        if action.type != "load" and action.key[:1] != ["history"]]
+        undo_actions = [action for action in self.actionHistory[-history_length_int:]
+                        if action.type != "load" and action.key[:1] != ["history"]]
+        lines = []
+        for action in redo_actions + undo_actions:
+            if action.history_id is None:
+                action.history_id = self.history_file_next_id
+                self.history_file_next_id += 1
+                # Convert any paths to relative
+                action_dict = project.convert_paths_to_relative(file_path, None, action.to_dict(compact=True))
+                contents = json.dumps(action_dict, ensure_ascii=False)
+                lines.append("%d\t%s\n" % (action.history_id, contents))
+        if lines:
+            with open(history_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+            self.history_file_count += len(lines)
+
+        # Saved actions not loaded yet (these are older than the actions in memory)
+        pending_redo = pending["redo"] if pending else []
+        pending_undo = pending["undo"] if pending else []
+        redo_ids = (pending_redo + [action.history_id for action in redo_actions])[-history_length_int:]
+        undo_ids = (pending_undo + [action.history_id for action in undo_actions])[-history_length_int:]
+
+        if self.history_file_count > 2 * (len(redo_ids) + len(undo_ids)) + 100:
+            # Remove unused actions from the history file
+            self.compact_history_file(set(redo_ids + undo_ids))
+
+        # Set history data in project (old versions will see an empty history)
+        self.update_untracked(["history"], {"redo": [], "undo": [], "file": {
+            "redo": redo_ids,
+            "undo": undo_ids,
+            "next": self.history_file_next_id,
+            "count": self.history_file_count}})
+
+    def compact_history_file(self, history_ids):
+        """Rewrite the history file, only keeping the actions still referenced by the project"""
+        temp_path = "%s.tmp" % self.history_file
+        count = 0
+        with open(self.history_file, "r", encoding="utf-8") as f, open(temp_path, "w", encoding="utf-8") as f_temp:
+            for line in f:
+                history_id = line.partition("\t")[0]
+                if history_id.isdigit() and int(history_id) in history_ids and line.endswith("\n"):
+                    f_temp.write(line)
+                    count += 1
+        os.replace(temp_path, self.history_file)
+        self.history_file_count = count
+        log.info("Compacted history file %s (%d actions)" % (self.history_file, count))
 
     def reset(self):
         """ Reset the UpdateManager, and clear all UpdateActions and History.
         This does not clear listeners and watchers. """
         self.actionHistory.clear()
         self.redoHistory.clear()
+        self.history_size = 0
+        self.pending_history = None
         self.pending_action = None
         self.last_action = None
 
         # Notify watchers of new history state
         self.update_watchers()
 
+    def compact_history(self, action):
+        """ Compact an action in the undo history (once it has been applied), and remove
+        the oldest actions if the history grows beyond history_size_limit. """
+        action.compact()
+        self.history_size += action.size
+        self.trim_history()
+
+    def trim_history(self):
+        """ Remove the oldest actions if the history grows beyond history_size_limit """
+        if not self.history_size_limit or self.history_size <= self.history_size_limit:
+            return
+        if self.pending_history:
+            # Saved actions (not loaded yet) are the oldest, so they are removed first
+            self.pending_history["undo"] = []
+
+        # Limit size of history (always keep the latest action)
+        while self.history_size > self.history_size_limit and len(self.actionHistory) > 1:
+            oldest_action = self.actionHistory.pop(0)
+            self.history_size -= oldest_action.size
+
     def add_listener(self, listener, index=-1):
         """ Add a new listener (which will invoke the changed(action) method
         each time an UpdateAction is available). """
@@ -228,7 +573,9 @@ class UpdateManager:
     def update_watchers(self):
         """ Notify all watchers if any 'undo' or 'redo' actions are available. """
 
-        new_status = (len(self.actionHistory) >= 1, len(self.redoHistory) >= 1)
+        pending = self.pending_history or {}
+        new_status = (len(self.actionHistory) + len(pending.get("undo", [])) >= 1,
+                      len(self.redoHistory) + len(pending.get("redo", [])) >= 1)
         if self.currentStatus[0] != new_status[0] or self.currentStatus[1] != new_status[1]:
             for watcher in self.statusWatchers:
                 watcher.updateStatusChanged(*new_status)
@@ -240,6 +587,12 @@ class UpdateManager:
     # caused by actions.
     def get_reverse_action(self, action):
         """ Convert an UpdateAction into the opposite type (i.e. 'insert' becomes an 'delete') """
+        if action.type == "group":
+            # Reverse each grouped action (in the opposite order)
+            reverse = UpdateAction(action.type, action.key)
+            reverse.actions = [self.get_reverse_action(grouped_action) for grouped_action in reversed(action.actions)]
+            return reverse
+
         reverse = UpdateAction(action.type, action.key, action.values, action.partial_update)
         # On adds, setup remove
         if action.type == "insert":
@@ -265,10 +618,13 @@ class UpdateManager:
 
     def undo(self):
         """ Undo the last UpdateAction (and notify all listeners and watchers) """
+        self.load_pending_history()
 
         if len(self.actionHistory) > 0:
             # Get last action from history (remove)
             last_action = copy.deepcopy(self.actionHistory.pop())
+            self.history_size -= last_action.size
+            last_action.expand()
 
             self.redoHistory.append(last_action)
             self.pending_action = None
@@ -278,34 +634,101 @@ class UpdateManager:
 
     def redo(self):
         """ Redo the last UpdateAction (and notify all listeners and watchers) """
+        self.load_pending_history()
 
         if len(self.redoHistory) > 0:
             # Get last undone action off redo history (remove)
             next_action = copy.deepcopy(self.redoHistory.pop())
+            next_action.expand()
 
             # Remove ID from insert (if found)
-            if next_action.type == "insert" and isinstance(next_action.key[-1], dict) and "id" in next_action.key[-1]:
-                next_action.key = next_action.key[:-1]
+            for action in next_action.actions or [next_action]:
+                if action.type == "insert" and isinstance(action.key[-1], dict) and "id" in action.key[-1]:
+                    action.key = action.key[:-1]
 
             self.actionHistory.append(next_action)
             self.pending_action = None
             # Perform next redo action
             self.dispatch_action(next_action)
+            self.compact_history(next_action)
 
     # Carry out an action on all listeners
-    def dispatch_action(self, action):
-        """ Distribute changes to all listeners (by calling their changed() method) """
+    def dispatch_action(self, action, listeners=None):
+        """ Distribute changes to all listeners (by calling their changed() method).
+        Grouped actions are passed to each listener as a single batch. """
 
         try:
             # Loop through all listeners
-            for listener in self.updateListeners:
+            for listener in listeners if listeners is not None else self.updateListeners:
                 # Invoke change method on listener
-                listener.changed(action)
+                if action.type == "group":
+                    listener.changed_batch(action.actions)
+                else:
+                    listener.changed(action)
 
         except Exception as ex:
             log.error("Couldn't apply '{}' to update listener: {}\n{}".format(action.type, listener, ex))
         self.update_watchers()
 
+    @contextmanager
+    def transaction(self):
+        """ Group all inserts, updates, and deletes made inside this context into a single
+        undo/redo step. Listeners with immediate_updates (i.e. the project data) receive each
+        change right away, and all other listeners receive one batch when the context exits. """
+        self.transaction_depth += 1
+        try:
+            yield self
+        finally:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.end_transaction()
+
+    def end_transaction(self):
+        """ Add the actions of a transaction to the history (as a single action),
+        and distribute them to the remaining listeners """
+        actions = self.transaction_actions
+        self.transaction_actions = []
+        if not actions:
+            return
+
+        if len(actions) == 1:
+            action = actions[0]
+        else:
+            action = UpdateAction("group", [])
+            action.actions = actions
+        self.actionHistory.append(action)
+        self.dispatch_action(action, [listener for listener in self.updateListeners if not listener.immediate_updates])
+        self.compact_history(action)
+
+    def perform_action(self, action, clear_redo=True):
+        """ Add a new action to the history (clearing any redo history), and distribute it to all listeners.
+        Inside a transaction, the action is only distributed to listeners with immediate_updates. """
+
+        self.last_action = action
+        if self.ignore_history:
+            # Untracked changes are never part of a transaction
+            self.pending_action = action
+            self.dispatch_action(action)
+            return
+
+        if clear_redo:
+            self.clear_redo_history()
+        self.pending_action = None
+        if self.transaction_depth:
+            self.transaction_actions.append(action)
+            self.dispatch_action(action, [listener for listener in self.updateListeners if listener.immediate_updates])
+            return
+
+        self.actionHistory.append(action)
+        self.dispatch_action(action)
+        self.compact_history(action)
+
+    def clear_redo_history(self):
+        """ Clear the redo history (including any saved redo actions not loaded yet) """
+        self.redoHistory.clear()
+        if self.pending_history:
+            self.pending_history["redo"] = []
+
     # Perform load action (loading all project data), clearing history for taking a new path
     def load(self, values):
         """ Load all project data via an UpdateAction into the UpdateManager
@@ -314,6 +737,8 @@ class UpdateManager:
         self.last_action = UpdateAction('load', '', values)
         self.redoHistory.clear()
         self.actionHistory.clear()
+        self.history_size = 0
+        self.pending_history = None
         self.pending_action = None
         self.dispatch_action(self.last_action)
 
@@ -322,29 +747,15 @@ class UpdateManager:
         """ Insert a new UpdateAction into the UpdateManager
         (this action will then be distributed to all listeners) """
 
-        self.last_action = UpdateAction('insert', key, values)
-        if self.ignore_history:
-            self.pending_action = self.last_action
-        else:
-            self.redoHistory.clear()
-            self.pending_action = None
-            self.actionHistory.append(self.last_action)
-        self.dispatch_action(self.last_action)
+        self.perform_action(UpdateAction('insert', key, values))
 
     def update(self, key, values, partial_update=False):
         """ Update the UpdateManager with an UpdateAction
         (this action will then be distributed to all listeners) """
 
-        self.last_action = UpdateAction('update', key, values, partial_update)
-        if self.ignore_history:
-            self.pending_action = self.last_action
-        else:
-            if self.last_action.key and self.last_action.key[0] != "history":
-                # Clear redo history for any update except a "history" update
-                self.redoHistory.clear()
-            self.pending_action = None
-            self.actionHistory.append(self.last_action)
-        self.dispatch_action(self.last_action)
+        # Clear redo history for any update except a "history" update
+        self.perform_action(UpdateAction('update', key, values, partial_update),
+                            clear_redo=bool(key) and key[0] != "history")
 
     def update_untracked(self, key, values, partial_update=False):
         """ Update the UpdateManager with an UpdateAction, without creating
@@ -361,20 +772,14 @@ class UpdateManager:
         """ Delete an item from the UpdateManager with an UpdateAction
         (this action will then be distributed to all listeners) """
 
-        self.last_action = UpdateAction('delete', key)
-        if self.ignore_history:
-            self.pending_action = self.last_action
-        else:
-            self.redoHistory.clear()
-            self.pending_action = None
-            self.actionHistory.append(self.last_action)
-        self.dispatch_action(self.last_action)
+        self.perform_action(UpdateAction('delete', key))
 
     def apply_last_action_to_history(self, previous_value):
         """ Apply the last action to the history """
         if self.pending_action:
             self.pending_action.set_old_values(previous_value)
             self.actionHistory.append(self.pending_action)
+            self.compact_history(self.pending_action)
             self.last_action = self.pending_action
             self.pending_action = None
 
@@ -25,74 +25,492 @@
  along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
  """
 
-import platform
+import hashlib
+import multiprocessing
+import os
+import struct
+import sys
 import threading
-from copy import deepcopy
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import openshot  # Python module for libopenshot (required video editing module installed separately)
+
 from classes import info
 from classes.app import get_app
 from classes.logger import log
 from classes import settings
-import openshot
-
-
-# Get settings
-s = settings.get_settings()
-
-
-def get_audio_data(clip_id, file_path, channel_filter, volume_keyframe):
-    """Get a Clip object form libopenshot, and grab audio data"""
-    clip = openshot.Clip(file_path)
-    clip.Open()
-
-    # Disable video stream (for speed improvement)
-    clip.Reader().info.has_video = False
-
-    log.info("Clip loaded, start thread")
-    t = threading.Thread(target=get_waveform_thread, args=[clip, clip_id, file_path, channel_filter, volume_keyframe])
-    t.daemon = True
-    t.start()
-
-def get_waveform_thread(clip, clip_id, file_path, channel_filter=-1, volume_keyframe=None):
-    """Get the audio data from a clip in a separate thread"""
-    audio_data = []
-    sample_rate = clip.Reader().info.sample_rate
-
-    # How many samples per second do we need (to approximate the waveform)
-    samples_per_second = 20
-    sample_divisor = round(sample_rate / samples_per_second)
-    log.info("Getting waveform for sample rate: %s" % sample_rate)
-
-    sample = 0
-    for frame_number in range(1, clip.Reader().info.video_length):
-        # Get frame object
-        frame = clip.Reader().GetFrame(frame_number)
-
-        # Get volume for this frame
-        volume = 1.0
-        if volume_keyframe:
-            volume = volume_keyframe.GetValue(frame_number)
-
-        # Loop through samples in frame (hopping through it to get X # of data points per second)
-        while True:
-            # Determine amount of range
-            magnitude_range = sample_divisor
-            if sample + magnitude_range > frame.GetAudioSamplesCount():
-                magnitude_range = frame.GetAudioSamplesCount() - sample
-
-            # Get audio data for this channel
-            if sample < frame.GetAudioSamplesCount():
-                audio_data.append(frame.GetAudioSample(channel_filter, sample, magnitude_range) * volume)
-            else:
-                # Adjust starting sample for next frame
-                sample = max(0, sample - frame.GetAudioSamplesCount())
-                break # We are done with this frame
-
-            # Jump to next sample needed
-            sample += sample_divisor
-
-    # Close reader
-    clip.Close()
-
-    # Emit signal when done
-    log.info("get_waveform_thread completed")
-    get_app().window.WaveformReady.emit(clip_id, audio_data)
+from classes.readers import reader_pool
+from classes.waveform_decoder import decode_waveform_chunk
+
+# Samples per second of the most detailed waveform level
+WAVEFORM_SAMPLES_PER_SECOND = 200
+
+# Each waveform level has 1/4 of the samples of the previous level (i.e. 200, 50, 12.5, 3.125 per second)
+WAVEFORM_LEVEL_FACTOR = 4
+WAVEFORM_LEVELS = 4
+
+# Peaks are saved as unsigned 16-bit integers (0.0 - 4.0)
+WAVEFORM_PEAK_SCALE = 16384.0
+
+# Header of saved waveform files: magic, fps, samples per second, level factor, and number of levels
+WAVEFORM_FILE_MAGIC = b"OSWAVE01"
+WAVEFORM_FILE_HEADER = struct.Struct("<8sddII")
+
+# Max number of waveforms kept in memory
+WAVEFORM_MEMORY_CACHE_SIZE = 16
+
+# Seconds of audio decoded by each waveform job (so partial waveforms can be shown)
+WAVEFORM_CHUNK_SECONDS = 60
+
+# Default number of worker processes decoding waveforms
+WAVEFORM_WORKERS = 2
+
+# Min seconds between partial waveforms sent to clips (while a waveform is decoding)
+WAVEFORM_PROGRESS_INTERVAL = 2.0
+
+
+class WaveformPeaks:
+    """ Multi-resolution (mip-map style) audio peaks of a media file. The first level has
+    WAVEFORM_SAMPLES_PER_SECOND peaks per second, and each following level keeps the max of
+    every WAVEFORM_LEVEL_FACTOR peaks of the previous level. """
+
+    def __init__(self, fps, samples_per_second, levels, level_factor=WAVEFORM_LEVEL_FACTOR):
+        self.fps = fps
+        self.samples_per_second = samples_per_second
+        self.level_factor = level_factor
+        self.levels = levels  # List of array('H') of scaled peaks
+
+    @classmethod
+    def from_peaks(cls, fps, samples_per_second, peaks):
+        """ Create all levels from a list of peaks (floats) """
+        level = array("H", (min(65535, int(round(abs(peak) * WAVEFORM_PEAK_SCALE))) for peak in peaks))
+        levels = [level]
+        for _ in range(1, WAVEFORM_LEVELS):
+            level = array("H", (max(level[index:index + WAVEFORM_LEVEL_FACTOR])
+                                for index in range(0, len(level), WAVEFORM_LEVEL_FACTOR)))
+            levels.append(level)
+        return cls(fps, samples_per_second, levels)
+
+    @classmethod
+    def load(cls, path):
+        """ Load peaks from a waveform file """
+        with open(path, "rb") as f:
+            magic, fps, samples_per_second, level_factor, level_count = WAVEFORM_FILE_HEADER.unpack(
+                f.read(WAVEFORM_FILE_HEADER.size))
+            if magic != WAVEFORM_FILE_MAGIC:
+                raise ValueError("Invalid waveform file: %s" % path)
+            levels = []
+            for _ in range(level_count):
+                count = struct.unpack("<I", f.read(4))[0]
+                level = array("H")
+                level.frombytes(f.read(count * level.itemsize))
+                if sys.byteorder == "big":
+                    level.byteswap()
+                levels.append(level)
+        return cls(fps, samples_per_second, levels, level_factor)
+
+    def save(self, path):
+        """ Save peaks to a waveform file (written to a temp file first, so readers never see a partial file) """
+        temp_path = "%s.%s.tmp" % (path, threading.get_ident())
+        with open(temp_path, "wb") as f:
+            f.write(WAVEFORM_FILE_HEADER.pack(WAVEFORM_FILE_MAGIC, self.fps, self.samples_per_second,
+                                              self.level_factor, len(self.levels)))
+            for level in self.levels:
+                if sys.byteorder == "big":
+                    level = array("H", level)
+                    level.byteswap()
+                f.write(struct.pack("<I", len(level)))
+                f.write(level.tobytes())
+        os.replace(temp_path, path)
+
+    def get_level_index(self, samples_per_second):
+        """ Get the least detailed level which still has at least samples_per_second """
+        level_index = 0
+        for index in range(1, len(self.levels)):
+            if self.samples_per_second / self.level_factor ** index >= samples_per_second:
+                level_index = index
+        return level_index
+
+    def get_level(self, samples_per_second):
+        """ Get the peaks (floats) and samples per second of the level for a given level of detail """
+        level_index = self.get_level_index(samples_per_second)
+        level_samples_per_second = self.samples_per_second / self.level_factor ** level_index
+        audio_data = [value / WAVEFORM_PEAK_SCALE for value in self.levels[level_index]]
+        return audio_data, level_samples_per_second
+
+
+def get_partial_level(peaks, samples_per_second):
+    """ Reduce the peaks of a partial waveform (with WAVEFORM_SAMPLES_PER_SECOND) to the same level
+    of detail which WaveformPeaks.get_level() uses for a finished waveform """
+    factor = 1
+    while factor < WAVEFORM_LEVEL_FACTOR ** (WAVEFORM_LEVELS - 1) and \
+            WAVEFORM_SAMPLES_PER_SECOND / (factor * WAVEFORM_LEVEL_FACTOR) >= samples_per_second:
+        factor *= WAVEFORM_LEVEL_FACTOR
+    if factor == 1:
+        return peaks, WAVEFORM_SAMPLES_PER_SECOND
+    reduced = [max(peaks[index:index + factor]) for index in range(0, len(peaks), factor)]
+    return reduced, WAVEFORM_SAMPLES_PER_SECOND / factor
+
+
+# Recently used waveforms (by waveform file path)
+waveform_memory_cache = OrderedDict()
+waveform_memory_lock = threading.Lock()
+
+
+def get_waveform_path(file_path, channel_filter):
+    """ Get the path of the saved waveform of a media file. The file name is a hash of the
+    path, modified time, and size of the media file (so changed files get a new waveform). """
+    stat = os.stat(file_path)
+    key = "%s|%s|%s|%s" % (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, channel_filter)
+    return os.path.join(info.WAVEFORM_PATH, "%s.peaks" % hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+
+def get_waveform_samples_per_second(pixels_per_second):
+    """ Get the samples per second of the waveform level used for a timeline zoom level """
+    level_index = 0
+    for index in range(1, WAVEFORM_LEVELS):
+        if WAVEFORM_SAMPLES_PER_SECOND / WAVEFORM_LEVEL_FACTOR ** index >= pixels_per_second:
+            level_index = index
+    return WAVEFORM_SAMPLES_PER_SECOND / WAVEFORM_LEVEL_FACTOR ** level_index
+
+
+def get_cached_waveform(waveform_path):
+    """ Get the saved waveform peaks of a media file (from memory or disk), or None """
+    with waveform_memory_lock:
+        peaks = waveform_memory_cache.get(waveform_path)
+        if peaks:
+            waveform_memory_cache.move_to_end(waveform_path)
+            return peaks
+
+    peaks = None
+    if os.path.exists(waveform_path):
+        try:
+            peaks = WaveformPeaks.load(waveform_path)
+        except (OSError, ValueError, struct.error):
+            log.warning("Failed to load waveform file: %s" % waveform_path, exc_info=1)
+    if peaks:
+        cache_waveform(waveform_path, peaks)
+    return peaks
+
+
+def cache_waveform(waveform_path, peaks):
+    """ Keep waveform peaks in memory (the least recently used ones are removed) """
+    with waveform_memory_lock:
+        waveform_memory_cache[waveform_path] = peaks
+        while len(waveform_memory_cache) > WAVEFORM_MEMORY_CACHE_SIZE:
+            waveform_memory_cache.popitem(last=False)
+
+
+def apply_volume(audio_data, samples_per_second, fps, volume_keyframe):
+    """ Scale audio data by the volume keyframe of a clip (the volume of each frame) """
+    if not volume_keyframe:
+        return audio_data
+    if volume_keyframe.GetCount() <= 1:
+        volume = volume_keyframe.GetValue(1)
+        return [value * volume for value in audio_data]
+
+    frames_per_sample = fps / samples_per_second
+    volumes = {}
+    scaled_data = []
+    for index, value in enumerate(audio_data):
+        frame_number = int(index * frames_per_sample) + 1
+        volume = volumes.get(frame_number)
+        if volume is None:
+            volume = volumes[frame_number] = volume_keyframe.GetValue(frame_number)
+        scaled_data.append(value * volume)
+    return scaled_data
+
+
+def copy_keyframe(keyframe):
+    """ Copy a keyframe (the keyframe of a timeline clip is freed when the clip is deleted, or the
+    timeline is reloaded, so it can't be used later from another thread) """
+    if not keyframe:
+        return None
+    keyframe_copy = openshot.Keyframe()
+    keyframe_copy.SetJson(keyframe.Json())
+    return keyframe_copy
+
+
+class WaveformRequest:
+    """ The waveform of a media file requested by a timeline clip """
+
+    def __init__(self, clip_id, file_path, channel_filter, volume_keyframe, samples_per_second):
+        self.clip_id = clip_id
+        self.file_path = file_path
+        self.channel_filter = channel_filter
+        self.volume_keyframe = volume_keyframe
+        self.samples_per_second = samples_per_second
+        self.job = None
+        self.cancelled = False
+
+
+class WaveformJob:
+    """ The audio of a media file being decoded (in chunks, by the worker processes). Each
+    chunk has the peaks of a range of frames, and the partial waveform is shown as chunks
+    are finished. """
+
+    def __init__(self, waveform_path, file_path, channel_filter, fps, video_length):
+        self.waveform_path = waveform_path
+        self.file_path = file_path
+        self.channel_filter = channel_filter
+        self.fps = fps
+        self.requests = []
+        self.futures = []
+        self.cancelled = False
+
+        # Split frames into chunks (the last frame is not decoded, as before)
+        chunk_frames = max(1, int(round(WAVEFORM_CHUNK_SECONDS * fps)))
+        self.chunks = [(start_frame, min(start_frame + chunk_frames, video_length))
+                       for start_frame in range(1, video_length, chunk_frames)]
+        self.chunk_peaks = [None] * len(self.chunks)
+        self.finished_count = 0
+        self.progress_time = 0.0  # Last time a partial waveform was sent
+
+    def get_peak_index(self, frame_number):
+        """ Get the index of the first peak of a frame (in the full waveform) """
+        return int(round((frame_number - 1) / self.fps * WAVEFORM_SAMPLES_PER_SECOND))
+
+    def get_peaks(self):
+        """ Get the peaks decoded so far (unfinished chunks are silent). Each chunk has its own
+        peak grid, so chunks are trimmed or padded to their expected length, to keep later
+        chunks aligned with their frames. """
+        peaks = []
+        for (start_frame, end_frame), chunk_peaks in zip(self.chunks, self.chunk_peaks):
+            count = self.get_peak_index(end_frame) - self.get_peak_index(start_frame)
+            chunk_peaks = list(chunk_peaks or [])[:count]
+            chunk_peaks.extend([chunk_peaks[-1] if chunk_peaks else 0.0] * (count - len(chunk_peaks)))
+            peaks.extend(chunk_peaks)
+        return peaks
+
+    def cancel(self):
+        """ Cancel chunks which have not started yet """
+        self.cancelled = True
+        for future in self.futures:
+            future.cancel()
+
+
+class WaveformScheduler:
+    """ Generates the waveforms of many clips, without blocking the UI. The audio of each
+    media file is only decoded once (even if many clips use it), in chunks, using a bounded
+    pool of worker processes (so many clips never open many decoders at once). Requests are
+    cancelled when a clip is hidden or deleted, and partial waveforms are shown as chunks
+    are finished. """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.requests = {}  # Active requests (by clip id)
+        self.jobs = {}  # Active jobs (by waveform file path)
+        self.decode_pool = None
+
+        # Cache lookups, planning jobs, and applying volume curves (one at a time, in order)
+        self.request_pool = ThreadPoolExecutor(max_workers=1)
+
+    def get_decode_pool(self):
+        """ Get the pool of worker processes (started when first needed) """
+        if not self.decode_pool:
+            max_workers = int(settings.get_settings().get("waveform-workers") or WAVEFORM_WORKERS)
+            try:
+                # Spawn workers (forking a process with Qt and libopenshot threads is not safe)
+                self.decode_pool = ProcessPoolExecutor(
+                    max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError, NotImplementedError):
+                log.warning("Failed to start waveform worker processes, using threads", exc_info=1)
+                self.decode_pool = ThreadPoolExecutor(max_workers=max_workers)
+            log.info("Started %s waveform workers" % max_workers)
+        return self.decode_pool
+
+    def request(self, clip_id, file_path, channel_filter, volume_keyframe, samples_per_second):
+        """ Request the waveform of a clip (replacing any earlier request for the same clip) """
+        log.info("Getting waveform data for clip: %s" % clip_id)
+        request = WaveformRequest(clip_id, file_path, channel_filter, copy_keyframe(volume_keyframe), samples_per_second)
+        with self.lock:
+            old_request = self.requests.get(clip_id)
+            job = old_request.job if old_request else None
+            if job and self.jobs.get(job.waveform_path) is job and old_request in job.requests and \
+                    (old_request.file_path, old_request.channel_filter) == (file_path, channel_filter):
+                # Same waveform (i.e. a new zoom level or volume): keep the running job, and only replace the request
+                old_request.cancelled = True
+                job.requests[job.requests.index(old_request)] = request
+                request.job = job
+                self.requests[clip_id] = request
+                if job.finished_count:
+                    self.request_pool.submit(self.send_partial, request, job)
+                return
+
+            self.cancel(clip_id)
+            self.requests[clip_id] = request
+        self.request_pool.submit(self.start_request, request)
+
+    def start_request(self, request):
+        """ Send a cached waveform, or add the request to a (new or running) job """
+        if request.cancelled:
+            return
+        try:
+            waveform_path = get_waveform_path(request.file_path, request.channel_filter)
+            peaks = get_cached_waveform(waveform_path)
+            if peaks:
+                self.finish_request(request, peaks)
+                return
+
+            with self.lock:
+                job = self.jobs.get(waveform_path)
+            if not job:
+                # Probe the file (outside of the lock, since this can be slow)
+                with reader_pool.reader(request.file_path, video=False) as clip:
+                    fps = clip.Reader().info.fps.ToFloat()
+                    video_length = clip.Reader().info.video_length
+
+            with self.lock:
+                if request.cancelled:
+                    return
+                job = self.jobs.get(waveform_path)
+                if not job:
+                    job = self.start_job(WaveformJob(waveform_path, request.file_path, request.channel_filter, fps, video_length))
+                job.requests.append(request)
+                request.job = job
+
+            # Show the progress of a running job right away
+            self.send_partial(request, job)
+        except Exception:
+            log.error("Failed to get waveform for clip: %s" % request.clip_id, exc_info=1)
+            with self.lock:
+                if self.requests.get(request.clip_id) is request:
+                    self.requests.pop(request.clip_id)
+
+    def send_partial(self, request, job):
+        """ Send the partial waveform of a running job to a clip (if any chunks are finished) """
+        with self.lock:
+            if job.cancelled or not job.finished_count or job.finished_count == len(job.chunks):
+                return
+            partial_peaks = job.get_peaks()
+        audio_data, level_samples_per_second = get_partial_level(partial_peaks, request.samples_per_second)
+        self.send(request, audio_data, job.fps, level_samples_per_second)
+
+    def start_job(self, job):
+        """ Queue the chunks of a job on the worker processes (the lock must be held) """
+        self.jobs[job.waveform_path] = job
+        decode_pool = self.get_decode_pool()
+        for index, (start_frame, end_frame) in enumerate(job.chunks):
+            future = decode_pool.submit(decode_waveform_chunk, job.file_path, job.channel_filter,
+                                        WAVEFORM_SAMPLES_PER_SECOND, start_frame, end_frame)
+            future.add_done_callback(partial(self.chunk_finished, job, index))
+            job.futures.append(future)
+        log.info("Decoding waveform of %s in %s chunks" % (job.file_path, len(job.chunks)))
+
+        if not job.chunks:
+            # Nothing to decode
+            self.request_pool.submit(self.finish_job, job)
+        return job
+
+    def chunk_finished(self, job, index, future):
+        """ Callback when a chunk is decoded (called from a pool thread) """
+        if future.cancelled() or job.cancelled:
+            return
+        try:
+            chunk_peaks = future.result()
+        except Exception:
+            log.error("Failed to decode waveform of %s (frames %s-%s)" % ((job.file_path,) + job.chunks[index]), exc_info=1)
+            chunk_peaks = []
+
+        with self.lock:
+            job.chunk_peaks[index] = chunk_peaks
+            job.finished_count += 1
+            finished = job.finished_count == len(job.chunks)
+
+            # Limit how often partial waveforms are sent (each one redraws the clips)
+            now = time.monotonic()
+            send_progress = not finished and now - job.progress_time >= WAVEFORM_PROGRESS_INTERVAL
+            if send_progress:
+                job.progress_time = now
+        if finished:
+            self.request_pool.submit(self.finish_job, job)
+        else:
+            log.debug("Waveform of %s: %s/%s chunks" % (job.file_path, job.finished_count, len(job.chunks)))
+            if send_progress:
+                self.request_pool.submit(self.send_progress, job)
+
+    def send_progress(self, job):
+        """ Send the partial waveform of a job to its clips """
+        with self.lock:
+            if job.cancelled:
+                return
+            peaks = job.get_peaks()
+            requests = list(job.requests)
+
+        # Reduce peaks to the level of detail of each clip (once per level)
+        levels = {}
+        for request in requests:
+            if request.samples_per_second not in levels:
+                levels[request.samples_per_second] = get_partial_level(peaks, request.samples_per_second)
+            audio_data, level_samples_per_second = levels[request.samples_per_second]
+            self.send(request, audio_data, job.fps, level_samples_per_second)
+
+    def finish_job(self, job):
+        """ Save the finished waveform of a job, and send it to its clips """
+        with self.lock:
+            if job.cancelled:
+                return
+            peaks = WaveformPeaks.from_peaks(job.fps, WAVEFORM_SAMPLES_PER_SECOND, job.get_peaks())
+            self.jobs.pop(job.waveform_path, None)
+            requests = list(job.requests)
+
+        try:
+            peaks.save(job.waveform_path)
+        except OSError:
+            log.warning("Failed to save waveform file: %s" % job.waveform_path, exc_info=1)
+        cache_waveform(job.waveform_path, peaks)
+
+        for request in requests:
+            self.finish_request(request, peaks)
+
+    def finish_request(self, request, peaks):
+        """ Send the finished waveform to a clip """
+        audio_data, level_samples_per_second = peaks.get_level(request.samples_per_second)
+        self.send(request, audio_data, peaks.fps, level_samples_per_second)
+        with self.lock:
+            if self.requests.get(request.clip_id) is request:
+                self.requests.pop(request.clip_id)
+        log.info("Waveform completed for clip: %s" % request.clip_id)
+
+    def send(self, request, audio_data, fps, samples_per_second):
+        """ Apply the volume curve of a clip, and emit the waveform (if the request is still active) """
+        if request.cancelled:
+            return
+        audio_data = apply_volume(audio_data, samples_per_second, fps, request.volume_keyframe)
+        if not request.cancelled:
+            get_app().window.WaveformReady.emit(request.clip_id, audio_data, samples_per_second)
+
+    def cancel(self, clip_id):
+        """ Cancel the waveform request of a clip (and the job, if no other clip needs it) """
+        with self.lock:
+            request = self.requests.pop(clip_id, None)
+            if not request:
+                return
+            request.cancelled = True
+            job = request.job
+            if job and request in job.requests:
+                job.requests.remove(request)
+                if not job.requests:
+                    log.info("Cancelling waveform of %s" % job.file_path)
+                    job.cancel()
+                    if self.jobs.get(job.waveform_path) is job:
+                        self.jobs.pop(job.waveform_path)
+
+    def cancel_all(self):
+        """ Cancel all waveform requests (i.e. when a project is loaded) """
+        with self.lock:
+            for clip_id in list(self.requests.keys()):
+                self.cancel(clip_id)
+
+
+# Waveform jobs of the timeline
+waveform_scheduler = WaveformScheduler()
+
+
+def get_audio_data(clip_id, file_path, channel_filter, volume_keyframe, samples_per_second=20):
+    """Get the waveform of a media file (in worker processes), and grab audio data for a clip"""
+    waveform_scheduler.request(clip_id, file_path, channel_filter, volume_keyframe, samples_per_second)
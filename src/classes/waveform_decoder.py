@@ -0,0 +1,148 @@
+"""
+ @file
+ @brief This file has code to decode the audio peaks of media files (safe to use in worker processes)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import ctypes
+
+from classes.logger import log
+from classes.readers import reader_pool
+
+# Use NumPy (if available) to find audio peaks much faster
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of frames decoded before their audio peaks are found (when using NumPy)
+WAVEFORM_FRAME_BATCH = 64
+
+
+def decode_waveform_chunk(file_path, channel_filter, samples_per_second, start_frame, end_frame):
+    """Get the audio peaks of a range of frames of a media file. This runs in a worker process
+    (so it only uses modules which don't need the Qt application), and each worker reuses its
+    open readers for the following chunks of the same file."""
+    with reader_pool.reader(file_path, video=False) as clip:
+        return get_waveform_data(clip, channel_filter, samples_per_second,
+                                 start_frame=start_frame, end_frame=end_frame)
+
+
+def get_waveform_data(clip, channel_filter=-1, samples_per_second=20, use_numpy=True, start_frame=1, end_frame=None):
+    """Get the audio peaks (samples_per_second) from an open clip (of the frames from start_frame up to end_frame)"""
+    if end_frame is None:
+        end_frame = clip.Reader().info.video_length
+    if numpy and use_numpy:
+        try:
+            return get_waveform_data_numpy(clip, channel_filter, samples_per_second, start_frame, end_frame)
+        except (TypeError, ValueError, AttributeError):
+            log.warning("Failed to get audio samples with NumPy, using slower method", exc_info=1)
+
+    audio_data = []
+    sample_rate = clip.Reader().info.sample_rate
+
+    # How many samples per second do we need (to approximate the waveform)
+    sample_divisor = round(sample_rate / samples_per_second)
+    log.info("Getting waveform for sample rate: %s" % sample_rate)
+
+    sample = 0
+    for frame_number in range(start_frame, end_frame):
+        # Get frame object
+        frame = clip.Reader().GetFrame(frame_number)
+
+        # Loop through samples in frame (hopping through it to get X # of data points per second)
+        while True:
+            # Determine amount of range
+            magnitude_range = sample_divisor
+            if sample + magnitude_range > frame.GetAudioSamplesCount():
+                magnitude_range = frame.GetAudioSamplesCount() - sample
+
+            # Get audio data for this channel
+            if sample < frame.GetAudioSamplesCount():
+                audio_data.append(frame.GetAudioSample(channel_filter, sample, magnitude_range))
+            else:
+                # Adjust starting sample for next frame
+                sample = max(0, sample - frame.GetAudioSamplesCount())
+                break # We are done with this frame
+
+            # Jump to next sample needed
+            sample += sample_divisor
+
+    return audio_data
+
+
+def get_frame_samples(frame, channel):
+    """Get a copy of the audio samples of one channel of a frame (as a NumPy array)"""
+    sample_count = frame.GetAudioSamplesCount()
+    if sample_count <= 0:
+        return numpy.zeros(0, dtype=numpy.float32)
+
+    # Wrap the float* returned by libopenshot, and copy it (since the frame owns the buffer)
+    samples_buffer = (ctypes.c_float * sample_count).from_address(int(frame.GetAudioSamples(channel)))
+    return numpy.frombuffer(samples_buffer, dtype=numpy.float32).copy()
+
+
+def reduce_peaks(samples, bucket_size):
+    """Get the peak (max absolute value) of each full bucket of samples, and the remaining samples"""
+    bucket_count = len(samples) // bucket_size
+    peaks = numpy.abs(samples[:bucket_count * bucket_size]).reshape(bucket_count, bucket_size).max(axis=1)
+    return peaks, samples[bucket_count * bucket_size:]
+
+
+def get_waveform_data_numpy(clip, channel_filter=-1, samples_per_second=20, start_frame=1, end_frame=None):
+    """Get the audio peaks (samples_per_second) from an open clip, by copying the audio
+    buffers of many frames at once and finding the peak of each bucket with NumPy"""
+    reader = clip.Reader()
+    sample_rate = reader.info.sample_rate
+    bucket_size = max(1, round(sample_rate / samples_per_second))
+    if end_frame is None:
+        end_frame = reader.info.video_length
+    log.info("Getting waveform (NumPy) for sample rate: %s" % sample_rate)
+
+    peaks = []
+    remaining = numpy.zeros(0, dtype=numpy.float32)
+    batch = [remaining]
+    for frame_number in range(start_frame, end_frame):
+        frame = reader.GetFrame(frame_number)
+
+        if channel_filter == -1:
+            # Peak of all channels (like GetAudioSample() with no channel filter)
+            channels = [get_frame_samples(frame, channel) for channel in range(frame.GetAudioChannelsCount())]
+            samples = numpy.abs(numpy.vstack(channels)).max(axis=0) if channels else numpy.zeros(0, dtype=numpy.float32)
+        else:
+            samples = get_frame_samples(frame, channel_filter)
+        batch.append(samples)
+
+        if len(batch) > WAVEFORM_FRAME_BATCH:
+            bucket_peaks, remaining = reduce_peaks(numpy.concatenate(batch), bucket_size)
+            peaks.append(bucket_peaks)
+            batch = [remaining]
+
+    # Last (possibly partial) bucket
+    bucket_peaks, remaining = reduce_peaks(numpy.concatenate(batch), bucket_size)
+    peaks.append(bucket_peaks)
+    if len(remaining):
+        peaks.append(numpy.abs(remaining).max(keepdims=True))
+
+    return numpy.concatenate(peaks).tolist()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+ @file
+ @brief This file is used to export OpenShot projects from the command line (without the UI)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2020 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import sys
+import os.path
+import argparse
+import json
+
+try:
+    from classes import info
+except ImportError:
+    import openshot_qt
+    sys.path.append(openshot_qt.OPENSHOT_PATH)
+    from classes import info
+
+
+def main():
+    """Export a project file (headless), i.e. openshot-qt-export project.osp video.mp4"""
+    from classes.export_engine import EXPORT_TYPES, EXPORT_VIDEO_AUDIO
+
+    parser = argparse.ArgumentParser(description='OpenShot export, version ' + info.SETUP['version'])
+    parser.add_argument('project', nargs='?', help='Project file (*.osp) to export')
+    parser.add_argument('output', nargs='?', help='Exported file path (or image sequence pattern, i.e. frame-%%05d.png)')
+    parser.add_argument('-s', '--settings', action='store',
+        help='JSON file with export settings (default: project profile, H.264 and AAC)')
+    parser.add_argument('-t', '--type', action='store', choices=EXPORT_TYPES, default=EXPORT_VIDEO_AUDIO,
+        help='Type of export')
+    parser.add_argument('--start', type=int, help='First frame to export')
+    parser.add_argument('--end', type=int, help='Last frame to export (default: end of timeline)')
+    parser.add_argument('--vcodec', action='store', help='Video codec')
+    parser.add_argument('--acodec', action='store', help='Audio codec')
+    parser.add_argument('--video-bitrate', type=int, help='Video bit rate (bits per second)')
+    parser.add_argument('--audio-bitrate', type=int, help='Audio bit rate (bits per second)')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+        help='Export in segments, using this many processes (segments are joined with ffmpeg)')
+    parser.add_argument('--prefetch', type=int,
+        help='Max number of frames composited ahead of the encoder (0 = off)')
+    parser.add_argument('--smart-render', action='store_true',
+        help='Copy untouched clips (already in the export codec, size and frame rate) without re-encoding')
+    parser.add_argument('--report', action='store_true',
+        help='Save a per-frame timing report next to the output (.export-report.json/.csv)')
+    parser.add_argument('-q', '--queue', action='store_true',
+        help='Add the export to the render queue (instead of exporting now)')
+    parser.add_argument('--run-queue', action='store_true',
+        help='Run (or resume) all queued exports, then exit')
+    parser.add_argument('--jobs', type=int, default=1,
+        help='Number of queued exports to run at once (with --run-queue)')
+    parser.add_argument('-d', '--debug', action='store_true',
+        help='Enable debugging output')
+    args = parser.parse_args()
+
+    if args.debug:
+        # The logger is already set up (by importing the export engine), so change its level
+        from classes import logger
+        logger.set_level_console('DEBUG')
+
+    if args.run_queue:
+        sys.exit(run_queue(args.jobs))
+    if not args.project or not args.output:
+        parser.error('the project and output arguments are required')
+
+    from classes.export_engine import (
+        ExportEngine, SegmentedExportEngine, SmartRenderEngine, load_project_file, get_default_export_settings
+    )
+
+    # Load project data (without creating the Qt application)
+    project_data = load_project_file(os.path.abspath(args.project))
+
+    # Export settings (from a settings file, or matching the project)
+    export_settings = get_default_export_settings(project_data, os.path.abspath(args.output), args.type)
+    if args.settings:
+        with open(args.settings, encoding="utf-8") as f:
+            file_settings = json.load(f)
+        export_settings["type"] = file_settings.get("type", export_settings["type"])
+        export_settings["video"].update(file_settings.get("video", {}))
+        export_settings["audio"].update(file_settings.get("audio", {}))
+
+    # Command line overrides
+    for group, key, value in [("video", "start_frame", args.start), ("video", "end_frame", args.end),
+                              ("video", "vcodec", args.vcodec), ("audio", "acodec", args.acodec),
+                              ("video", "video_bitrate", args.video_bitrate),
+                              ("audio", "audio_bitrate", args.audio_bitrate)]:
+        if value is not None:
+            export_settings[group][key] = value
+    if args.prefetch is not None:
+        export_settings["prefetch_frames"] = args.prefetch
+    if args.report:
+        export_settings["report"] = True
+
+    if args.queue:
+        from classes.render_queue import RenderQueue
+        job = RenderQueue().add(project_data, export_settings, processes=args.processes)
+        print("Added %s to the render queue (job %s)" % (args.output, job.id))
+        sys.exit(0)
+
+    def progress(frame, start_frame, end_frame, seconds_run):
+        """ Print export progress """
+        percentage = (frame - start_frame) * 100.0 / max(1, end_frame - start_frame)
+        fps = (frame - start_frame) / seconds_run if seconds_run else 0.0
+        print("\r%5.1f%% (frame %d of %d, %.2f FPS)" % (percentage, frame, end_frame, fps), end="", flush=True)
+
+    if args.smart_render:
+        engine = SmartRenderEngine(project_data, export_settings, progress_callback=progress,
+                                   processes=args.processes)
+    elif args.processes > 1:
+        engine = SegmentedExportEngine(project_data, export_settings, progress_callback=progress,
+                                       processes=args.processes)
+    else:
+        engine = ExportEngine(project_data, export_settings, progress_callback=progress)
+    try:
+        completed = engine.run()
+    except KeyboardInterrupt:
+        print("\nExport cancelled")
+        sys.exit(2)
+    except Exception as ex:
+        print("\nExport failed: %s" % ex)
+        sys.exit(1)
+
+    print("\nExported %s in %.1f seconds (%.2f FPS)" % (args.output, engine.elapsed, engine.frames_per_second))
+    if engine.encode_time:
+        print(engine.get_timing_summary())
+    if engine.report_path:
+        print(engine.report.get_summary_text())
+        print("Timing report saved: %s" % engine.report_path)
+    sys.exit(0 if completed else 2)
+
+
+def run_queue(max_running):
+    """ Run all queued (and interrupted) exports of the render queue """
+    from classes.render_queue import RenderQueue, JOB_RUNNING, JOB_FAILED
+
+    def job_changed(job):
+        if job.status != JOB_RUNNING:
+            print("%s: %s%s" % (job.name, job.status, " (%s)" % job.error if job.error else ""))
+
+    queue = RenderQueue(max_running=max_running, job_callback=job_changed)
+    jobs = queue.load()
+    try:
+        queue.start_next()
+        queue.wait()
+    except KeyboardInterrupt:
+        print("Stopping render queue (interrupted exports are resumed next time)")
+        queue.shutdown()
+        return 2
+    return 1 if any(job.status == JOB_FAILED for job in jobs) else 0
+
+
+if __name__ == "__main__":
+    main()
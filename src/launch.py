@@ -43,6 +43,7 @@
 import sys
 import os.path
 import argparse
+import multiprocessing
 
 try:
     from classes import info
@@ -144,4 +145,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Support worker processes (i.e. waveforms) in frozen builds
+    multiprocessing.freeze_support()
     main()
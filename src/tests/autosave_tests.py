@@ -0,0 +1,147 @@
+"""
+ @file
+ @brief This file contains unit tests for autosaves and recovery points
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import copy
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+from classes.autosave import AutoSaver, ProjectSnapshot, RecoveryStore
+
+
+def make_project(num_clips):
+    """ Create project data with some clips """
+    clips = [{"id": "C%s" % num, "position": float(num), "reader": {"path": "clip%s.mp4" % num}}
+             for num in range(num_clips)]
+    return {"id": "P1", "fps": {"num": 30, "den": 1}, "clips": clips, "effects": [], "history": {"undo": []}}
+
+
+class TestAutosave(unittest.TestCase):
+    """ Unit test class for autosaves and recovery points """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.project_path = os.path.join(self.folder, "test.osp")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_delta(self):
+        """ Test saving only changed values and items, and applying them to the base """
+        base_data = make_project(100)
+        data = copy.deepcopy(base_data)
+        data["clips"][5]["position"] = 50.0
+        data["clips"].append({"id": "C100", "position": 0.0})
+        del data["clips"][0]
+        data["fps"]["num"] = 25
+        del data["history"]
+
+        base = ProjectSnapshot.from_data(base_data)
+        snapshot = ProjectSnapshot.from_data(data)
+        self.assertEqual(json.loads(snapshot.get_text()), data)
+
+        delta = snapshot.make_delta(base)
+        self.assertEqual(list(delta["values"].keys()), ["fps"])
+        self.assertEqual([item_id for item_id, _ in delta["items"]["clips"]["changed"]], ["C5", "C100"])
+        self.assertEqual(delta["removed"], ["history"])
+
+        # The delta survives serialization
+        delta = json.loads(json.dumps(delta))
+        self.assertEqual(json.loads(base.apply_delta(delta).get_text()), data)
+
+    def test_recovery_points(self):
+        """ Test restoring recovery points, and limiting how many are kept """
+        recovery = RecoveryStore(self.folder, limit=3)
+        data = make_project(10)
+        versions = []
+        for num in range(5):
+            data["clips"][num]["position"] = 100.0 + num
+            versions.append(copy.deepcopy(data))
+            recovery.add(self.project_path, ProjectSnapshot.from_data(data))
+            if num == 2:
+                # Saved by the user (so the next points use a new base)
+                recovery.reset(self.project_path)
+
+        points = recovery.get_points(self.project_path)
+        self.assertEqual(len(points), 3)
+        self.assertEqual(len(os.listdir(self.folder)), 3 + 2 + 1)
+        for point, version in zip(points, versions[2:]):
+            restore_path = os.path.join(self.folder, "restored.osp")
+            recovery.restore(point, restore_path)
+            with open(restore_path, encoding="utf-8") as f:
+                restored = json.load(f)
+            for clip in restored["clips"]:
+                clip["reader"]["path"] = os.path.normpath(clip["reader"]["path"])
+            self.assertEqual(restored, dict(version, history={"undo": [], "redo": []}))
+
+        # Paths are relative to the restored file
+        restore_path = os.path.join(self.folder, "recovered", "restored.osp")
+        os.makedirs(os.path.dirname(restore_path))
+        recovery.restore(points[-1], restore_path)
+        with open(restore_path, encoding="utf-8") as f:
+            self.assertEqual(os.path.normpath(json.load(f)["clips"][0]["reader"]["path"]), os.path.join("..", "clip0.mp4"))
+        shutil.rmtree(os.path.dirname(restore_path))
+
+        # File names are unique (even when added within the same millisecond)
+        names = set(recovery.get_file_name(self.project_path, "delta.gz") for _ in range(100))
+        self.assertEqual(len(names), 100)
+
+        # Points only contain changes
+        with gzip.open(os.path.join(self.folder, points[-1]["file"]), "rt", encoding="utf-8") as f:
+            delta = json.load(f)["delta"]
+        self.assertEqual([item_id for item_id, _ in delta["items"]["clips"]["changed"]], ["C4"])
+
+    def test_autosaver(self):
+        """ Test writing a project on the background thread """
+        autosaver = AutoSaver(RecoveryStore(self.folder, limit=2))
+        data = make_project(10)
+        autosaver.save(self.project_path, ProjectSnapshot.from_data(data))
+        self.assertTrue(autosaver.wait(10))
+        with open(self.project_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), data)
+        self.assertEqual(len(autosaver.recovery.get_points()), 1)
+
+        # Without recovery points (i.e. backup of an unsaved project)
+        backup_path = os.path.join(self.folder, "backup.osp")
+        autosaver.save(backup_path, ProjectSnapshot.from_data(data), recovery=False)
+        self.assertTrue(autosaver.wait(10))
+        self.assertTrue(os.path.exists(backup_path))
+        self.assertEqual(len(autosaver.recovery.get_points()), 1)
+        self.assertFalse([name for name in os.listdir(self.folder) if name.endswith(".tmp")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+"""
+ @file
+ @brief This file contains unit tests for the export engine
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from classes.export_engine import get_segments, get_resume_segment_frames, FramePrefetcher, SegmentedExportEngine
+from classes.render_queue import RenderQueue, RenderJob, JOB_QUEUED, JOB_RUNNING, JOB_CANCELLED
+
+
+class TestExportEngine(unittest.TestCase):
+    """ Unit test class for the export engine """
+
+    def test_segments(self):
+        """ Test splitting frames into segments (on keyframe boundaries) """
+        segments = get_segments(1, 3000, 4, 48)
+        self.assertEqual(segments[0], (1, 768))
+        self.assertEqual(segments[-1][1], 3000)
+        self.assertEqual(len(segments), 4)
+
+        # Segments are contiguous, and each (except the last) is a multiple of the keyframe interval
+        for (start_frame, end_frame), (next_start_frame, _) in zip(segments, segments[1:]):
+            self.assertEqual(next_start_frame, end_frame + 1)
+            self.assertEqual((end_frame - start_frame + 1) % 48, 0)
+
+        # Short exports are not split into tiny segments
+        self.assertEqual(get_segments(10, 100, 8, 48), [(10, 100)])
+
+        # Resumable exports are split by length (no matter how many processes)
+        segment_frames = get_resume_segment_frames({"num": 24, "den": 1})
+        self.assertEqual(segment_frames, 720)
+        self.assertEqual(get_segments(1, 3000, 1, 48, segment_frames), [(1, 720), (721, 1440), (1441, 2160), (2161, 2880), (2881, 3000)])
+        self.assertEqual(get_segments(1, 3000, 8, 48, segment_frames), get_segments(1, 3000, 1, 48, segment_frames))
+
+
+    def test_prefetch(self):
+        """ Test compositing frames ahead of the writer (in order, and bounded) """
+        class Timeline:
+            def __init__(self):
+                self.requested = []
+                self.lock = threading.Lock()
+
+            def GetFrame(self, number):
+                time.sleep(0.001)
+                with self.lock:
+                    self.requested.append(number)
+                return "frame %s" % number
+
+        timeline = Timeline()
+        prefetcher = FramePrefetcher(timeline, 1, 100, threads=2, max_frames=4)
+        prefetcher.start()
+        for number in range(1, 101):
+            frame, seconds, cache_hit = prefetcher.get_frame(number)
+            self.assertEqual(frame, "frame %s" % number)
+            # Never more than max_frames ahead of the writer
+            self.assertLessEqual(max(timeline.requested), number + 4)
+            prefetcher.release()
+        prefetcher.stop()
+        self.assertEqual(sorted(timeline.requested), list(range(1, 101)))
+        self.assertGreater(prefetcher.composite_time, 0.0)
+
+    def test_report(self):
+        """ Test finding the slowest frame ranges (and the clips active in them) """
+        from classes.export_report import ExportReport
+        project_data = {
+            "clips": [
+                {"id": "C1", "title": "intro.mp4", "layer": 1, "position": 0.0, "start": 0.0, "end": 2.0, "effects": []},
+                {"id": "C2", "title": "blur.mp4", "layer": 2, "position": 3.0, "start": 1.0, "end": 2.0,
+                 "effects": [{"class_name": "Blur"}]},
+            ],
+            "effects": [],
+        }
+        report = ExportReport(project_data, {}, 10.0)
+        for frame in range(1, 51):
+            composite_seconds = 0.1 if 31 <= frame <= 40 else 0.01
+            report.add_frame(frame, composite_seconds, 0.005, frame % 2 == 0)
+
+        ranges = report.get_slowest_ranges(2)
+        self.assertEqual((ranges[0]["start_frame"], ranges[0]["end_frame"]), (31, 40))
+        self.assertAlmostEqual(ranges[0]["ms_per_frame"], 105.0)
+        self.assertEqual([clip["id"] for clip in ranges[0]["clips"]], ["C2"])
+        self.assertEqual(ranges[0]["clips"][0]["effects"], ["Blur"])
+
+        totals = report.get_totals()
+        self.assertEqual(totals["frames"], 50)
+        self.assertEqual((totals["cache_hits"], totals["cache_misses"]), (25, 25))
+
+        folder = tempfile.mkdtemp()
+        try:
+            json_path = report.save(os.path.join(folder, "master.mp4"))
+            self.assertEqual(json_path, os.path.join(folder, "master.export-report.json"))
+            with open(os.path.join(folder, "master.export-report.csv"), encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 51)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_segmented_report(self):
+        """ Test combining the timing report rows of the segments of a segmented export """
+        folder = tempfile.mkdtemp()
+        try:
+            fps = {"num": 24, "den": 1}
+            export_settings = {"path": os.path.join(folder, "master.mp4"), "type": "video", "report": True,
+                               "prefetch_frames": 0, "prefetch_threads": 2,
+                               "video": {"fps": fps, "start_frame": 1, "end_frame": 600}, "audio": {}}
+            engine = SegmentedExportEngine({"fps": fps, "clips": [], "effects": []}, export_settings, processes=2)
+
+            # Each segment reports its own frames
+            segment_settings, audio_settings = engine.get_segment_settings(folder)
+            self.assertEqual(len(segment_settings), 2)
+            self.assertTrue(all(settings["report"] for settings in segment_settings))
+            self.assertTrue(all(settings["prefetch_frames"] == 0 and settings["prefetch_threads"] == 2
+                                for settings in segment_settings))
+
+            # Rows are combined in frame order (from segments finished in any order)
+            engine.add_segment_results([
+                {"completed": True, "frames": [(frame, 0.02, 0.01, False, None) for frame in range(337, 601)],
+                 "composite_time": 5.28, "encode_time": 2.64, "wait_time": 5.28},
+                {"completed": True, "frames": [(frame, 0.01, 0.01, True, None) for frame in range(1, 337)],
+                 "composite_time": 3.36, "encode_time": 3.36, "wait_time": 3.36},
+                {"completed": True, "frames": [], "composite_time": 0.0, "encode_time": 0.0, "wait_time": 0.0},
+            ])
+            self.assertEqual([frame[0] for frame in engine.report.frames], list(range(1, 601)))
+            self.assertEqual(engine.report.get_totals()["cache_hits"], 336)
+
+            # Timing is the total of all processes
+            self.assertAlmostEqual(engine.composite_time, 8.64)
+            self.assertAlmostEqual(engine.encode_time, 6.0)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_smart_render_plan(self):
+        """ Test finding spans of untouched clips, and splitting an export into copied and rendered segments """
+        from classes.smart_render import (
+            find_passthrough_spans, get_copy_range, plan_segments, is_passthrough_clip, get_encoder_options
+        )
+        video_settings = {"vcodec": "libx264", "fps": {"num": 25, "den": 1}, "width": 1920, "height": 1080}
+        reader = {"type": "FFmpegReader", "path": "interview.mp4", "has_video": True, "has_single_image": False,
+                  "vcodec": "h264", "width": 1920, "height": 1080, "fps": {"num": 25, "den": 1}}
+        project_data = {
+            "fps": {"num": 25, "den": 1},
+            "clips": [
+                # 20 seconds of an untouched clip (starting 10 seconds into the file)
+                {"id": "C1", "position": 0.0, "start": 10.0, "end": 30.0, "reader": reader, "effects": [],
+                 "alpha": {"Points": [{"co": {"X": 1.0, "Y": 1.0}}]}},
+                # A title over 4 seconds of it
+                {"id": "C2", "position": 8.0, "start": 0.0, "end": 4.0,
+                 "reader": {"type": "QtImageReader", "has_video": True, "has_single_image": True}},
+                # A clip with an effect
+                {"id": "C3", "position": 20.0, "start": 0.0, "end": 5.0, "reader": reader,
+                 "effects": [{"class_name": "Blur"}]},
+            ],
+            "effects": [],
+        }
+        spans = find_passthrough_spans(project_data, 1, 625, video_settings)
+        self.assertEqual([(span["start_frame"], span["end_frame"]) for span in spans], [(1, 200), (301, 500)])
+        self.assertAlmostEqual(spans[1]["source_seconds"], 22.0)
+
+        # Copy from the first keyframe to just before the last one (keyframes every 2 seconds, at 11s, 13s, ...)
+        keyframes = [11.0 + 2.0 * index for index in range(10)]
+        self.assertEqual(get_copy_range(spans[0], keyframes, 25.0, 50), (26, 175))
+        self.assertEqual(get_copy_range(spans[1], keyframes, 25.0, 50), (326, 475))
+        self.assertIsNone(get_copy_range(spans[0], keyframes, 25.0, 500))
+
+        # Other frames are rendered
+        plan = plan_segments(1, 625, [(26, 175, spans[0]), (326, 475, spans[1])])
+        self.assertEqual([(start, end, bool(span)) for start, end, span in plan], [
+            (1, 25, False), (26, 175, True), (176, 325, False), (326, 475, True), (476, 625, False)])
+
+        # Clips showing their waveform, or with a perspective, origin or gravity are not copied
+        for name, value in [("waveform", True), ("gravity", 0),
+                            ("perspective_c1_x", {"Points": [{"co": {"X": 1.0, "Y": 10.0}}]}),
+                            ("origin_x", {"Points": [{"co": {"X": 1.0, "Y": 0.0}}]})]:
+            clip = dict(project_data["clips"][0], **{name: value})
+            self.assertFalse(is_passthrough_clip(clip, video_settings), name)
+
+        # Modified clips are not copied
+        project_data["clips"][0]["alpha"]["Points"][0]["co"]["Y"] = 0.5
+        self.assertEqual(find_passthrough_spans(project_data, 1, 625, video_settings), [])
+
+        # Rendered segments are encoded with the profile and level of the copied video
+        self.assertEqual(get_encoder_options({"codec_name": "h264", "profile": "High", "level": 41}),
+                         {"profile": 100, "level": 41})
+        self.assertEqual(get_encoder_options({"codec_name": "vp9", "profile": "Profile 0", "level": -99}), {})
+
+    def test_resume_single_process(self):
+        """ Test resuming a single process export (finished segments are not exported again) """
+        folder = tempfile.mkdtemp()
+        try:
+            fps = {"num": 24, "den": 1}
+            export_settings = {"path": os.path.join(folder, "master.mp4"), "type": "video",
+                               "video": {"fps": fps, "start_frame": 1, "end_frame": 3000}, "audio": {}}
+            engine = SegmentedExportEngine({"fps": fps}, export_settings, processes=1, work_folder=folder,
+                                           completed_segments=[0], segment_frames=get_resume_segment_frames(fps))
+            self.assertTrue(engine.processes == 1 and engine.work_folder)
+
+            segment_settings, audio_settings = engine.get_segment_settings(folder)
+            self.assertEqual(len(segment_settings), 5)
+            with open(segment_settings[0]["path"], "wb") as f:
+                f.write(b"segment")
+
+            # Only the unfinished segments are exported
+            indexes, segment_frames = engine.get_pending_segments(segment_settings)
+            self.assertEqual(indexes, [1, 2, 3, 4])
+            self.assertEqual(segment_frames[0], 720)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_render_queue_state(self):
+        """ Test saving render jobs, and resuming interrupted jobs """
+        folder = tempfile.mkdtemp()
+        try:
+            job = RenderJob(folder)
+            job.name = "master.mp4"
+            job.export_settings = {"path": "/tmp/master.mp4", "type": "video-audio"}
+            job.status = JOB_RUNNING
+            job.completed_segments = [0, 2, 1]
+            job.segment_frames = 720
+            job.save_project({"clips": []})
+            job.save()
+
+            cancelled_job = RenderJob(folder)
+            cancelled_job.status = JOB_CANCELLED
+            cancelled_job.save()
+
+            # Interrupted jobs are queued again (with their finished segments)
+            jobs = {job.id: job for job in RenderQueue(folder).load()}
+            self.assertEqual(jobs[job.id].status, JOB_QUEUED)
+            self.assertEqual(jobs[job.id].completed_segments, [0, 1, 2])
+            self.assertEqual(jobs[job.id].segment_frames, 720)
+            self.assertEqual(jobs[job.id].export_settings, job.export_settings)
+            self.assertEqual(jobs[job.id].load_project(), {"clips": []})
+            self.assertEqual(jobs[cancelled_job.id].status, JOB_CANCELLED)
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
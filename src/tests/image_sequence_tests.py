@@ -0,0 +1,87 @@
+"""
+ @file
+ @brief This file contains unit tests for image sequence detection
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import shutil
+import tempfile
+import time
+import unittest
+
+from classes.image_sequences import SequenceIndex
+
+
+class TestImageSequences(unittest.TestCase):
+    """ Unit test class for image sequence detection """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def touch(self, *names):
+        for name in names:
+            open(os.path.join(self.folder, name), "w").close()
+
+    def test_sequences(self):
+        """ Test detecting padded and unpadded image sequences (with gaps) """
+        self.touch("shot_0001.png", "shot_0002.png", "shot_0005.png", "title.png", "7.jpg", "8.jpg", "9.jpg",
+                   "10.jpg", "lonely_1.png", "lonely_500.png")
+        index = SequenceIndex(self.folder)
+
+        details = index.get_details("shot_0002.png")
+        self.assertEqual((details["base_name"], details["fixlen"], details["digits"], details["extension"]),
+                         ("shot_", True, 4, "png"))
+        self.assertEqual((details["first"], details["last"], details["count"], details["gaps"]), (1, 5, 3, 2))
+        self.assertEqual(len(details["files"]), 3)
+
+        # Numbers of different lengths (without padding)
+        details = index.get_details("9.jpg")
+        self.assertEqual((details["base_name"], details["fixlen"], details["count"]), ("", False, 4))
+
+        # Not sequences (no number, or no neighbour within 100 numbers)
+        self.assertIsNone(index.get_details("title.png"))
+        self.assertIsNone(index.get_details("lonely_1.png"))
+
+    def test_large_sequence(self):
+        """ Benchmark detecting a sequence of 20,000 images """
+        self.touch(*["frame%05d.png" % number for number in range(20000)])
+        start_time = time.perf_counter()
+        index = SequenceIndex(self.folder)
+        details = [index.get_details("frame%05d.png" % number) for number in range(0, 20000, 1000)]
+        print("20000 images: indexed and detected 20 sequences in %.3fs" % (time.perf_counter() - start_time))
+        self.assertTrue(all(detail["count"] == 20000 for detail in details))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+ @file
+ @brief This file contains unit tests for the media metadata cache
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import shutil
+import tempfile
+import unittest
+
+from classes.media_cache import MediaCache, get_signature
+
+
+class TestMediaCache(unittest.TestCase):
+    """ Unit test class for the media metadata cache """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache_folder = os.path.join(self.folder, "cache")
+        os.mkdir(self.cache_folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_cache(self):
+        """ Test caching the metadata of a file (until it changes) """
+        cache = MediaCache(self.cache_folder)
+        path = self.write_file("clip.mp4", b"video" * 1000)
+        self.assertIsNone(cache.get(path))
+        self.assertIsNone(cache.get(os.path.join(self.folder, "missing.mp4")))
+
+        # Project specific attributes are not cached
+        cache.put(path, {"id": "F1", "path": path, "tags": "intro", "duration": 10.0, "media_type": "video"})
+        self.assertEqual(cache.get(path), {"path": path, "duration": 10.0, "media_type": "video"})
+
+        # A changed file is probed again
+        self.write_file("clip.mp4", b"video" * 1001)
+        self.assertIsNone(cache.get(path))
+
+    def test_partial_hash(self):
+        """ Test sharing the metadata of copies of a file (at different paths) """
+        cache = MediaCache(self.cache_folder, partial_hash=True)
+        content = os.urandom(300 * 1024)
+        path = self.write_file("a.mp4", content)
+        copy_path = self.write_file("b.mp4", content)
+        self.assertEqual(get_signature(path, True), get_signature(copy_path, True))
+        self.assertNotEqual(get_signature(path), get_signature(copy_path))
+
+        cache.put(path, {"path": path, "duration": 10.0})
+        self.assertEqual(cache.get(copy_path), {"path": copy_path, "duration": 10.0})
+
+        # Only the start and end of files are hashed
+        self.write_file("b.mp4", content[:-1] + b"x")
+        self.assertIsNone(cache.get(copy_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+ @file
+ @brief This file contains unit tests for compact project containers
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import json
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from classes.autosave import ProjectSnapshot
+from classes.project_container import is_container, read_container, write_container
+
+
+def make_project(num_clips=100, num_points=50):
+    """ Create keyframe heavy project data (with some non-ASCII text) """
+    points = [{"co": {"X": float(x), "Y": x / 7.0}, "interpolation": 0} for x in range(1, num_points + 1)]
+    return {
+        "id": "P1",
+        "fps": {"num": 30000, "den": 1001},
+        "export_path": "Vidéos/Ünïcode ✓",
+        "files": [{"id": "F1", "path": "media/été.mp4", "media_type": "video"}],
+        "clips": [{"id": "C%s" % num, "file_id": "F1", "position": num * 1.5, "alpha": {"Points": points},
+                   "reader": {"path": "media/été.mp4"}, "effects": []} for num in range(num_clips)],
+        "effects": [],
+        "markers": [{"id": "M1", "position": 2.0}],
+        "history": {"undo": [{"type": "insert", "key": ["clips"], "values": {"id": "C1"}}], "redo": []},
+        "settings": {},
+        "version": {"openshot-qt": "2.6.0", "libopenshot": "0.3.0"},
+    }
+
+
+class TestProjectContainer(unittest.TestCase):
+    """ Unit test class for compact project containers """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_json(self, name, data):
+        """ Write a project in the JSON format (the same way as JsonDataStore) """
+        path = os.path.join(self.folder, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data, ensure_ascii=False, indent=1))
+        return path
+
+    def test_round_trip(self):
+        """ Test that a container reads the same data as the JSON format """
+        data = make_project()
+        json_path = self.write_json("test.osp", data)
+        container_path = os.path.join(self.folder, "compact.osp")
+        write_container(container_path, data)
+
+        with open(json_path, encoding="utf-8") as f:
+            json_data = json.load(f)
+        self.assertEqual(read_container(container_path), json_data)
+        self.assertEqual(read_container(container_path), data)
+
+        # Only containers are detected as containers
+        self.assertTrue(is_container(container_path))
+        self.assertFalse(is_container(json_path))
+        self.assertFalse(is_container(os.path.join(self.folder, "missing.osp")))
+
+        # Containers are much smaller than pretty printed JSON
+        self.assertLess(os.path.getsize(container_path), os.path.getsize(json_path) / 5)
+
+    def test_sections(self):
+        """ Test that sections are separate members, and can be skipped """
+        data = make_project()
+        container_path = os.path.join(self.folder, "compact.osp")
+        write_container(container_path, data)
+
+        with zipfile.ZipFile(container_path) as archive:
+            self.assertEqual(archive.namelist(), ["format", "project.json", "clips.json", "effects.json",
+                                                  "files.json", "history.json"])
+
+        partial = read_container(container_path, sections=("clips", "files"))
+        self.assertNotIn("history", partial)
+        self.assertNotIn("effects", partial)
+        self.assertEqual(partial["clips"], data["clips"])
+        self.assertEqual(partial["markers"], data["markers"])
+
+        # Missing sections are not added
+        del data["history"]
+        write_container(container_path, data)
+        self.assertEqual(read_container(container_path), data)
+
+    def test_snapshot(self):
+        """ Test writing an autosave snapshot as a container """
+        data = make_project()
+        snapshot = ProjectSnapshot.from_data(data)
+        snapshot.compact = True
+        container_path = os.path.join(self.folder, "autosave.osp")
+        with open(container_path, "wb") as f:
+            f.write(snapshot.get_contents())
+        self.assertEqual(read_container(container_path), data)
+
+        snapshot.compact = False
+        self.assertEqual(json.loads(snapshot.get_contents().decode("utf-8")), data)
+
+    def test_invalid(self):
+        """ Test that other zip files are not read as projects """
+        zip_path = os.path.join(self.folder, "other.zip")
+        with zipfile.ZipFile(zip_path, "w") as archive:
+            archive.writestr("project.json", "{}")
+        self.assertTrue(is_container(zip_path))
+        with self.assertRaises(ValueError):
+            read_container(zip_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
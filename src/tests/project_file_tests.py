@@ -0,0 +1,107 @@
+"""
+ @file
+ @brief This file contains unit tests for reading project files without Qt
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import json
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from classes.project_container import write_container
+from classes.project_file import load_project_file, rescale_keyframes
+
+
+class TestProjectFile(unittest.TestCase):
+    """ Unit test class for reading project files (for headless exports) """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.project = {
+            "fps": {"num": 30, "den": 1},
+            "files": [{"id": "F1", "path": "media/clip.mp4"}],
+            "clips": [{"id": "C1", "reader": {"path": "media/clip.mp4"},
+                       "alpha": {"Points": [{"co": {"X": 1.0, "Y": 1.0}}, {"co": {"X": 30.0, "Y": 0.0}}]},
+                       "effects": []}],
+            "effects": [],
+            "history": {"undo": [{"type": "insert"}], "redo": []},
+            "version": {"openshot-qt": "2.6.0"},
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_load_without_qt(self):
+        """ Test loading project files (JSON and compact) with absolute paths, without importing Qt """
+        file_path = os.path.join(self.folder, "project.osp")
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.project, f)
+        data = load_project_file(file_path)
+        self.assertEqual(data["files"][0]["path"], os.path.join(self.folder, "media", "clip.mp4"))
+        self.assertEqual(data["clips"][0]["reader"]["path"], os.path.join(self.folder, "media", "clip.mp4"))
+
+        # Compact project files skip the history
+        write_container(file_path, self.project)
+        data = load_project_file(file_path)
+        self.assertEqual(data["files"][0]["path"], os.path.join(self.folder, "media", "clip.mp4"))
+        self.assertNotIn("history", data)
+
+        # The reader doesn't import Qt (checked in a new process, since other tests import it)
+        result = subprocess.run([sys.executable, "-c", "import sys; import classes.project_file; "
+                                 "print([name for name in sys.modules if name.startswith('PyQt5')])"],
+                                cwd=PATH, stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "[]")
+
+    def test_load_damaged(self):
+        """ Test repairing the corruption of OpenShot 2.5.0 in memory (without changing the file) """
+        self.project["version"]["openshot-qt"] = "2.5.0"
+        self.project["files"][0]["path"] = "media/café.mp4"
+        contents = json.dumps(self.project).replace("\\u00e9", "/u00e9")
+        file_path = os.path.join(self.folder, "project.osp")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(contents)
+
+        data = load_project_file(file_path)
+        self.assertEqual(data["files"][0]["path"], os.path.join(self.folder, "media", "café.mp4"))
+        with open(file_path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), contents)
+
+    def test_rescale_keyframes(self):
+        """ Test scaling keyframes to another frame rate (without changing the project data) """
+        data = rescale_keyframes(self.project, 2.0)
+        self.assertEqual([point["co"]["X"] for point in data["clips"][0]["alpha"]["Points"]], [1.0, 60])
+        self.assertEqual(self.project["clips"][0]["alpha"]["Points"][1]["co"]["X"], 30.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
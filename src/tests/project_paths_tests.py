@@ -0,0 +1,173 @@
+"""
+ @file
+ @brief This file contains unit tests (and a benchmark) for converting project paths
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import json
+import re
+import shutil
+import tempfile
+import time
+import unittest
+
+from classes import info
+from classes.project_paths import PathResolver
+
+# Size of the project file used by the benchmark (in MB)
+BENCHMARK_MB = float(os.environ.get("PROJECT_PATHS_BENCHMARK_MB", 50))
+
+# Regex which was used to convert paths in the serialized project (before the PathResolver)
+PATH_REGEX = re.compile(r'"(image|path)"\s*:\s*"(.*?)"')
+
+
+def regex_to_absolute(project_folder, contents):
+    """ Convert relative paths of a serialized project with a regex (only plain relative paths) """
+    def replace(match):
+        path = os.path.abspath(os.path.join(project_folder, match.group(2)))
+        return '"%s": %s' % (match.group(1), json.dumps(path, ensure_ascii=False))
+    return PATH_REGEX.sub(replace, contents)
+
+
+def regex_to_relative(project_folder, contents):
+    """ Convert absolute paths of a serialized project with a regex (only plain relative paths) """
+    def replace(match):
+        folder_path, file_name = os.path.split(os.path.abspath(match.group(2)))
+        path = os.path.join(os.path.relpath(folder_path, project_folder), file_name).replace("\\", "/")
+        return '"%s": %s' % (match.group(1), json.dumps(path, ensure_ascii=False))
+    return PATH_REGEX.sub(replace, contents)
+
+
+def make_project(num_clips, num_points=20):
+    """ Create project data with relative paths (a few media folders, and many clips) """
+    files = [{"id": "F%s" % num, "path": "media/day%s/clip%s.mp4" % (num % 5, num)} for num in range(200)]
+    points = [{"co": {"X": float(x), "Y": 1.0}, "interpolation": 0} for x in range(1, num_points + 1)]
+    clips = []
+    for num in range(num_clips):
+        clips.append({
+            "id": "C%s" % num,
+            "file_id": "F%s" % (num % 200),
+            "image": "thumbnail/F%s.png" % (num % 200),
+            "reader": {"path": "../shared/music/track%s.wav" % (num % 50), "has_video": False},
+            "alpha": {"Points": points},
+            "location_x": {"Points": points},
+            "effects": [{"type": "Mask", "reader": {"path": "masks/wipe%s.png" % (num % 3)}}],
+        })
+    return {"files": files, "clips": clips, "history": {"undo": [], "redo": []}}
+
+
+class TestProjectPaths(unittest.TestCase):
+    """ Unit test class for converting project paths """
+
+    @classmethod
+    def setUpClass(TestProjectPaths):
+        TestProjectPaths.folder = tempfile.mkdtemp()
+        TestProjectPaths.project_path = os.path.join(TestProjectPaths.folder, "project", "test.osp")
+
+    @classmethod
+    def tearDownClass(TestProjectPaths):
+        shutil.rmtree(TestProjectPaths.folder)
+
+    def test_special_paths(self):
+        """ Test converting transition, emoji, asset and thumbnail paths """
+        resolver = PathResolver(self.project_path)
+        assets_path = os.path.join(self.folder, "project", "test_assets")
+        transition_path = os.path.join(info.PATH, "transitions", "common", "fade.svg")
+        emoji_path = os.path.join(info.PATH, "emojis", "color", "svg", "1F600.svg")
+        title_path = os.path.join(assets_path, "title", "title-1.svg")
+        thumb_path = os.path.join(info.THUMBNAIL_PATH, "F1.png")
+
+        self.assertEqual(resolver.to_relative(transition_path), "@transitions/common/fade.svg")
+        self.assertEqual(resolver.to_relative(emoji_path), "@emojis/1F600.svg")
+        self.assertEqual(resolver.to_relative(title_path), "@assets/title/title-1.svg")
+        self.assertEqual(resolver.to_relative(thumb_path), "thumbnail/F1.png")
+        self.assertEqual(resolver.to_relative(os.path.join(self.folder, "media", "a.mp4")), "../media/a.mp4")
+
+        self.assertEqual(resolver.to_absolute("@transitions/common/fade.svg"), transition_path)
+        self.assertEqual(resolver.to_absolute("@emojis/1F600.svg"), emoji_path)
+        self.assertEqual(resolver.to_absolute("@assets/title/title-1.svg"), title_path)
+        self.assertEqual(resolver.to_absolute("../media/./a.mp4"), os.path.join(self.folder, "media", "a.mp4"))
+
+    def test_round_trip(self):
+        """ Test that only path fields are converted, and that relative data is a copy """
+        project = make_project(10)
+        project["clips"][0]["title"] = "path"
+        project["clips"][0]["text"] = {"path_like": "media/not/a/path.mp4"}
+        relative = json.loads(json.dumps(project))
+
+        absolute = PathResolver(self.project_path).make_absolute(project)
+        self.assertIs(absolute, project)
+        self.assertEqual(absolute["files"][1]["path"], os.path.join(self.folder, "project", "media", "day1", "clip1.mp4"))
+        self.assertEqual(absolute["clips"][0]["effects"][0]["reader"]["path"],
+                         os.path.join(self.folder, "project", "masks", "wipe0.png"))
+        self.assertEqual(absolute["clips"][0]["text"], {"path_like": "media/not/a/path.mp4"})
+
+        saved = PathResolver(self.project_path).make_relative(absolute)
+        self.assertEqual(saved, relative)
+        self.assertEqual(absolute["files"][1]["path"], os.path.join(self.folder, "project", "media", "day1", "clip1.mp4"))
+
+    def test_benchmark(self):
+        """ Benchmark converting the paths of a large project, compared to a regex over the serialized project """
+        project = make_project(10)
+        clip_size = len(json.dumps(project["clips"][0], indent=1))
+        contents = json.dumps(make_project(int(BENCHMARK_MB * 1024 * 1024 / clip_size)), ensure_ascii=False, indent=1)
+        project_folder = os.path.dirname(self.project_path)
+
+        data = json.loads(contents)
+
+        # Load: regex over the file contents, or converting the parsed data
+        start_time = time.perf_counter()
+        regex_contents = regex_to_absolute(project_folder, contents)
+        regex_load = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        PathResolver(self.project_path).make_absolute(data)
+        resolver_load = time.perf_counter() - start_time
+        self.assertEqual(data, json.loads(regex_contents))
+
+        # Save: regex over the serialized project, or converting a copy of the data
+        contents = json.dumps(data, ensure_ascii=False, indent=1)
+        start_time = time.perf_counter()
+        regex_contents = regex_to_relative(project_folder, contents)
+        regex_save = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        saved_data = PathResolver(self.project_path).make_relative(data)
+        resolver_save = time.perf_counter() - start_time
+        self.assertEqual(json.dumps(saved_data, ensure_ascii=False, indent=1), regex_contents)
+
+        print("%.0f MB project paths: load regex %.2fs, resolver %.2fs; save regex %.2fs, resolver %.2fs" % (
+            len(contents) / 1024.0 / 1024.0, regex_load, resolver_load, regex_save, resolver_save))
+        self.assertLess(resolver_load, regex_load)
+        self.assertLess(resolver_save, regex_save)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+ @file
+ @brief This file contains unit tests for preview proxies
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import shutil
+import tempfile
+import unittest
+
+from classes.proxies import get_proxy_path, needs_proxy
+from classes.proxy_encoder import get_proxy_size
+
+
+class TestProxies(unittest.TestCase):
+    """ Unit test class for preview proxies """
+
+    def test_proxy_files(self):
+        """ Test which files need proxies, and the size and path of proxies """
+        video = {"media_type": "video", "has_single_image": False, "width": 3840, "height": 2160}
+        self.assertTrue(needs_proxy(video))
+        self.assertFalse(needs_proxy(dict(video, width=1920, height=1080)))
+        self.assertFalse(needs_proxy(dict(video, media_type="image", has_single_image=True)))
+
+        # Proxies keep the aspect ratio (with an even size), and are never larger than the original
+        self.assertEqual(get_proxy_size(3840, 2160), (960, 540))
+        self.assertEqual(get_proxy_size(6016, 3384), (960, 540))
+        self.assertEqual(get_proxy_size(640, 360), (640, 360))
+
+        # A changed file gets a new proxy
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "camera.mp4")
+            with open(path, "wb") as f:
+                f.write(b"1234")
+            proxy_path = get_proxy_path(path)
+            self.assertEqual(get_proxy_path(path), proxy_path)
+            with open(path, "ab") as f:
+                f.write(b"5678")
+            self.assertNotEqual(get_proxy_path(path), proxy_path)
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,6 +34,7 @@ if PATH not in sys.path:
 import random
 import unittest
 import uuid
+from unittest import mock
 from classes.app import OpenShotApp
 from classes import info
 import openshot  # Python module for libopenshot (required video editing module installed separately)
@@ -316,6 +317,85 @@ class TestQueryClass(unittest.TestCase):
 
         self.assertEqual(len(File.filter()), num_files + 1)
 
+    def test_filter_indexed_clip(self):
+        """ Test the Clip.filter method with indexed attributes and read-only results """
+
+        # Import additional classes that need the app defined first
+        from classes.query import Clip
+
+        # Move a clip to a new layer and position
+        clip = Clip.get(id=TestQueryClass.clip_ids[2])
+        clip.data["layer"] = 9
+        clip.data["position"] = 500.0
+        clip.save()
+
+        # Find clip by layer
+        clips = Clip.filter(layer=9)
+        self.assertEqual([c.id for c in clips], [clip.id])
+
+        # Find clip by position (and not after it ends)
+        duration = clip.data["end"] - clip.data["start"]
+        clips = Clip.filter(intersect=500.0 + duration / 2.0)
+        self.assertIn(clip.id, [c.id for c in clips])
+        clips = Clip.filter(intersect=500.0 + duration + 1.0)
+        self.assertNotIn(clip.id, [c.id for c in clips])
+
+        # Indexes are updated after a change
+        clip.data["layer"] = 8
+        clip.save()
+        self.assertEqual(len(Clip.filter(layer=9)), 0)
+
+        # Read-only results can't be modified, but can still be saved
+        clip = Clip.get(id=TestQueryClass.clip_ids[2], read_only=True)
+        self.assertEqual(clip.data["layer"], 8)
+        with self.assertRaises(TypeError):
+            clip.data["layer"] = 7
+        clip.save()
+        self.assertEqual(Clip.get(id=TestQueryClass.clip_ids[2]).data["layer"], 8)
+
+    def test_lookup_scaling(self):
+        """ Test that id lookups in project data do not grow with the number of clips """
+
+        project = TestQueryClass.app.project
+
+        # Lookups (of present and missing ids) only index the list once
+        clips = [{"id": "CLIP%s" % num} for num in range(10000)]
+        with mock.patch.object(project.item_index, "build", wraps=project.item_index.build) as build:
+            for num in range(1000):
+                self.assertEqual(project.find_item_index(clips, {"id": "CLIP9999"}), 9999)
+                self.assertEqual(project.find_item_index(clips, {"id": "MISSING"}), None)
+            self.assertEqual(build.call_count, 1)
+
+            # Appended items are indexed without a rebuild
+            clips.append({"id": "CLIP10000"})
+            project.item_index.appended(clips)
+            self.assertEqual(project.find_item_index(clips, {"id": "CLIP10000"}), 10000)
+            self.assertEqual(build.call_count, 1)
+
+        # Verify index is updated after removing a clip
+        clips = [{"id": "CLIP%s" % num} for num in range(10)]
+        project.find_item_index(clips, {"id": "CLIP5"})
+        clips.pop(0)
+        self.assertEqual(project.find_item_index(clips, {"id": "CLIP5"}), 4)
+        self.assertEqual(project.find_item_index(clips, {"id": "CLIP0"}), None)
+
+        # A list changed in place (outside of _set) is indexed again once discarded
+        clips[0] = {"id": "CLIP100"}
+        project.item_index.discard(clips)
+        self.assertEqual(project.find_item_index(clips, {"id": "CLIP100"}), 0)
+
+        # Replaced lists are no longer indexed (or kept alive)
+        from classes.project_data import ItemIndex
+        index = ItemIndex()
+        clip = {"id": "CLIP1", "effects": [{"id": "E1"}]}
+        effects = clip["effects"]
+        self.assertEqual(index.find(effects, "E1"), 0)
+        clip_list = [clip]
+        index.find(clip_list, "CLIP1")
+        index.discard_tree(clip)
+        self.assertNotIn(id(effects), index.lists)
+        self.assertIn(id(clip_list), index.lists)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+"""
+ @file
+ @brief This file contains unit tests for the persistent thumbnail store
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import shutil
+import tempfile
+import unittest
+
+from classes.thumbnail_store import ThumbnailStore
+
+
+class TestThumbnailStore(unittest.TestCase):
+    """ Unit test class for the persistent thumbnail store """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store_folder = os.path.join(self.folder, "store")
+        self.source_path = self.write_file("source.mp4", b"video")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_store(self):
+        """ Test storing a thumbnail, and copying it into another project """
+        store = ThumbnailStore(self.store_folder, max_size=1024)
+        key = store.get_key(self.source_path, 1, 98, 64)
+        self.assertNotEqual(key, store.get_key(self.source_path, 2, 98, 64))
+        self.assertNotEqual(key, store.get_key(self.source_path, 1, 98, 64, 90))
+        self.assertIsNone(store.get_key(os.path.join(self.folder, "missing.mp4"), 1, 98, 64))
+
+        thumb_path = os.path.join(self.folder, "project1", "FILE1", "1.png")
+        self.assertFalse(store.get(key, thumb_path))
+        store.put(key, self.write_file("generated.png", b"image"))
+
+        # A new store (i.e. after a restart) finds the saved image
+        store = ThumbnailStore(self.store_folder, max_size=1024)
+        self.assertTrue(store.get(key, thumb_path))
+        with open(thumb_path, "rb") as f:
+            self.assertEqual(f.read(), b"image")
+
+        # A changed source file has a new key
+        self.write_file("source.mp4", b"edited video")
+        self.assertNotEqual(key, store.get_key(self.source_path, 1, 98, 64))
+
+    def test_eviction(self):
+        """ Test removing the least recently used thumbnails when over budget """
+        store = ThumbnailStore(self.store_folder, max_size=300)
+        image_path = self.write_file("generated.png", b"x" * 100)
+        keys = [store.get_key(self.source_path, frame, 98, 64) for frame in range(1, 5)]
+        for key in keys[:3]:
+            store.put(key, image_path)
+
+        # Using the first image keeps it (and the second image is removed instead)
+        self.assertTrue(store.get(keys[0], os.path.join(self.folder, "1.png")))
+        store.put(keys[3], image_path)
+        self.assertEqual(store.size, 300)
+        self.assertTrue(os.path.exists(store.get_image_path(keys[0])))
+        self.assertFalse(os.path.exists(store.get_image_path(keys[1])))
+        self.assertFalse(store.get(keys[1], os.path.join(self.folder, "2.png")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,296 @@
+"""
+ @file
+ @brief This file contains unit tests for the UpdateManager class (undo/redo history)
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import copy
+import json
+import shutil
+import tempfile
+import unittest
+
+from classes.updates import UpdateManager, UpdateInterface
+from classes.logger import log
+
+
+class ClipStore(UpdateInterface):
+    """ Minimal project data store, which applies changes to a list of clips """
+
+    immediate_updates = True
+
+    def __init__(self):
+        self.data = {"clips": []}
+
+    def find(self, key):
+        """ Find the parent list and the index of a clip key (i.e. ["clips", {"id": "C1"}]) """
+        clips = self.data["clips"]
+        for index, clip in enumerate(clips):
+            if clip["id"] == key[1]["id"]:
+                return clips, index
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def convert_paths_to_absolute(self, file_path, data):
+        return data
+
+    def convert_paths_to_relative(self, file_path, previous_path, data):
+        return data
+
+    def changed(self, action):
+        if action.key and action.key[0] == "history":
+            self.data["history"] = action.values
+        elif action.type == "insert":
+            self.data["clips"].append(action.values)
+            action.set_old_values(None)
+        elif action.type == "update":
+            clips, index = self.find(action.key)
+            clip = clips[index]
+            action.set_old_values(json.loads(json.dumps({k: clip[k] for k in action.values if k in clip})))
+            clip.update(action.values)
+        elif action.type == "delete":
+            clips, index = self.find(action.key)
+            action.set_old_values(clips.pop(index))
+
+
+class BatchListener(UpdateInterface):
+    """ Listener which records each call (like the timeline, which applies a JSON diff per call) """
+
+    def __init__(self):
+        self.calls = []
+
+    def changed(self, action):
+        self.calls.append([action])
+
+    def changed_batch(self, actions):
+        self.calls.append(list(actions))
+
+
+def deep_size(obj, seen=None):
+    """ Get the approximate memory used by an object (and all nested objects) """
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+
+def make_clip(clip_id, num_points=100):
+    """ Create a keyframe heavy clip """
+    points = [{"co": {"X": float(x), "Y": 1.0}, "interpolation": 0} for x in range(1, num_points + 1)]
+    return {
+        "id": clip_id,
+        "layer": 1,
+        "position": 0.0,
+        "start": 0.0,
+        "end": 10.0,
+        "alpha": {"Points": copy.deepcopy(points)},
+        "volume": {"Points": copy.deepcopy(points)},
+        "location_x": {"Points": copy.deepcopy(points)},
+    }
+
+
+class TestUpdateManager(unittest.TestCase):
+    """ Unit test class for UpdateManager history """
+
+    def setUp(self):
+        self.store = ClipStore()
+        self.updates = UpdateManager()
+        self.updates.add_listener(self.store)
+        for num in range(10):
+            self.updates.insert(["clips"], make_clip("C%s" % num))
+
+    def edit(self, num):
+        """ Make a typical edit (move a clip, and change a single keyframe point) """
+        clip_id = "C%s" % (num % 10)
+        clips, index = self.store.find(["clips", {"id": clip_id}])
+        clip = dict(clips[index])
+        clip["position"] = float(num)
+        clip["alpha"] = json.loads(json.dumps(clip["alpha"]))
+        clip["alpha"]["Points"][num % 100]["co"]["Y"] = num / 10000.0
+        self.updates.update(["clips", {"id": clip_id}], clip)
+
+    def test_undo_redo(self):
+        """ Test undo and redo of compacted history actions """
+        original = copy.deepcopy(self.store.data)
+        for num in range(50):
+            self.edit(num)
+        edited = copy.deepcopy(self.store.data)
+
+        # Compacted actions only keep changed values
+        action = self.updates.actionHistory[-1]
+        self.assertEqual(sorted(action.values.keys()), ["alpha", "id", "position"])
+        self.assertEqual(action.old_values["position"], 39.0)
+
+        # Undo all edits
+        for num in range(50):
+            self.updates.undo()
+        self.assertEqual(self.store.data, original)
+
+        # Redo all edits
+        for num in range(50):
+            self.updates.redo()
+        self.assertEqual(self.store.data, edited)
+
+        # Serialized actions contain full old values
+        action_dict = json.loads(self.updates.actionHistory[-1].json())
+        self.assertEqual(action_dict["old_values"]["position"], 39.0)
+        self.assertEqual(len(action_dict["old_values"]["alpha"]["Points"]), 100)
+
+    def test_transaction(self):
+        """ Test grouping many changes into a single batch and undo/redo step """
+        listener = BatchListener()
+        self.updates.add_listener(listener, 0)
+        original = copy.deepcopy(self.store.data)
+        history_length = len(self.updates.actionHistory)
+
+        with self.updates.transaction():
+            for num in range(10):
+                self.edit(num)
+            self.updates.insert(["clips"], make_clip("C10"))
+            self.updates.delete(["clips", {"id": "C0"}])
+
+            # The project data is updated right away, other listeners are not
+            self.assertEqual(len(self.store.data["clips"]), 10)
+            self.assertEqual(listener.calls, [])
+        edited = copy.deepcopy(self.store.data)
+
+        # Single batch, and a single undo step
+        self.assertEqual(len(listener.calls), 1)
+        self.assertEqual(len(listener.calls[0]), 12)
+        self.assertEqual(len(self.updates.actionHistory), history_length + 1)
+
+        # Undo of a delete appends the item again (so compare clips in id order)
+        self.updates.undo()
+        self.assertEqual(sorted(self.store.data["clips"], key=lambda clip: clip["id"]), original["clips"])
+        self.assertEqual(len(listener.calls[1]), 12)
+        self.assertEqual(listener.calls[1][0].type, "insert")
+        self.updates.redo()
+        self.assertEqual(self.store.data, edited)
+
+        # Grouped actions can be serialized
+        action = self.updates.actionHistory[-1]
+        action_dict = json.loads(action.json())
+        self.assertEqual(action_dict["type"], "group")
+        self.assertEqual(len(action_dict["actions"]), 12)
+
+    def test_history_size_limit(self):
+        """ Test limiting the size of history (in bytes) """
+        self.updates.history_size_limit = 100 * 1024
+        for num in range(1000):
+            self.edit(num)
+        self.assertLessEqual(self.updates.history_size, 100 * 1024)
+        self.assertGreater(len(self.updates.actionHistory), 1)
+        self.assertLess(len(self.updates.actionHistory), 1010)
+
+    def test_history_memory(self):
+        """ Test that the history of many edits is much smaller than full copies of the edited clips """
+        for num in range(10000):
+            self.edit(num)
+
+        # Memory used by history (excluding the clips in the project data)
+        history_memory = deep_size(self.updates.actionHistory, set(id(clip) for clip in self.store.data["clips"]))
+
+        # Memory used by full copies of a clip (which each edit previously stored twice)
+        full_copy_memory = deep_size(make_clip("C0")) * 2 * 10000
+
+        self.assertEqual(len(self.updates.actionHistory), 10010)
+        self.assertLess(history_memory, full_copy_memory / 2)
+
+    def test_save_load_history(self):
+        """ Test saving history to a history file (incrementally), and loading it on the first undo """
+        folder = tempfile.mkdtemp()
+        try:
+            self.store.current_filepath = os.path.join(folder, "project.osp")
+            for num in range(20):
+                self.edit(num)
+            self.updates.undo()
+            edited = copy.deepcopy(self.store.data["clips"])
+
+            # Only new actions are appended to the history file
+            self.updates.save_history(self.store, 100, self.store.current_filepath)
+            history_path = os.path.join(folder, "project_assets", "history.txt")
+            with open(history_path, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 30)
+            self.edit(20)
+            self.updates.save_history(self.store, 100, self.store.current_filepath)
+            with open(history_path, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 31)
+            history = self.store.data["history"]
+            self.assertEqual(history["undo"], [])
+            self.assertEqual(len(history["file"]["undo"]), 30)
+            self.assertEqual(history["file"]["redo"], [])
+
+            # History is not loaded until it is needed
+            self.updates.load_history(self.store)
+            self.assertEqual(self.updates.actionHistory, [])
+            self.assertEqual(self.updates.pending_history["undo"], history["file"]["undo"])
+
+            # Saving again passes the unloaded history through
+            self.updates.save_history(self.store, 100, self.store.current_filepath)
+            self.assertEqual(self.store.data["history"]["file"]["undo"], history["file"]["undo"])
+
+            # Undo loads the history (and undoes the last edit)
+            self.updates.undo()
+            self.assertIsNone(self.updates.pending_history)
+            self.assertEqual(len(self.updates.actionHistory), 29)
+            self.assertEqual(self.store.data["clips"], edited)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_missing_history_file(self):
+        """ Test loading a project whose history file is missing (i.e. the project was copied alone) """
+        folder = tempfile.mkdtemp()
+        try:
+            self.store.current_filepath = os.path.join(folder, "project.osp")
+            for num in range(5):
+                self.edit(num)
+            self.updates.save_history(self.store, 100, self.store.current_filepath)
+            os.unlink(os.path.join(folder, "project_assets", "history.txt"))
+
+            # The missing history is reported, and the project loads with an empty history
+            with self.assertLogs(log, level="WARNING"):
+                self.updates.load_history(self.store)
+            self.updates.undo()
+            self.assertEqual(self.updates.actionHistory, [])
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+ @file
+ @brief This file contains unit tests (and a benchmark) for audio waveform generation
+ @author Jonathan Thomas <jonathan@openshot.org>
+
+ @section LICENSE
+
+ Copyright (c) 2008-2018 OpenShot Studios, LLC
+ (http://www.openshotstudios.com). This file is part of
+ OpenShot Video Editor (http://www.openshot.org), an open-source project
+ dedicated to delivering high quality video editing and animation solutions
+ to the world.
+
+ OpenShot Video Editor is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ OpenShot Video Editor is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
+ """
+
+import sys, os
+# Import parent folder (so it can find other imports)
+PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PATH not in sys.path:
+    sys.path.append(PATH)
+
+import math
+import random
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+import wave
+from classes.app import OpenShotApp
+import openshot  # Python module for libopenshot (required video editing module installed separately)
+
+# Length of the synthetic audio file used by the benchmark (in minutes)
+BENCHMARK_MINUTES = float(os.environ.get("WAVEFORM_BENCHMARK_MINUTES", 10))
+
+
+def write_test_audio(path, minutes, sample_rate=44100, channels=2):
+    """ Write a synthetic WAV file (a sine wave with a slowly changing volume, and some noise) """
+    one_second = []
+    for sample in range(sample_rate):
+        value = math.sin(2.0 * math.pi * 440.0 * sample / sample_rate) * 0.5 + random.uniform(-0.1, 0.1)
+        one_second.extend([int(value * 32767)] * channels)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        for second in range(int(minutes * 60)):
+            volume = 0.2 + 0.8 * abs(math.sin(second / 10.0))
+            f.writeframes(struct.pack("<%dh" % len(one_second), *(int(value * volume) for value in one_second)))
+
+
+class TestWaveform(unittest.TestCase):
+    """ Unit test class for waveform generation """
+
+    @classmethod
+    def setUpClass(TestWaveform):
+        """ Init unit test data """
+        # Create Qt application
+        TestWaveform.app = OpenShotApp(sys.argv, mode="unittest")
+        TestWaveform.folder = tempfile.mkdtemp()
+        TestWaveform.audio_path = os.path.join(TestWaveform.folder, "test.wav")
+        write_test_audio(TestWaveform.audio_path, BENCHMARK_MINUTES)
+
+    @classmethod
+    def tearDownClass(TestWaveform):
+        shutil.rmtree(TestWaveform.folder)
+
+    def test_waveform_levels(self):
+        """ Test saving and loading multi-resolution waveform peaks """
+        from classes.waveform import WaveformPeaks
+
+        peaks = WaveformPeaks.from_peaks(30.0, 200, [(index % 100) / 100.0 for index in range(1000)])
+        self.assertEqual([len(level) for level in peaks.levels], [1000, 250, 63, 16])
+
+        path = os.path.join(self.folder, "test.peaks")
+        peaks.save(path)
+        loaded = WaveformPeaks.load(path)
+        self.assertEqual(loaded.levels, peaks.levels)
+
+        # The least detailed level with enough samples is used
+        audio_data, samples_per_second = loaded.get_level(20)
+        self.assertEqual(samples_per_second, 50)
+        self.assertEqual(len(audio_data), 250)
+        self.assertAlmostEqual(max(audio_data), 0.99, places=3)
+
+    def test_waveform_partial_level(self):
+        """ Test reducing partial peaks to the same level of detail as a finished waveform """
+        from classes.waveform import WaveformPeaks, get_partial_level
+
+        peaks = [(index % 100) / 100.0 for index in range(1000)]
+        finished = WaveformPeaks.from_peaks(30.0, 200, peaks)
+        for samples_per_second in [1, 20, 50, 100, 200, 400]:
+            audio_data, level_samples_per_second = get_partial_level(peaks, samples_per_second)
+            finished_data, finished_samples_per_second = finished.get_level(samples_per_second)
+            self.assertEqual(level_samples_per_second, finished_samples_per_second)
+            self.assertEqual(len(audio_data), len(finished_data))
+
+        # The zoomed out level has 1/16 of the peaks
+        audio_data, level_samples_per_second = get_partial_level(peaks, 10)
+        self.assertEqual(level_samples_per_second, 12.5)
+        self.assertEqual(len(audio_data), 63)
+        self.assertAlmostEqual(max(audio_data), 0.99)
+
+    def test_waveform_chunks(self):
+        """ Test joining the peaks of chunks decoded by separate jobs """
+        from classes.waveform import WaveformJob
+
+        # 150 seconds at 30 fps (chunks of 60 seconds)
+        job = WaveformJob("test.peaks", self.audio_path, -1, 30.0, 4501)
+        self.assertEqual(job.chunks, [(1, 1801), (1801, 3601), (3601, 4501)])
+
+        # Unfinished chunks are silent
+        job.chunk_peaks[1] = [0.5] * 12001
+        peaks = job.get_peaks()
+        self.assertEqual(len(peaks), 30000)
+        self.assertEqual(peaks[11999:12001], [0.0, 0.5])
+        self.assertEqual(peaks[23999:24001], [0.5, 0.0])
+
+    def test_waveform_zoom(self):
+        """ Test that a new request for the same waveform (i.e. zooming) keeps the running job """
+        from classes.waveform import WaveformJob, WaveformRequest, WaveformScheduler
+
+        scheduler = WaveformScheduler()
+        job = WaveformJob("test.peaks", self.audio_path, -1, 30.0, 4501)
+        old_request = WaveformRequest("C1", self.audio_path, -1, None, 20)
+        old_request.job = job
+        job.requests.append(old_request)
+        scheduler.jobs[job.waveform_path] = job
+        scheduler.requests["C1"] = old_request
+
+        scheduler.request("C1", self.audio_path, -1, openshot.Keyframe(0.5), 80)
+        new_request = scheduler.requests["C1"]
+        self.assertTrue(old_request.cancelled)
+        self.assertFalse(job.cancelled)
+        self.assertEqual(job.requests, [new_request])
+        self.assertEqual(new_request.samples_per_second, 80)
+        self.assertEqual(new_request.volume_keyframe.GetValue(1), 0.5)
+
+        # Hiding the clip cancels the job
+        scheduler.cancel("C1")
+        self.assertTrue(job.cancelled)
+        scheduler.request_pool.shutdown()
+
+    def test_waveform_benchmark(self):
+        """ Benchmark the NumPy and per-sample waveform methods on a long audio file """
+        from classes import waveform_decoder as waveform
+        if not waveform.numpy:
+            self.skipTest("NumPy is not installed")
+
+        clip = openshot.Clip(self.audio_path)
+        clip.Open()
+        clip.Reader().info.has_video = False
+
+        start_time = time.perf_counter()
+        numpy_data = waveform.get_waveform_data(clip, -1, 200, use_numpy=True)
+        numpy_duration = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        slow_data = waveform.get_waveform_data(clip, -1, 200, use_numpy=False)
+        slow_duration = time.perf_counter() - start_time
+        clip.Close()
+
+        print("%.1f minutes of audio: per-sample %.2fs, NumPy %.2fs" % (BENCHMARK_MINUTES, slow_duration, numpy_duration))
+
+        # Both methods find (nearly) the same peaks. Only buckets which span 2 frames can differ,
+        # since the per-sample method cuts those buckets at the end of each frame.
+        self.assertAlmostEqual(len(numpy_data), len(slow_data), delta=len(slow_data) * 0.01)
+        self.assertAlmostEqual(max(numpy_data), max(slow_data), places=3)
+        self.assertLess(numpy_duration, slow_duration)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -322,13 +322,14 @@ App.controller("TimelineCtrl", function ($scope) {
   };
 
   // Set the audio data for a clip
-  $scope.setAudioData = function (clip_id, audio_data) {
+  $scope.setAudioData = function (clip_id, audio_data, samples_per_second) {
     // Find matching clip
     for (var clip_index = 0; clip_index < $scope.project.clips.length; clip_index++) {
       if ($scope.project.clips[clip_index].id === clip_id) {
         // Set audio data
         $scope.$apply(function () {
           $scope.project.clips[clip_index].audio_data = audio_data;
+          $scope.project.clips[clip_index].audio_samples_per_second = samples_per_second || 20;
           $scope.project.clips[clip_index].show_audio = true;
         });
         timeline.qt_log("DEBUG", "Audio data successful set on clip JSON");
@@ -1249,7 +1250,9 @@ App.controller("TimelineCtrl", function ($scope) {
    */
   $scope.applyJsonDiff = function (jsonDiff) {
 
-    // Loop through each UpdateAction
+    // Loop through each UpdateAction (a batch of actions is only re-sorted and digested once)
+    var diff_applied = false;
+    actions_loop:
     for (var action_index = 0; action_index < jsonDiff.length; action_index++) {
       var action = jsonDiff[action_index];
 
@@ -1265,7 +1268,7 @@ App.controller("TimelineCtrl", function ($scope) {
         if (key_value.constructor === String) {
           // Does the key value exist in scope?, No match, bail out
           if (!current_object.hasOwnProperty(key_value)) {
-            return false;
+            continue actions_loop;
           }
           // set current level and previous level
           previous_object = current_object;
@@ -1349,17 +1352,22 @@ App.controller("TimelineCtrl", function ($scope) {
           // delete current object from it's parent (previous object)
           previous_object.splice(current_position, 1);
         }
-        // Resize timeline if it's too small to contain all clips
-        $scope.resizeTimeline();
+        diff_applied = true;
+      }
+    }
 
-        // Re-sort clips and transitions array
-        $scope.sortItems();
+    if (diff_applied) {
+      // Resize timeline if it's too small to contain all clips
+      $scope.resizeTimeline();
 
-        // Re-index Layer Y values
-        $scope.updateLayerIndex();
-      }
-      $scope.$digest();
+      // Re-sort clips and transitions array
+      $scope.sortItems();
+
+      // Re-index Layer Y values
+      $scope.updateLayerIndex();
     }
+    $scope.$digest();
+
     // return true
     return true;
   };
@@ -61,7 +61,7 @@ function drawAudio(scope, clip_id) {
     var element = $("#clip_" + clip_id);
 
     // Determine start and stop samples
-    var samples_per_second = 20;
+    var samples_per_second = clip.audio_samples_per_second || 20;
     var block_width = 2; // 2 pixel wide blocks as smallest size
     var start_sample = Math.round(clip.start * samples_per_second);
     var end_sample = clip.end * samples_per_second;
@@ -24,10 +24,10 @@
  You should have received a copy of the GNU General Public License
  along with OpenShot Library.  If not, see <http://www.gnu.org/licenses/>.
  """
+import copy
 import functools
 import locale
 import os
-import time
 import tempfile
 import math
 
@@ -41,7 +41,7 @@ except ImportError:
 
 from xml.parsers.expat import ExpatError
 
-from PyQt5.QtCore import Qt, QCoreApplication, QTimer, QSize
+from PyQt5.QtCore import Qt, QTimer, QSize, pyqtSignal
 from PyQt5.QtWidgets import (
     QMessageBox, QDialog, QFileDialog, QDialogButtonBox, QPushButton
 )
@@ -52,6 +52,9 @@ from classes import ui_util, openshot_rc
 from classes import settings
 from classes.logger import log
 from classes.app import get_app
+from classes.export_engine import (
+    ExportEngine, SegmentedExportEngine, SmartRenderEngine, EXPORT_TYPES, acquire_export_settings, release_export_settings
+)
 from classes.metrics import track_metric_screen, track_metric_error
 from classes.query import File
 
@@ -64,6 +67,9 @@ class Export(QDialog):
     # Path to ui file
     ui_path = os.path.join(info.PATH, 'windows', 'ui', 'export.ui')
 
+    # Signal emitted (from the export thread) when an export is finished
+    exportFinished = pyqtSignal()
+
     def __init__(self):
 
         # Create dialog class
@@ -90,12 +96,19 @@ class Export(QDialog):
         # Add buttons to interface
         self.cancel_button = QPushButton(_('Cancel'))
         self.export_button = QPushButton(_('Export Video'))
+        self.queue_button = QPushButton(_('Add to Queue'))
         self.close_button = QPushButton(_('Done'))
         self.buttonBox.addButton(self.close_button, QDialogButtonBox.RejectRole)
         self.buttonBox.addButton(self.export_button, QDialogButtonBox.AcceptRole)
+        self.buttonBox.addButton(self.queue_button, QDialogButtonBox.ActionRole)
+        self.queue_button.clicked.connect(self.queue_clicked)
         self.buttonBox.addButton(self.cancel_button, QDialogButtonBox.RejectRole)
         self.close_button.setVisible(False)
         self.exporting = False
+        self.export_engine = None
+        self.export_running = False
+        self.closing = False
+        self.exportFinished.connect(self.export_finished)
 
         # Update FPS / Profile timer
         # Timer to use a delay before applying new profile/fps data (so we don't spam libopenshot)
@@ -115,9 +128,9 @@ class Export(QDialog):
         self.lblChannels.setVisible(False)
         self.txtChannels.setVisible(False)
 
-        # Set OMP thread disabled flag (for stability)
-        openshot.Settings.Instance().WAIT_FOR_VIDEO_PROCESSING_TASK = True
-        openshot.Settings.Instance().HIGH_QUALITY_SCALING = True
+        # Set OMP thread disabled flag (for stability), and high quality scaling (until the dialog is closed)
+        acquire_export_settings()
+        self.export_settings_acquired = True
 
         # Get the original timeline settings
         width = get_app().window.timeline_sync.timeline.info.width
@@ -696,6 +709,7 @@ class Export(QDialog):
         self.txtExportFolder.setEnabled(False)
         self.tabWidget.setEnabled(False)
         self.export_button.setEnabled(False)
+        self.queue_button.setEnabled(False)
         self.btnBrowse.setEnabled(False)
 
     def enableControls(self):
@@ -706,22 +720,12 @@ class Export(QDialog):
         self.txtExportFolder.setEnabled(True)
         self.tabWidget.setEnabled(True)
         self.export_button.setEnabled(True)
+        self.queue_button.setEnabled(True)
         self.btnBrowse.setEnabled(True)
 
     def accept(self):
         """ Start exporting video """
 
-        # Build the export window title
-        def titlestring(sec, fps, mess):
-            formatstr = "%(hours)d:%(minutes)02d:%(seconds)02d " + mess + " (%(fps)5.2f FPS)"
-            title_mes = _(formatstr) % {
-                'hours': sec / 3600,
-                'minutes': (sec / 60) % 60,
-                'seconds': sec % 60,
-                'fps': fps}
-            return title_mes
-
-
         # get translations
         _ = get_app()._tr
 
@@ -742,9 +746,58 @@ class Export(QDialog):
             self.exporting = False
             return
 
+        # Get export settings (and prompt for any problems)
+        export_settings = self.get_export_settings()
+        if not export_settings:
+            return
+
         # Disable controls
         self.disableControls()
         self.exporting = True
+        self.last_displayed_exported_portion = 0.0
+        self.format_of_progress_string = "%4.1f%% "
+        self.export_file_path = export_settings["path"]
+        video_settings = export_settings["video"]
+
+        # Notify window of export started
+        get_app().window.ExportStarted.emit(self.export_file_path, video_settings.get("start_frame"), video_settings.get("end_frame"))
+
+        # Export in a worker thread (so the UI is not blocked), or in segments (using many processes)
+        export_processes = int(self.s.get("export-processes") or 1)
+        if self.s.get("export-smart-render"):
+            self.export_engine = SmartRenderEngine(copy.deepcopy(get_app().project._data), export_settings,
+                                                   progress_callback=self.exportProgress,
+                                                   processes=export_processes)
+        elif export_processes > 1:
+            self.export_engine = SegmentedExportEngine(copy.deepcopy(get_app().project._data), export_settings,
+                                                       progress_callback=self.exportProgress,
+                                                       processes=export_processes)
+        else:
+            self.export_engine = ExportEngine(copy.deepcopy(get_app().project._data), export_settings,
+                                              progress_callback=self.exportProgress)
+        self.export_running = True
+        self.export_engine.start(finished_callback=lambda engine: self.exportFinished.emit())
+
+    def queue_clicked(self):
+        """ Add an export job to the render queue (which exports in the background, and can be resumed) """
+        _ = get_app()._tr
+        export_settings = self.get_export_settings()
+        if not export_settings:
+            return
+
+        get_app().window.render_queue.add(copy.deepcopy(get_app().project._data), export_settings,
+                                          name=os.path.basename(export_settings["path"]),
+                                          processes=int(self.s.get("export-processes") or 1))
+        get_app().window.statusBar.showMessage(_("Added %s to the render queue") % os.path.basename(export_settings["path"]), 5000)
+
+        # Close dialog
+        self.restore_preview_settings()
+        super(Export, self).accept()
+
+    def get_export_settings(self):
+        """ Get the export settings (for the export engine) from the dialog, or None if the
+        export path is not valid (or the user doesn't want to replace an existing file) """
+        _ = get_app()._tr
 
         # Determine type of export (video+audio, video, audio, image sequences)
         # _("Video & Audio"), _("Video Only"), _("Audio Only"), _("Image Sequence")
@@ -780,9 +833,7 @@ class Export(QDialog):
                 _("Export Video"),
                 _("%s is an input file.\nPlease choose a different name.") % file_name_with_ext,
                 QMessageBox.Ok)
-            self.enableControls()
-            self.exporting = False
-            return
+            return None
 
         # Handle exception
         if os.path.exists(export_file_path) and export_type in [_("Video & Audio"), _("Video Only"), _("Audio Only")]:
@@ -793,10 +844,7 @@ class Export(QDialog):
                 QMessageBox.No | QMessageBox.Yes)
             if ret == QMessageBox.No:
                 # Stop and don't do anything
-                # Re-enable controls
-                self.enableControls()
-                self.exporting = False
-                return
+                return None
 
         # Init export settings
         interlacedIndex = self.cboInterlaced.currentIndex()
@@ -807,12 +855,19 @@ class Export(QDialog):
                             "height": self.txtHeight.value(),
                             "pixel_ratio": {"num": self.txtPixelRatioNum.value(), "den": self.txtPixelRatioDen.value()},
                             "video_bitrate": int(self.convert_to_bytes(self.txtVideoBitRate.text())),
+                            "quality": None,
                             "start_frame": self.txtStartFrame.value(),
                             "end_frame": self.txtEndFrame.value(),
                             "interlace": ((interlacedIndex == 1) or (interlacedIndex == 2)),
                             "topfirst": interlacedIndex == 1
                           }
 
+        # Set the quality in case crf, cqp or qp was selected
+        for quality in ["crf", "cqp", "qp"]:
+            if quality in self.txtVideoBitRate.text():
+                video_settings["quality"] = quality
+                break
+
         audio_settings = {"acodec": self.txtAudioCodec.text(),
                           "sample_rate": self.txtSampleRate.value(),
                           "channels": self.txtChannels.value(),
@@ -834,146 +889,80 @@ class Export(QDialog):
         # Mark project file as unsaved
         get_app().project.has_unsaved_changes = True
 
-        # Set MaxSize (so we don't have any downsampling)
-        self.timeline.SetMaxSize(video_settings.get("width"), video_settings.get("height"))
-
-        # Set lossless cache settings (temporarily)
-        export_cache_object = openshot.CacheMemory(500)
-        self.timeline.SetCache(export_cache_object)
+        # Export settings (the export types match the cboExportTo options)
+        return {
+            "path": export_file_path,
+            "type": EXPORT_TYPES[self.cboExportTo.currentIndex()],
+            "video": video_settings,
+            "audio": audio_settings,
+            "prefetch_frames": int(self.s.get("export-prefetch-frames") or 0),
+            "report": bool(self.s.get("export-report")),
+        }
+
+    def titlestring(self, sec, fps, mess):
+        """ Build the export window title """
+        _ = get_app()._tr
+        formatstr = "%(hours)d:%(minutes)02d:%(seconds)02d " + mess + " (%(fps)5.2f FPS)"
+        title_mes = _(formatstr) % {
+            'hours': sec / 3600,
+            'minutes': (sec / 60) % 60,
+            'seconds': sec % 60,
+            'fps': fps}
+        return title_mes
+
+    def exportProgress(self, frame, start_frame_export, end_frame_export, seconds_run):
+        """ Callback for export progress (called from the export thread) """
+        _ = get_app()._tr
+        current_exported_portion = (frame - start_frame_export) * 1.0 / (end_frame_export - start_frame_export)
+        if (current_exported_portion - self.last_displayed_exported_portion) > 0.0:
+            # the log10 of the difference of the fraction of the completed frames is the negativ
+            # number of digits after the decimal point after which the first digit is not 0
+            digits_after_decimalpoint = math.ceil(-2.0 - math.log10(current_exported_portion - self.last_displayed_exported_portion))
+        else:
+            digits_after_decimalpoint = 1
+        # We want between 1 and 5 digits after the decimal point
+        digits_after_decimalpoint = min(5, max(1, digits_after_decimalpoint))
+        self.last_displayed_exported_portion = current_exported_portion
+        self.format_of_progress_string = "%4." + str(digits_after_decimalpoint) + "f%% "
+
+        title_message = ""
+        if (frame - start_frame_export) != 0 and seconds_run != 0:
+            seconds_left = round(seconds_run * (end_frame_export - frame) / (frame - start_frame_export))
+            fps_encode = (frame - start_frame_export) / seconds_run
+            if frame == end_frame_export:
+                title_message = _("Finalizing video export, please wait...")
+            else:
+                title_message = self.titlestring(seconds_left, fps_encode, "Remaining")
 
-        # Rescale all keyframes (if needed)
-        if self.export_fps_factor != 1.0:
-            # Get a copy of rescaled project data (this does not modify the active project)
-            rescaled_app_data = get_app().project.rescale_keyframes(self.export_fps_factor)
+        # Emit frame exported
+        get_app().window.ExportFrame.emit(title_message, start_frame_export, end_frame_export, frame,
+                                          self.format_of_progress_string)
 
-            # Load the "export" Timeline reader with the JSON from the real timeline
-            self.timeline.SetJson(json.dumps(rescaled_app_data))
+    def export_finished(self):
+        """ Handle the end of an export (in the UI thread) """
+        _ = get_app()._tr
+        self.export_running = False
+        engine = self.export_engine
+        video_settings = engine.video_settings
+        audio_settings = engine.audio_settings
+
+        # Show time spent compositing vs encoding frames (and the slowest frames, if reported)
+        if engine.report_path:
+            log.info("Export timing report saved: %s" % engine.report_path)
+            self.progressExportVideo.setToolTip("%s\n\n%s" % (engine.get_timing_summary(),
+                                                               engine.report.get_summary_text()))
+        else:
+            self.progressExportVideo.setToolTip(engine.get_timing_summary())
 
-            # Re-update the timeline FPS again (since the timeline just got clobbered)
-            self.updateFrameRate()
+        # Emit final exported frame (with elapsed time)
+        title_message = self.titlestring(round(engine.elapsed), engine.frames_per_second, "Elapsed")
+        get_app().window.ExportFrame.emit(title_message, engine.start_frame, engine.end_frame,
+                                          engine.current_frame, self.format_of_progress_string)
 
-        # Create FFmpegWriter
-        try:
-            w = openshot.FFmpegWriter(export_file_path)
-
-            # Set video options
-            if export_type in [_("Video & Audio"), _("Video Only"), _("Image Sequence")]:
-                w.SetVideoOptions(True,
-                                  video_settings.get("vcodec"),
-                                  openshot.Fraction(video_settings.get("fps").get("num"),
-                                                    video_settings.get("fps").get("den")),
-                                  video_settings.get("width"),
-                                  video_settings.get("height"),
-                                  openshot.Fraction(video_settings.get("pixel_ratio").get("num"),
-                                                    video_settings.get("pixel_ratio").get("den")),
-                                  video_settings.get("interlace"),
-                                  video_settings.get("topfirst"),
-                                  video_settings.get("video_bitrate"))
-
-            # Set audio options
-            if export_type in [_("Video & Audio"), _("Audio Only")]:
-                w.SetAudioOptions(True,
-                                  audio_settings.get("acodec"),
-                                  audio_settings.get("sample_rate"),
-                                  audio_settings.get("channels"),
-                                  audio_settings.get("channel_layout"),
-                                  audio_settings.get("audio_bitrate"))
-
-            # Prepare the streams
-            w.PrepareStreams()
-
-            # These extra options should be set in an extra method
-            # No feedback is given to the user
-            # TODO: Tell user if option is not available
-            if export_type in [_("Audio Only")]:
-                # Muxing options for mp4/mov
-                w.SetOption(openshot.AUDIO_STREAM, "muxing_preset", "mp4_faststart")
-            else:
-                # Muxing options for mp4/mov
-                w.SetOption(openshot.VIDEO_STREAM, "muxing_preset", "mp4_faststart")
-                # Set the quality in case crf, cqp or qp was selected
-                if "crf" in self.txtVideoBitRate.text():
-                    w.SetOption(openshot.VIDEO_STREAM, "crf", str(int(video_settings.get("video_bitrate"))) )
-                elif "cqp" in self.txtVideoBitRate.text():
-                    w.SetOption(openshot.VIDEO_STREAM, "cqp", str(int(video_settings.get("video_bitrate"))) )
-                elif "qp" in self.txtVideoBitRate.text():
-                    w.SetOption(openshot.VIDEO_STREAM, "qp", str(int(video_settings.get("video_bitrate"))) )
-
-
-            # Open the writer
-            w.Open()
-
-            # Notify window of export started
-            title_message = ""
-            get_app().window.ExportStarted.emit(export_file_path, video_settings.get("start_frame"), video_settings.get("end_frame"))
-
-            progressstep = max(1 , round(( video_settings.get("end_frame") - video_settings.get("start_frame") ) / 1000))
-            start_time_export = time.time()
-            seconds_run = 0
-            start_frame_export = video_settings.get("start_frame")
-            end_frame_export = video_settings.get("end_frame")
-            last_exported_time = time.time()
-            last_displayed_exported_portion = 0.0
-            current_exported_portion = 0.0
-            digits_after_decimalpoint = 1
-            # Precision of the progress bar
-            format_of_progress_string = "%4.1f%% "
-            # Write each frame in the selected range
-            for frame in range(video_settings.get("start_frame"), video_settings.get("end_frame") + 1):
-                # Update progress bar (emit signal to main window)
-                end_time_export = time.time()
-                if ((frame % progressstep) == 0) or ((end_time_export - last_exported_time) > 1):
-                    current_exported_portion = (frame - start_frame_export) * 1.0  / (end_frame_export - start_frame_export)
-                    if ((current_exported_portion - last_displayed_exported_portion) > 0.0):
-                        # the log10 of the difference of the fraction of the completed frames is the negativ
-                        # number of digits after the decimal point after which the first digit is not 0
-                        digits_after_decimalpoint = math.ceil( -2.0 - math.log10( current_exported_portion - last_displayed_exported_portion ))
-                    else:
-                        digits_after_decimalpoint = 1
-                    if digits_after_decimalpoint < 1:
-                        # We want at least 1 digit after the decimal point
-                        digits_after_decimalpoint = 1
-                    if digits_after_decimalpoint > 5:
-                        # We don't want not more than 5 difits after the decimal point
-                        digits_after_decimalpoint = 5
-                    last_displayed_exported_portion = current_exported_portion
-                    format_of_progress_string = "%4." + str(digits_after_decimalpoint) + "f%% "
-                    last_exported_time = time.time()
-                    if ((( frame - start_frame_export ) != 0) & (( end_time_export - start_time_export ) != 0)):
-                        seconds_left = round(( start_time_export - end_time_export )*( frame - end_frame_export )/( frame - start_frame_export ))
-                        fps_encode = ((frame - start_frame_export)/(end_time_export-start_time_export))
-                        if frame == end_frame_export:
-                            title_message = _("Finalizing video export, please wait...")
-                        else:
-                            title_message = titlestring(seconds_left, fps_encode, "Remaining")
-
-                    # Emit frame exported
-                    get_app().window.ExportFrame.emit(title_message, video_settings.get("start_frame"), video_settings.get("end_frame"), frame, format_of_progress_string)
-
-                    # Process events (to show the progress bar moving)
-                    QCoreApplication.processEvents()
-
-                # Write the frame object to the video
-                w.WriteFrame(self.timeline.GetFrame(frame))
-
-                # Check if we need to bail out
-                if not self.exporting:
-                    break
-
-            # Close writer
-            w.Close()
-
-            # Emit final exported frame (with elapsed time)
-            seconds_run = round((end_time_export - start_time_export))
-            title_message = titlestring(seconds_run, fps_encode, "Elapsed")
-
-            get_app().window.ExportFrame.emit(title_message, video_settings.get("start_frame"),
-                                              video_settings.get("end_frame"), frame, format_of_progress_string)
-
-        except Exception as e:
+        if engine.error:
             # TODO: Find a better way to catch the error. This is the only way I have found that
             # does not throw an error
-            error_type_str = str(e)
+            error_type_str = str(engine.error)
             log.info("Error type string: %s" % error_type_str)
 
             if "InvalidChannels" in error_type_str:
@@ -1005,39 +994,33 @@ class Export(QDialog):
             msg.setText(_("Sorry, there was an error exporting your video: \n%s") % friendly_error)
             msg.exec_()
 
-        # Notify window of export started
-        get_app().window.ExportEnded.emit(export_file_path)
+        # Notify window of export ended
+        get_app().window.ExportEnded.emit(self.export_file_path)
 
-        # Close timeline object
+        # Close timeline object (of the dialog)
         self.timeline.Close()
 
         # Clear all cache
         self.timeline.ClearAllCache()
 
-        # Re-set OMP thread enabled flag
-        if self.s.get("omp_threads_enabled"):
-            openshot.Settings.Instance().WAIT_FOR_VIDEO_PROCESSING_TASK = False
-        else:
-            openshot.Settings.Instance().WAIT_FOR_VIDEO_PROCESSING_TASK = True
+        # Restore preview settings
+        self.restore_preview_settings()
 
-        # Return scale mode to lower quality scaling (for faster previews)
-        openshot.Settings.Instance().HIGH_QUALITY_SCALING = False
+        if self.closing:
+            # Close dialog (the export was cancelled by closing it)
+            super(Export, self).reject()
+            return
 
         # Handle end of export (for non-canceled exports)
         if self.s.get("show_finished_window") and self.exporting:
             # Hide cancel and export buttons
             self.cancel_button.setVisible(False)
             self.export_button.setVisible(False)
+            self.queue_button.setVisible(False)
 
             # Reveal done button
             self.close_button.setVisible(True)
 
-            # Restore windows title to show elapsed time
-            title_message = titlestring(seconds_run, fps_encode, "Elapsed")
-
-            get_app().window.ExportFrame.emit(title_message, video_settings.get("start_frame"),
-                                              video_settings.get("end_frame"), frame, format_of_progress_string)
-
             # Make progress bar green (to indicate we are done)
             from PyQt5.QtGui import QPalette
             p = QPalette()
@@ -1046,10 +1029,17 @@ class Export(QDialog):
 
             # Raise the window
             self.show()
-        else:
+        elif self.exporting:
             # Accept dialog
             super(Export, self).accept()
 
+    def restore_preview_settings(self):
+        """ Restore the libopenshot settings used by the preview (changed for exporting). The settings
+        are shared by all exports, so they are only restored after the last one (i.e. in the render queue). """
+        if self.export_settings_acquired:
+            self.export_settings_acquired = False
+            release_export_settings()
+
     def reject(self):
         if self.exporting and not self.close_button.isVisible():
             # Show confirmation dialog
@@ -1062,17 +1052,16 @@ class Export(QDialog):
                 # Resume export
                 return
 
-        # Re-set OMP thread enabled flag
         # NOTE: This is always called when closing the export modal, and thus
         # the keyframes are always scaled back to the original FPS if needed.
-        if self.s.get("omp_threads_enabled"):
-            openshot.Settings.Instance().WAIT_FOR_VIDEO_PROCESSING_TASK = False
-        else:
-            openshot.Settings.Instance().WAIT_FOR_VIDEO_PROCESSING_TASK = True
+        self.restore_preview_settings()
 
-        # Return scale mode to lower quality scaling (for faster previews)
-        openshot.Settings.Instance().HIGH_QUALITY_SCALING = False
-
-        # Cancel dialog
+        # Cancel dialog (and stop the export thread, after the current frame)
         self.exporting = False
+        if self.export_running:
+            # Close the dialog when the export thread is finished (see export_finished), without blocking the UI
+            self.closing = True
+            self.cancel_button.setEnabled(False)
+            self.export_engine.cancel()
+            return
         super(Export, self).reject()
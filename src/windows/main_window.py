@@ -31,6 +31,8 @@ import os
 import platform
 import shutil
 import sys
+import threading
+import time
 import webbrowser
 from copy import deepcopy
 from time import sleep
@@ -52,18 +54,24 @@ from PyQt5.QtWidgets import (
 
 from classes import info, ui_util, settings, qt_types, updates
 from classes.app import get_app
+from classes.autosave import AutoSaver
 from classes.conversion import zoomToSeconds, secondsToZoom
 from classes.exporters.edl import export_edl
 from classes.exporters.final_cut_pro import export_xml
 from classes.importers.edl import import_edl
 from classes.importers.final_cut_pro import import_xml
 from classes.logger import log
+from classes.media_cache import media_cache
 from classes.metrics import (
     track_metric_session, track_metric_screen,
     track_metric_error, track_exception_stacktrace,
     )
-from classes.query import Clip, Transition, Marker, Track
+from classes.project_data import find_missing_paths
+from classes.proxies import proxy_manager
+from classes.query import Clip, File, Transition, Marker, Track
+from classes.render_queue import RenderQueue, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED
 from classes.thumbnail import httpThumbnailServerThread
+from classes.thumbnail_store import thumbnail_store
 from classes.time_parts import secondsToTimecode
 from classes.timeline import TimelineSync
 from classes.version import get_current_Version
@@ -103,14 +111,17 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
     SpeedSignal = pyqtSignal(float)
     RecoverBackup = pyqtSignal()
     FoundVersionSignal = pyqtSignal(str)
-    WaveformReady = pyqtSignal(str, list)
+    WaveformReady = pyqtSignal(str, list, float)
     TransformSignal = pyqtSignal(str)
     ExportStarted = pyqtSignal(str, int, int)
     ExportFrame = pyqtSignal(str, int, int, int, str)
     ExportEnded = pyqtSignal(str)
+    RenderJobChanged = pyqtSignal(str)
+    ProxyReady = pyqtSignal(str, object)
     MaxSizeChanged = pyqtSignal(object)
     InsertKeyframe = pyqtSignal(object)
     OpenProjectSignal = pyqtSignal(str)
+    ProjectFileRead = pyqtSignal(str, object)
     ThumbnailUpdated = pyqtSignal(str)
     FileUpdated = pyqtSignal(str)
     CaptionTextUpdated = pyqtSignal(str, object)
@@ -178,6 +189,15 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
         self.timeline_sync.timeline.Close()
         self.timeline_sync.timeline = None
 
+        # Stop render jobs (they are resumed on the next launch)
+        self.render_queue.shutdown()
+
+        # Stop creating proxies
+        proxy_manager.shutdown()
+
+        # Finish writing any autosave
+        self.autosaver.wait(10)
+
         # Destroy lock file
         self.destroy_lock_file()
 
@@ -189,7 +209,7 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
         if os.path.exists(info.BACKUP_FILE):
             # Load recovery project
             log.info("Recovering backup file: %s" % info.BACKUP_FILE)
-            self.open_project(info.BACKUP_FILE, clear_thumbnails=False)
+            self.open_project(info.BACKUP_FILE, clear_thumbnails=False, background=False)
 
             # Clear the file_path (which is set by saving the project)
             project = get_app().project
@@ -297,7 +317,7 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
             self.destroy_lock_file()
 
         else:
-            # Normal startup, clear thumbnails
+            # Normal startup, clear thumbnails (named by file ID; the thumbnail store is kept)
             self.clear_all_thumbnails()
 
         # Write lock file (try a few times if failure)
@@ -487,13 +507,19 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
         _ = app._tr  # Get translation function
 
         try:
+            # Finish any autosave first (so it can't replace this save)
+            self.autosaver.wait()
+
             # Update history in project data
             s = settings.get_settings()
-            app.updates.save_history(app.project, s.get("history-limit"))
+            app.updates.save_history(app.project, s.get("history-limit"), file_path if s.get("history-file") else None)
 
             # Save project to file
             app.project.save(file_path)
 
+            # Recovery points now start from this save
+            self.autosaver.reset(file_path)
+
             # Set Window title
             self.SetWindowTitle()
 
@@ -506,8 +532,9 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
             log.error("Couldn't save project %s.", file_path, exc_info=1)
             QMessageBox.warning(self, _("Error Saving Project"), str(ex))
 
-    def open_project(self, file_path, clear_thumbnails=True):
-        """ Open a project from a file path, and refresh the screen """
+    def open_project(self, file_path, clear_thumbnails=True, background=True):
+        """ Open a project from a file path, and refresh the screen. The project file is read
+        on a background thread (unless background is False), and loaded in stages. """
 
         app = get_app()
         _ = app._tr  # Get translation function
@@ -517,6 +544,12 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
             # Ignore the request
             return
 
+        if self.opening_project:
+            # Only open one project at a time
+            log.info("Ignoring request to open {} (still opening {})".format(
+                file_path, self.opening_project["path"]))
+            return
+
         # Stop preview thread
         self.SpeedSignal.emit(0)
         ui_util.setup_icon(self, self.actionPlay, "actionPlay", "media-playback-start")
@@ -537,53 +570,132 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
                 # User canceled prompt
                 return
 
-        # Set cursor to waiting
-        app.setOverrideCursor(QCursor(Qt.WaitCursor))
+        if not os.path.exists(file_path):
+            log.info("File not found at {}".format(file_path))
+            self.statusBar.showMessage(
+                _("Project %s is missing (it may have been moved or deleted). "
+                  "It has been removed from the Recent Projects menu." % file_path),
+                5000)
+            self.remove_recent_project(file_path)
+            self.load_recent_menu()
+            return
+
+        # Set cursor to busy (the window still responds while the project file is read)
+        app.setOverrideCursor(QCursor(Qt.BusyCursor))
+        self.opening_project = {
+            "path": file_path,
+            "clear_thumbnails": clear_thumbnails,
+            "start": time.perf_counter(),
+            "background": background,
+        }
+        self.statusBar.showMessage(_("Reading project %s...") % os.path.basename(file_path))
+
+        if background:
+            # Read and parse the project file on a background thread
+            threading.Thread(target=self.read_project_file, args=(file_path,),
+                             name="open-project", daemon=True).start()
+        else:
+            self.project_file_read(file_path, self.read_project_file(file_path, emit=False))
 
+    def read_project_file(self, file_path, emit=True):
+        """ Read a project file (on a background thread), and check which of its files are missing.
+        Files which can't be read as a v2.X project (i.e. legacy v1.X projects) are read again on
+        the main thread. """
         try:
-            if os.path.exists(file_path):
-                # Clear any previous thumbnails
-                if clear_thumbnails:
-                    self.clear_all_thumbnails()
+            project_data = get_app().project.read_project(file_path)
+            self.opening_project["missing_paths"] = find_missing_paths(project_data)
+        except Exception:
+            log.info("Project {} will be read on the main thread".format(file_path), exc_info=1)
+            project_data = None
+        if emit:
+            self.ProjectFileRead.emit(file_path, project_data)
+        return project_data
+
+    def project_file_read(self, file_path, project_data):
+        """ Load a project which has been read, so the timeline appears. Missing files and
+        history are handled afterwards, by finish_open_project(). """
+        app = get_app()
+        _ = app._tr  # Get translation function
 
-                # Load project file
-                app.project.load(file_path, clear_thumbnails)
+        try:
+            self.statusBar.showMessage(_("Loading timeline..."))
 
-                # Set Window title
-                self.SetWindowTitle()
+            # Clear any previous thumbnails
+            if self.opening_project["clear_thumbnails"]:
+                self.clear_all_thumbnails()
 
-                # Reset undo/redo history
-                app.updates.reset()
-                app.updates.load_history(app.project)
+            # Load project data (and distribute it to the timeline)
+            app.project.load(file_path, self.opening_project["clear_thumbnails"],
+                             project_data=project_data, check_paths=False)
 
-                # Reset selections
-                self.clearSelections()
+            # Set Window title
+            self.SetWindowTitle()
+
+            # Clear undo/redo history (until it is loaded)
+            app.updates.reset()
 
-                # Refresh files views
-                self.refreshFilesSignal.emit()
+            # Reset selections
+            self.clearSelections()
 
-                # Refresh thumbnail
-                self.refreshFrameSignal.emit()
+            # Refresh files views (thumbnails load in the background)
+            self.refreshFilesSignal.emit()
 
-                # Load recent projects again
-                self.load_recent_menu()
+            # Refresh thumbnail
+            self.refreshFrameSignal.emit()
 
-                log.info("Loaded project {}".format(file_path))
-            else:
-                log.info("File not found at {}".format(file_path))
-                self.statusBar.showMessage(
-                    _("Project %s is missing (it may have been moved or deleted). "
-                      "It has been removed from the Recent Projects menu." % file_path),
-                    5000)
-                self.remove_recent_project(file_path)
-                self.load_recent_menu()
+            log.info("Loaded project timeline {} in {:.2f} seconds".format(
+                file_path, time.perf_counter() - self.opening_project["start"]))
+
+        except Exception as ex:
+            log.error("Couldn't open project %s.", file_path, exc_info=1)
+            self.opening_project = None
+            self.statusBar.clearMessage()
+            app.restoreOverrideCursor()
+            QMessageBox.warning(self, _("Error Opening Project"), str(ex))
+            return
+
+        if self.opening_project["background"]:
+            # Let the window draw the timeline, before finishing
+            QTimer.singleShot(0, self.finish_open_project)
+        else:
+            self.finish_open_project()
+
+    def finish_open_project(self):
+        """ Check for missing files and load the history of an opened project """
+        app = get_app()
+        _ = app._tr  # Get translation function
+        file_path = self.opening_project["path"]
+
+        try:
+            # Prompt for missing files (only the changed files and clips are updated)
+            self.statusBar.showMessage(_("Checking project files..."))
+            missing_paths = self.opening_project.get("missing_paths")
+            if missing_paths is None:
+                missing_paths = find_missing_paths(app.project._data)
+            app.project.update_missing_paths(missing_paths)
+
+            # Reset undo/redo history
+            self.statusBar.showMessage(_("Loading history..."))
+            app.updates.reset()
+            app.updates.load_history(app.project)
+
+            # Load recent projects again
+            self.load_recent_menu()
+
+            log.info("Loaded project {} in {:.2f} seconds".format(
+                file_path, time.perf_counter() - self.opening_project["start"]))
+            self.statusBar.clearMessage()
 
         except Exception as ex:
             log.error("Couldn't open project %s.", file_path, exc_info=1)
+            self.statusBar.clearMessage()
             QMessageBox.warning(self, _("Error Opening Project"), str(ex))
 
-        # Restore normal cursor
-        app.restoreOverrideCursor()
+        finally:
+            self.opening_project = None
+
+            # Restore normal cursor
+            app.restoreOverrideCursor()
 
     def clear_all_thumbnails(self):
         """Clear all user thumbnails"""
@@ -648,6 +760,64 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
         # Load project file
         self.OpenProjectSignal.emit(file_path)
 
+    def actionRecoverProject_trigger(self):
+        """ Save an autosaved version of a project (a recovery point) as a new project file, and open it """
+        app = get_app()
+        _ = app._tr
+
+        # Do we have unsaved changes?
+        if app.project.needs_save():
+            ret = QMessageBox.question(
+                self,
+                _("Unsaved Changes"),
+                _("Save changes to project first?"),
+                QMessageBox.Cancel | QMessageBox.No | QMessageBox.Yes)
+            if ret == QMessageBox.Yes:
+                # Save project
+                self.actionSave_trigger()
+            elif ret == QMessageBox.Cancel:
+                # User canceled prompt
+                return
+
+        # Choose a recovery point (newest first)
+        self.autosaver.wait()
+        with self.autosaver.recovery_lock:
+            points = list(reversed(self.autosaver.recovery.get_points()))
+        if not points:
+            QMessageBox.information(self, _("Recover Project"), _("No autosaved versions were found."))
+            return
+        labels = ["%s - %s" % (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(point["time"])), point["project"])
+                  for point in points]
+        label, ok = QInputDialog.getItem(self, _("Recover Project"), _("Autosaved version:"), labels, 0, False)
+        if not ok:
+            return
+        point = points[labels.index(label)]
+
+        # Prompt for the recovered project file (next to the project, by default)
+        folder_path, file_name = os.path.split(point["project"])
+        recommended_path = os.path.join(folder_path, "%s-%s.osp" % (
+            os.path.splitext(file_name)[0], time.strftime("%Y%m%d-%H%M%S", time.localtime(point["time"]))))
+        file_path = QFileDialog.getSaveFileName(
+            self,
+            _("Save Recovered Project As..."),
+            recommended_path,
+            _("OpenShot Project (*.osp)"))[0]
+        if not file_path:
+            return
+        if not file_path.endswith(".osp"):
+            file_path = "%s.osp" % file_path
+
+        try:
+            with self.autosaver.recovery_lock:
+                self.autosaver.recovery.restore(point, file_path)
+        except (OSError, ValueError) as ex:
+            log.error("Failed to recover project: %s" % point["project"], exc_info=1)
+            QMessageBox.warning(self, _("Recover Project"), _("Failed to recover project: %s") % ex)
+            return
+
+        # Load project file
+        self.OpenProjectSignal.emit(file_path)
+
     def actionSave_trigger(self):
         app = get_app()
         _ = app._tr
@@ -672,11 +842,13 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
 
     def auto_save_project(self):
         """Auto save the project"""
-        import time
-
         app = get_app()
         s = settings.get_settings()
 
+        if self.opening_project:
+            # Don't save the previous project (or a partly loaded one) while opening a project
+            return
+
         # Get current filepath (if any)
         file_path = app.project.current_filepath
         if app.project.needs_save():
@@ -686,31 +858,22 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
                 # A Real project file exists
                 # Append .osp if needed
                 if ".osp" not in file_path:
-                    file_path = "%s.osp" % file_path
-                folder_path, file_name = os.path.split(file_path)
-                file_name, file_ext = os.path.splitext(file_name)
-
-                # Make copy of unsaved project file in 'recovery' folder
-                recover_path_with_timestamp = os.path.join(
-                    info.RECOVERY_PATH, "%d-%s.osp" % (int(time.time()), file_name))
-                shutil.copy(file_path, recover_path_with_timestamp)
-
-                # Find any recovery file older than X auto-saves
-                old_backup_files = []
-                backup_file_count = 0
-                for backup_filename in reversed(sorted(os.listdir(info.RECOVERY_PATH))):
-                    if ".osp" in backup_filename:
-                        backup_file_count += 1
-                        if backup_file_count > s.get("recovery-limit"):
-                            old_backup_files.append(os.path.join(info.RECOVERY_PATH, backup_filename))
-
-                # Delete recovery files which are 'too old'
-                for backup_filepath in old_backup_files:
-                    os.unlink(backup_filepath)
+                    # Save project (as a new file)
+                    self.save_project("%s.osp" % file_path)
+                    return
 
-                # Save project
+                # Update history in project data (new actions are appended to the history file)
+                app.updates.save_history(app.project, s.get("history-limit"), file_path if s.get("history-file") else None)
+
+                # Move any new temp files (i.e. Blender animations) to the project folder
+                app.project.move_temp_paths_to_project_folder(file_path, previous_path=file_path)
+
+                # Write project (and a recovery point) on a background thread
                 log.info("Auto save project file: %s", file_path)
-                self.save_project(file_path)
+                self.autosaver.recovery.limit = int(s.get("recovery-limit"))
+                self.autosaver.save(file_path, app.project.snapshot(file_path))
+                app.project.has_unsaved_changes = False
+                self.SetWindowTitle()
 
                 # Remove backup.osp (if any)
                 if os.path.exists(info.BACKUP_FILE):
@@ -720,11 +883,7 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
             else:
                 # No saved project found
                 log.info("Creating backup of project file: %s", info.BACKUP_FILE)
-                app.project.save(info.BACKUP_FILE, move_temp_files=False, make_paths_relative=False)
-
-                # Clear the file_path (which is set by saving the project)
-                app.project.current_filepath = None
-                app.project.has_unsaved_changes = True
+                self.autosaver.save(info.BACKUP_FILE, app.project.snapshot(info.BACKUP_FILE), recovery=False)
 
     def actionSaveAs_trigger(self):
         app = get_app()
@@ -1682,48 +1841,48 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
 
         # Timeline keyboard shortcuts
         elif key.matches(self.getShortcutByName("sliceAllKeepBothSides")) == QKeySequence.ExactMatch:
-            intersecting_clips = Clip.filter(intersect=playhead_position)
-            intersecting_trans = Transition.filter(intersect=playhead_position)
+            intersecting_clips = Clip.filter(intersect=playhead_position, read_only=True)
+            intersecting_trans = Transition.filter(intersect=playhead_position, read_only=True)
             if intersecting_clips or intersecting_trans:
                 # Get list of clip ids
                 clip_ids = [c.id for c in intersecting_clips]
                 trans_ids = [t.id for t in intersecting_trans]
                 self.timeline.Slice_Triggered(0, clip_ids, trans_ids, playhead_position)
         elif key.matches(self.getShortcutByName("sliceAllKeepLeftSide")) == QKeySequence.ExactMatch:
-            intersecting_clips = Clip.filter(intersect=playhead_position)
-            intersecting_trans = Transition.filter(intersect=playhead_position)
+            intersecting_clips = Clip.filter(intersect=playhead_position, read_only=True)
+            intersecting_trans = Transition.filter(intersect=playhead_position, read_only=True)
             if intersecting_clips or intersecting_trans:
                 # Get list of clip ids
                 clip_ids = [c.id for c in intersecting_clips]
                 trans_ids = [t.id for t in intersecting_trans]
                 self.timeline.Slice_Triggered(1, clip_ids, trans_ids, playhead_position)
         elif key.matches(self.getShortcutByName("sliceAllKeepRightSide")) == QKeySequence.ExactMatch:
-            intersecting_clips = Clip.filter(intersect=playhead_position)
-            intersecting_trans = Transition.filter(intersect=playhead_position)
+            intersecting_clips = Clip.filter(intersect=playhead_position, read_only=True)
+            intersecting_trans = Transition.filter(intersect=playhead_position, read_only=True)
             if intersecting_clips or intersecting_trans:
                 # Get list of clip ids
                 clip_ids = [c.id for c in intersecting_clips]
                 trans_ids = [t.id for t in intersecting_trans]
                 self.timeline.Slice_Triggered(2, clip_ids, trans_ids, playhead_position)
         elif key.matches(self.getShortcutByName("sliceSelectedKeepBothSides")) == QKeySequence.ExactMatch:
-            intersecting_clips = Clip.filter(intersect=playhead_position)
-            intersecting_trans = Transition.filter(intersect=playhead_position)
+            intersecting_clips = Clip.filter(intersect=playhead_position, read_only=True)
+            intersecting_trans = Transition.filter(intersect=playhead_position, read_only=True)
             if intersecting_clips or intersecting_trans:
                 # Get list of clip ids
                 clip_ids = [c.id for c in intersecting_clips if c.id in self.selected_clips]
                 trans_ids = [t.id for t in intersecting_trans if t.id in self.selected_transitions]
                 self.timeline.Slice_Triggered(0, clip_ids, trans_ids, playhead_position)
         elif key.matches(self.getShortcutByName("sliceSelectedKeepLeftSide")) == QKeySequence.ExactMatch:
-            intersecting_clips = Clip.filter(intersect=playhead_position)
-            intersecting_trans = Transition.filter(intersect=playhead_position)
+            intersecting_clips = Clip.filter(intersect=playhead_position, read_only=True)
+            intersecting_trans = Transition.filter(intersect=playhead_position, read_only=True)
             if intersecting_clips or intersecting_trans:
                 # Get list of clip ids
                 clip_ids = [c.id for c in intersecting_clips if c.id in self.selected_clips]
                 trans_ids = [t.id for t in intersecting_trans if t.id in self.selected_transitions]
                 self.timeline.Slice_Triggered(1, clip_ids, trans_ids, playhead_position)
         elif key.matches(self.getShortcutByName("sliceSelectedKeepRightSide")) == QKeySequence.ExactMatch:
-            intersecting_clips = Clip.filter(intersect=playhead_position)
-            intersecting_trans = Transition.filter(intersect=playhead_position)
+            intersecting_clips = Clip.filter(intersect=playhead_position, read_only=True)
+            intersecting_trans = Transition.filter(intersect=playhead_position, read_only=True)
             if intersecting_clips or intersecting_trans:
                 # Get list of ids that are also selected
                 clip_ids = [c.id for c in intersecting_clips if c.id in self.selected_clips]
@@ -2828,6 +2987,28 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
         except Exception:
             log.debug('Failed to notify unity launcher of export progress. Completed.')
 
+    def ProxyCreated(self, file_id, proxy):
+        """Store a new preview proxy in its file record (the timeline switches to it)"""
+        file = File.get(id=file_id)
+        if not file:
+            return
+        get_app().updates.update_untracked(["files", {"id": file_id}], {"proxy": proxy}, partial_update=True)
+
+    def RenderJobUpdated(self, job_id):
+        """Show the status of render queue jobs in the status bar"""
+        _ = get_app()._tr
+        job = self.render_queue.get(job_id)
+        if not job:
+            return
+        if job.status == JOB_RUNNING:
+            self.statusBar.showMessage(_("Rendering %(name)s: %(progress)d%%") % {
+                "name": job.name, "progress": job.progress * 100}, 5000)
+        elif job.status == JOB_COMPLETED:
+            self.statusBar.showMessage(_("Finished rendering %s") % job.name, 5000)
+        elif job.status == JOB_FAILED:
+            self.statusBar.showMessage(_("Failed to render %(name)s: %(error)s") % {
+                "name": job.name, "error": job.error}, 5000)
+
     def __init__(self, *args, mode=None):
 
         # Create main window base class
@@ -2879,6 +3060,9 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
         self.FoundVersionSignal.connect(self.foundCurrentVersion)
         get_current_Version()
 
+        # Project being opened (in stages)
+        self.opening_project = None
+
         # Connect signals
         if self.mode != "unittest":
             self.RecoverBackup.connect(self.recover_backup)
@@ -3008,6 +3192,7 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
         self.PauseSignal.connect(self.handlePausedVideo)
 
         # QTimer for Autosave
+        self.autosaver = AutoSaver()
         self.auto_save_timer = QTimer(self)
         self.auto_save_timer.setInterval(int(s.get("autosave-interval") * 1000 * 60))
         self.auto_save_timer.timeout.connect(self.auto_save_project)
@@ -3078,6 +3263,7 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
 
         # Connect OpenProject Signal
         self.OpenProjectSignal.connect(self.open_project)
+        self.ProjectFileRead.connect(self.project_file_read)
 
         # Show window
         if self.mode != "unittest":
@@ -3103,6 +3289,22 @@ class MainWindow(updates.UpdateWatcher, QMainWindow):
                 self.ExportFrame.connect(self.FrameExported)
                 self.ExportEnded.connect(self.ExportFinished)
 
+        # Create render queue (and resume any interrupted jobs)
+        self.render_queue = RenderQueue(max_running=int(s.get("render-queue-jobs") or 1),
+                                        job_callback=lambda job: self.RenderJobChanged.emit(job.id))
+        self.RenderJobChanged.connect(self.RenderJobUpdated)
+
+        # Store preview proxies as they are created
+        self.ProxyReady.connect(self.ProxyCreated)
+
+        # Identify media files by content (so copies at other paths use the same metadata and proxies)
+        media_cache.partial_hash = bool(s.get("media-cache-hash"))
+        thumbnail_store.partial_hash = media_cache.partial_hash
+        thumbnail_store.max_size = int(s.get("thumbnail-store-mb") or 0) * 1024 * 1024
+        if self.mode != "unittest":
+            self.render_queue.load()
+            self.render_queue.start_next()
+
         # Save settings
         s.save()
 
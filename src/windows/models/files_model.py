@@ -28,9 +28,9 @@
 
 import os
 import json
-import re
-import glob
 import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
 
 from PyQt5.QtCore import (
     QMimeData, Qt, pyqtSignal, QEventLoop, QObject,
@@ -41,13 +41,20 @@ from PyQt5.QtGui import (
 )
 from classes import updates
 from classes import info
-from classes.image_types import is_image
+from classes.media_cache import media_cache
+from classes.image_sequences import SequenceIndex
+from classes.media_probe import probe_media
 from classes.query import File
 from classes.logger import log
 from classes.app import get_app
+from classes.proxies import proxy_manager
 from requests import get
 
-import openshot
+# Imports of at least this many files are probed in worker processes
+MEDIA_PROBE_POOL_MIN_FILES = 8
+
+# Max number of worker processes probing media files
+MEDIA_PROBE_WORKERS = 8
 
 
 class FileFilterProxyModel(QSortFilterProxyModel):
@@ -126,6 +133,17 @@ class FilesModel(QObject, updates.UpdateInterface):
                 # Clear existing items
                 self.update_model(clear=True)
 
+    def changed_batch(self, actions):
+        """ Refresh the model once for a batch of changes (i.e. many imported files) """
+        if any(action.type == "load" for action in actions) or \
+                any(action.type == "insert" for action in actions if action.key and action.key[0].lower() == "files"):
+            for action in actions:
+                if action.type == "delete" and action.key and action.key[0].lower() == "files":
+                    self.update_model(clear=False, delete_file_id=action.key[1].get('id', ''))
+            self.update_model(clear=any(action.type == "load" for action in actions))
+        else:
+            super().changed_batch(actions)
+
     def update_model(self, clear=True, delete_file_id=None):
         log.debug("updating files model.")
         app = get_app()
@@ -239,8 +257,8 @@ class FilesModel(QObject, updates.UpdateInterface):
                     # Update every X items
                     get_app().processEvents(QEventLoop.ExcludeUserInputEvents)
 
-            # Refresh view and filters (to hide or show this new item)
-            get_app().window.resize_contents()
+        # Refresh view and filters (to hide or show the new items)
+        get_app().window.resize_contents()
 
         self.ignore_updates = False
 
@@ -248,6 +266,8 @@ class FilesModel(QObject, updates.UpdateInterface):
         self.ModelRefreshed.emit()
 
     def add_files(self, files, image_seq_details=None, quiet=False):
+        """ Import media files. Files are probed in worker processes (for large imports), and
+        all new files are added to the project as a single change (and undo step). """
         # Access translations
         app = get_app()
         _ = app._tr
@@ -256,121 +276,153 @@ class FilesModel(QObject, updates.UpdateInterface):
         if not isinstance(files, (list, tuple)):
             files = [files]
 
-        start_count = len(files)
-        for count, filepath in enumerate(files):
-            (dir_path, filename) = os.path.split(filepath)
-
-            # Check for this path in our existing project data
-            new_file = File.get(path=filepath)
+        # Find new files (and image sequences) to probe: (file path, image sequence path, name)
+        imports = []
+        sequence_files = set()
+        for filepath in files:
+            # Skip files which are in the project (or part of an image sequence being imported)
+            if filepath in sequence_files or File.get(path=filepath):
+                continue
 
-            # If this file is already found, exit
-            if new_file:
-                del new_file
+            # Is this an image sequence / animation?
+            seq_info = image_seq_details or self.get_image_sequence_details(filepath)
+            if not seq_info:
+                imports.append((filepath, None, None))
                 continue
 
-            try:
-                # Load filepath in libopenshot clip object (which will try multiple readers to open it)
-                clip = openshot.Clip(filepath)
-
-                # Get the JSON for the clip's internal reader
-                reader = clip.Reader()
-                file_data = json.loads(reader.Json())
-
-                # Determine media type
-                if file_data["has_video"] and not is_image(file_data):
-                    file_data["media_type"] = "video"
-                elif file_data["has_video"] and is_image(file_data):
-                    file_data["media_type"] = "image"
-                elif file_data["has_audio"] and not file_data["has_video"]:
-                    file_data["media_type"] = "audio"
-                else:
-                    # If none set, just assume video
-                    file_data["media_type"] = "video"
+            # Update file with correct path
+            folder_path = seq_info["folder_path"]
+            base_name = seq_info["base_name"]
+            fixlen = seq_info["fixlen"]
+            digits = seq_info["digits"]
+            extension = seq_info["extension"]
+
+            if not fixlen:
+                zero_pattern = "%d"
+            else:
+                zero_pattern = "%%0%sd" % digits
+
+            # Generate the regex pattern for this image sequence
+            pattern = "%s%s.%s" % (base_name, zero_pattern, extension)
+
+            # Split folder name
+            folderName = os.path.basename(folder_path)
+            name = None
+            if not base_name:
+                # Give alternate name
+                name = "%s (%s)" % (folderName, pattern)
+            imports.append((filepath, os.path.join(folder_path, pattern), name))
+
+            # Remove any other image sequence files from the list we're processing
+            sequence_files.update(seq_file for seq_file in seq_info.get("files", []) if seq_file != filepath)
+
+        # Probe all files (with progress in the status bar)
+        results = self.probe_files(imports)
+
+        # Add all new files to the project (as a single change)
+        new_files = []
+        with app.updates.transaction():
+            for (filepath, sequence_path, name), result in zip(imports, results):
+                if isinstance(result, Exception):
+                    # Log exception
+                    log.warning("Failed to import {}: {}".format(filepath, result))
+
+                    if not quiet:
+                        # Show message box to user
+                        app.window.invalidImage(os.path.basename(filepath))
+                    continue
 
                 # Save new file to the project data
                 new_file = File()
-                new_file.data = file_data
-
-                # Is this an image sequence / animation?
-                seq_info = image_seq_details or self.get_image_sequence_details(filepath)
-
-                if seq_info:
-                    # Update file with correct path
-                    folder_path = seq_info["folder_path"]
-                    base_name = seq_info["base_name"]
-                    fixlen = seq_info["fixlen"]
-                    digits = seq_info["digits"]
-                    extension = seq_info["extension"]
-
-                    if not fixlen:
-                        zero_pattern = "%d"
-                    else:
-                        zero_pattern = "%%0%sd" % digits
-
-                    # Generate the regex pattern for this image sequence
-                    pattern = "%s%s.%s" % (base_name, zero_pattern, extension)
-
-                    # Split folder name
-                    folderName = os.path.basename(folder_path)
-                    if not base_name:
-                        # Give alternate name
-                        new_file.data["name"] = "%s (%s)" % (folderName, pattern)
-
-                    # Load image sequence (to determine duration and video_length)
-                    image_seq = openshot.Clip(os.path.join(folder_path, pattern))
-
-                    # Update file details
-                    new_file.data["path"] = os.path.join(folder_path, pattern)
-                    new_file.data["media_type"] = "video"
-                    new_file.data["duration"] = image_seq.Reader().info.duration
-                    new_file.data["video_length"] = image_seq.Reader().info.video_length
-
-                    log.info('Imported {} as image sequence {}'.format(
-                        filepath, pattern))
-
-                    # Remove any other image sequence files from the list we're processing
-                    match_glob = "{}{}.{}".format(base_name, '[0-9]*', extension)
-                    log.debug("Removing files from import list with glob: {}".format(match_glob))
-                    for seq_file in glob.iglob(os.path.join(folder_path, match_glob)):
-                        # Don't remove the current file, or we mess up the for loop
-                        if seq_file in files and seq_file != filepath:
-                            files.remove(seq_file)
-
-                if not seq_info:
-                    # Log our not-an-image-sequence import
-                    log.info("Imported media file {}".format(filepath))
-
-                # Save file
+                new_file.data = result
+                if name:
+                    new_file.data["name"] = name
                 new_file.save()
+                new_files.append(new_file)
 
-                if start_count > 15:
-                    message = _("Importing %(count)d / %(total)d") % {
-                            "count": count,
-                            "total": len(files) - 1
-                            }
-                    app.window.statusBar.showMessage(message, 15000)
-
-                # Let the event loop run to update the status bar
-                get_app().processEvents()
-
-                prev_path = app.project.get("import_path")
-                if dir_path != prev_path:
-                    app.updates.update_untracked(["import_path"], dir_path)
+                if sequence_path:
+                    log.info('Imported {} as image sequence {}'.format(filepath, os.path.basename(sequence_path)))
+                else:
+                    # Log our not-an-image-sequence import
+                    log.info("Imported media file {}".format(filepath))
 
-            except Exception as ex:
-                # Log exception
-                log.warning("Failed to import {}: {}".format(filepath, ex))
+        if new_files:
+            dir_path = os.path.dirname(imports[-1][0])
+            if dir_path != app.project.get("import_path"):
+                app.updates.update_untracked(["import_path"], dir_path)
 
-                if not quiet:
-                    # Show message box to user
-                    app.window.invalidImage(filename)
+        # Create preview proxies (in the background, for large video files)
+        for new_file in new_files:
+            proxy_manager.request(new_file.data)
 
-        # Reset list of ignored paths
+        # Reset list of ignored paths (and folder indexes)
         self.ignore_image_sequence_paths = []
+        self.image_sequence_indexes = {}
 
-        message = _("Imported %(count)d files") % {"count": len(files) - 1}
+        message = _("Imported %(count)d files") % {"count": len(new_files)}
         app.window.statusBar.showMessage(message, 3000)
 
+    def probe_files(self, imports):
+        """ Probe media files (in worker processes, if there are many), keeping the UI responsive.
+        Returns the file data (or the exception) of each (file path, image sequence path, name).
+        Files probed before (by any project) use their cached metadata. """
+        results = [None] * len(imports)
+
+        # Use cached metadata (image sequences are always probed)
+        indexes = []
+        for index, (filepath, sequence_path, name) in enumerate(imports):
+            results[index] = None if sequence_path else media_cache.get(filepath)
+            if not results[index]:
+                indexes.append(index)
+        if len(indexes) < len(imports):
+            log.info("Using cached metadata of %s files" % (len(imports) - len(indexes)))
+
+        pool = None
+        if len(indexes) >= MEDIA_PROBE_POOL_MIN_FILES:
+            try:
+                # Spawn workers (forking a process with Qt and libopenshot threads is not safe)
+                pool = ProcessPoolExecutor(max_workers=min(len(indexes), os.cpu_count() or 1, MEDIA_PROBE_WORKERS),
+                                           mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError, NotImplementedError):
+                log.warning("Failed to start media probe processes", exc_info=1)
+
+        if not pool:
+            # Probe a few files right away
+            for count, index in enumerate(indexes):
+                filepath, sequence_path, name = imports[index]
+                try:
+                    results[index] = probe_media(filepath, sequence_path)
+                except Exception as ex:
+                    results[index] = ex
+                self.show_import_progress(len(imports) - len(indexes) + count + 1, len(imports))
+        else:
+            with pool:
+                futures = {pool.submit(probe_media, imports[index][0], imports[index][1]): index for index in indexes}
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=0.1)
+                    for future in done:
+                        try:
+                            results[futures[future]] = future.result()
+                        except Exception as ex:
+                            results[futures[future]] = ex
+                    self.show_import_progress(len(imports) - len(pending), len(imports))
+
+        # Cache the metadata of probed files
+        for index in indexes:
+            filepath, sequence_path, name = imports[index]
+            if not sequence_path and not isinstance(results[index], Exception):
+                media_cache.put(filepath, results[index])
+        return results
+
+    def show_import_progress(self, count, total):
+        """ Show the progress of an import (and let the event loop run to update the UI) """
+        app = get_app()
+        if total > 15:
+            message = app._tr("Importing %(count)d / %(total)d") % {"count": count, "total": total}
+            app.window.statusBar.showMessage(message, 15000)
+        app.processEvents()
+
     def get_image_sequence_details(self, file_path):
         """Inspect a file path and determine if this is an image sequence"""
 
@@ -381,34 +433,11 @@ class FilesModel(QObject, updates.UpdateInterface):
         if dirName in self.ignore_image_sequence_paths:
             return None
 
-        extensions = ["png", "jpg", "jpeg", "gif", "tif", "svg"]
-        match = re.findall(r"(.*[^\d])?(0*)(\d+)\.(%s)" % "|".join(extensions), fileName, re.I)
-
-        if not match:
-            # File name does not match an image sequence
-            return None
-
-        # Get the parts of image name
-        base_name = match[0][0]
-        fixlen = match[0][1] > ""
-        number = int(match[0][2])
-        digits = len(match[0][1] + match[0][2])
-        extension = match[0][3]
-
-        full_base_name = os.path.join(dirName, base_name)
-
-        # Check for images which the file names have the different length
-        fixlen = fixlen or not (
-            glob.glob("%s%s.%s" % (full_base_name, "[0-9]" * (digits + 1), extension))
-            or glob.glob("%s%s.%s" % (full_base_name, "[0-9]" * ((digits - 1) if digits > 1 else 3), extension))
-        )
-
-        # Check for previous or next image
-        for x in range(max(0, number - 100), min(number + 101, 50000)):
-            if x != number and os.path.exists(
-               "%s%s.%s" % (full_base_name, str(x).rjust(digits, "0") if fixlen else str(x), extension)):
-                break  # found one!
-        else:
+        # Scan each folder once per import (the index is reused for all files in the folder)
+        if dirName not in self.image_sequence_indexes:
+            self.image_sequence_indexes[dirName] = SequenceIndex(dirName)
+        parameters = self.image_sequence_indexes[dirName].get_details(fileName)
+        if not parameters:
             # We didn't discover an image sequence
             return None
 
@@ -418,19 +447,13 @@ class FilesModel(QObject, updates.UpdateInterface):
         log.debug("Ignoring path for image sequence imports: {}".format(dirName))
         self.ignore_image_sequence_paths.append(dirName)
 
-        log.info('Prompt user to import sequence starting from {}'.format(fileName))
+        log.info('Prompt user to import sequence starting from {} ({} images, {}-{})'.format(
+            fileName, parameters["count"], parameters["first"], parameters["last"]))
         if not get_app().window.promptImageSequence(fileName):
             # User said no, don't import as a sequence
             return None
 
         # Yes, import image sequence
-        parameters = {
-            "folder_path": dirName,
-            "base_name": base_name,
-            "fixlen": fixlen,
-            "digits": digits,
-            "extension": extension
-        }
         return parameters
 
     def process_urls(self, qurl_list):
@@ -562,6 +585,7 @@ class FilesModel(QObject, updates.UpdateInterface):
         self.ignore_updates = False
 
         self.ignore_image_sequence_paths = []
+        self.image_sequence_indexes = {}  # Indexes of numbered images (by folder)
 
         # Create proxy model (for sorting and filtering)
         self.proxy_model = FileFilterProxyModel(parent=self)
@@ -74,6 +74,14 @@ class PropertiesModel(updates.UpdateInterface):
             # Update the model data
             self.update_model(get_app().window.txtPropertyFilter.text())
 
+    # This method is invoked by the UpdateManager with a batch of changes (i.e. a transaction)
+    def changed_batch(self, actions):
+
+        # Update the model data once for the whole batch
+        if any(action.key and action.key[0] in ["clips", "effects"] and action.type in ["update", "insert"]
+               for action in actions):
+            self.update_model(get_app().window.txtPropertyFilter.text())
+
     # Update the selected item (which drives what properties show up)
     def update_item(self, item_id, item_type):
         # Keep track of id and type
@@ -37,6 +37,7 @@ from PyQt5 import uic
 
 from classes import info, ui_util, openshot_rc, settings
 from classes.app import get_app
+from classes.export_engine import set_preview_setting
 from classes.language import get_all_languages
 from classes.logger import log
 from classes.metrics import *
@@ -456,12 +457,8 @@ class Preferences(QDialog):
                 get_app().window.auto_save_timer.stop()
 
         elif param["setting"] == "omp_threads_enabled":
-            if (state == Qt.Checked):
-                # Enable OMP multi-threading
-                openshot.Settings.Instance().WAIT_FOR_VIDEO_PROCESSING_TASK = False
-            else:
-                # Disable OMP multi-threading
-                openshot.Settings.Instance().WAIT_FOR_VIDEO_PROCESSING_TASK = True
+            # Enable/disable OMP multi-threading (of the preview, after any running exports)
+            set_preview_setting("WAIT_FOR_VIDEO_PROCESSING_TASK", state != Qt.Checked)
 
         # Check for restart
         self.check_for_restart(param)
@@ -34,6 +34,7 @@ import openshot  # Python module for libopenshot (required video editing module
 
 from classes.app import get_app
 from classes.logger import log
+from classes.proxies import proxy_manager
 
 
 class PreviewParent(QObject):
@@ -265,8 +266,8 @@ class PlayerWorker(QObject):
             self.clip_reader.info.channels = channels
 
             try:
-                # Add clip for current preview file
-                new_clip = openshot.Clip(path)
+                # Add clip for current preview file (reading its proxy, if any)
+                new_clip = openshot.Clip(proxy_manager.get_preview_path(path))
                 self.clip_reader.AddClip(new_clip)
             except:
                 log.error('Failed to load media file into video player: %s' % path)
@@ -45,7 +45,7 @@ from classes import settings
 from classes.app import get_app
 from classes.logger import log
 from classes.query import File, Clip, Transition, Track
-from classes.waveform import get_audio_data
+from classes.waveform import get_audio_data, get_waveform_samples_per_second, waveform_scheduler
 from classes.conversion import zoomToSeconds, secondsToZoom
 
 import json
@@ -205,6 +205,7 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # Remove unused action attribute (old_values)
         action = deepcopy(action)
         action.old_values = {}
+        self.cancel_waveforms([action])
 
         # Send a JSON version of the UpdateAction to the timeline webview method: applyJsonDiff()
         if action.type == "load":
@@ -232,6 +233,26 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
             # loaded on the command line (too early?), so also call the JS directly
             self.run_js(JS_SCOPE_SELECTOR + ".setScale(" + str(initial_scale) + ", 0);")
 
+    # This method is invoked by the UpdateManager with a batch of changes (i.e. a transaction)
+    def changed_batch(self, actions):
+        self.cancel_waveforms(actions)
+        if any(action.type == "load" for action in actions):
+            super().changed_batch(actions)
+            return
+
+        # Send all diffs to the timeline webview with a single call to applyJsonDiff()
+        json_diff = [action.to_dict(include_old_values=False) for action in actions if action.key[0] != "files"]
+        if json_diff:
+            self.run_js(JS_SCOPE_SELECTOR + ".applyJsonDiff(" + json.dumps(json_diff) + ");")
+
+    def cancel_waveforms(self, actions):
+        """ Stop generating waveforms of deleted clips (or of all clips, when a project is loaded) """
+        for action in actions:
+            if action.type == "load":
+                waveform_scheduler.cancel_all()
+            elif action.type == "delete" and len(action.key) > 1 and action.key[0] == "clips":
+                waveform_scheduler.cancel(action.key[1].get("id"))
+
     # Javascript callable function to update the project data when a clip changes
     @pyqtSlot(str, bool, bool, bool)
     def update_clip_data(self, clip_json, only_basic_props=True, ignore_reader=False, ignore_refresh=False):
@@ -248,7 +269,8 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
             log.warning('Failed to parse clip JSON data', exc_info=1)
 
         # Search for matching clip in project data (if any)
-        existing_clip = Clip.get(id=clip_data["id"])
+        # Data is replaced below, so avoid copying the existing clip
+        existing_clip = Clip.get(id=clip_data["id"], read_only=True)
         if not existing_clip:
             # Create a new clip (if not exists)
             existing_clip = Clip()
@@ -331,7 +353,8 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
             transition_data = transition_json
 
         # Search for matching clip in project data (if any)
-        existing_item = Transition.get(id=transition_data["id"])
+        # Data is replaced below, so avoid copying the existing transition
+        existing_item = Transition.get(id=transition_data["id"], read_only=True)
         needs_resize = True
         if not existing_item:
             # Create a new clip (if not exists)
@@ -405,8 +428,8 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         _ = get_app()._tr
 
         # Get list of intercepting clips with position (if any)
-        intersecting_clips = Clip.filter(intersect=position)
-        intersecting_trans = Transition.filter(intersect=position)
+        intersecting_clips = Clip.filter(intersect=position, read_only=True)
+        intersecting_trans = Transition.filter(intersect=position, read_only=True)
 
         menu = QMenu(self)
         if intersecting_clips or intersecting_trans:
@@ -979,12 +1002,8 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
                 # Find frame 1 channel_filter property
                 channel_filter = c.channel_filter.GetInt(1)
 
-                # Set cursor to waiting
-                get_app().setOverrideCursor(QCursor(Qt.WaitCursor))
-
-                # Get audio data in a separate thread (so it doesn't block the UI)
-                channel_filter = channel_filter
-                get_audio_data(clip_id, file_path, channel_filter, c.volume)
+                # Get audio data in worker processes (so it doesn't block the UI)
+                get_audio_data(clip_id, file_path, channel_filter, c.volume, self.waveform_samples_per_second)
 
     def Hide_Waveform_Triggered(self, clip_ids):
         """Hide the waveform for the selected clip"""
@@ -999,21 +1018,24 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
                 # Pass to javascript timeline (and render)
                 self.run_js(JS_SCOPE_SELECTOR + ".hideAudioData('" + clip_id + "');")
 
-    def Waveform_Ready(self, clip_id, audio_data):
-        """Callback when audio waveform is ready"""
+            # Stop generating the waveform (if it isn't finished yet)
+            waveform_scheduler.cancel(clip_id)
+
+            # Remove from waveform cache (so it isn't shown again when zooming)
+            self.waveform_cache.pop(clip_id, None)
+
+    def Waveform_Ready(self, clip_id, audio_data, samples_per_second):
+        """Callback when audio waveform is ready (or partially ready, while the audio is decoded)"""
         log.info("Waveform_Ready for clip ID: %s" % (clip_id))
 
         # Convert waveform data to JSON
         serialized_audio_data = json.dumps(audio_data)
 
         # Set waveform cache (with clip_id as key)
-        self.waveform_cache[clip_id] = serialized_audio_data
+        self.waveform_cache[clip_id] = (serialized_audio_data, samples_per_second)
 
         # Pass to javascript timeline (and render)
-        self.run_js(JS_SCOPE_SELECTOR + ".setAudioData('" + clip_id + "', " + serialized_audio_data + ");")
-
-        # Restore normal cursor
-        get_app().restoreOverrideCursor()
+        self.run_js(JS_SCOPE_SELECTOR + ".setAudioData('{}', {}, {});".format(clip_id, serialized_audio_data, samples_per_second))
 
         # Start timer to redraw audio
         self.redraw_audio_timer.start()
@@ -1515,113 +1537,115 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         """Callback for paste context menus"""
         log.debug(action)
 
-        # Get list of clipboard items (that are complete clips or transitions)
-        # i.e. ignore partial clipboard items (keyframes / effects / etc...)
-        clipboard_clip_ids = [k for k, v in self.copy_clipboard.items() if v.get('id')]
-        clipboard_tran_ids = [k for k, v in self.copy_transition_clipboard.items() if v.get('id')]
-
-        # Determine left most copied clip, and top most track (the top left point of the copied objects)
-        if len(clipboard_clip_ids) + len(clipboard_tran_ids):
-            left_most_position = -1.0
-            top_most_layer = -1
-            # Loop through each copied clip (looking for top left point)
-            for clip_id in clipboard_clip_ids:
-                # Get existing clip object
-                clip = Clip()
-                clip.data = self.copy_clipboard.get(clip_id, {})
-                if clip.data['position'] < left_most_position or left_most_position == -1.0:
-                    left_most_position = clip.data['position']
-                if clip.data['layer'] > top_most_layer or top_most_layer == -1.0:
-                    top_most_layer = clip.data['layer']
-            # Loop through each copied transition (looking for top left point)
-            for tran_id in clipboard_tran_ids:
-                # Get existing transition object
-                tran = Transition()
-                tran.data = self.copy_transition_clipboard.get(tran_id, {})
-                if tran.data['position'] < left_most_position or left_most_position == -1.0:
-                    left_most_position = tran.data['position']
-                if tran.data['layer'] > top_most_layer or top_most_layer == -1.0:
-                    top_most_layer = tran.data['layer']
-
-            # Default layer if not known
-            if layer_id == -1:
-                layer_id = top_most_layer
-
-            # Determine difference from top left and paste location
-            position_diff = position - left_most_position
-            layer_diff = layer_id - top_most_layer
-
-            # Loop through each copied clip
-            for clip_id in clipboard_clip_ids:
-                # Get existing clip object
-                clip = Clip()
-                clip.data = self.copy_clipboard.get(clip_id, {})
-
-                # Remove the ID property from the clip (so it becomes a new one)
-                clip.type = 'insert'
-                clip.data.pop('id')
+        # Apply all changes as a single undo/redo step (and a single update to the timeline)
+        with get_app().updates.transaction():
+            # Get list of clipboard items (that are complete clips or transitions)
+            # i.e. ignore partial clipboard items (keyframes / effects / etc...)
+            clipboard_clip_ids = [k for k, v in self.copy_clipboard.items() if v.get('id')]
+            clipboard_tran_ids = [k for k, v in self.copy_transition_clipboard.items() if v.get('id')]
+
+            # Determine left most copied clip, and top most track (the top left point of the copied objects)
+            if len(clipboard_clip_ids) + len(clipboard_tran_ids):
+                left_most_position = -1.0
+                top_most_layer = -1
+                # Loop through each copied clip (looking for top left point)
+                for clip_id in clipboard_clip_ids:
+                    # Get existing clip object
+                    clip = Clip()
+                    clip.data = self.copy_clipboard.get(clip_id, {})
+                    if clip.data['position'] < left_most_position or left_most_position == -1.0:
+                        left_most_position = clip.data['position']
+                    if clip.data['layer'] > top_most_layer or top_most_layer == -1.0:
+                        top_most_layer = clip.data['layer']
+                # Loop through each copied transition (looking for top left point)
+                for tran_id in clipboard_tran_ids:
+                    # Get existing transition object
+                    tran = Transition()
+                    tran.data = self.copy_transition_clipboard.get(tran_id, {})
+                    if tran.data['position'] < left_most_position or left_most_position == -1.0:
+                        left_most_position = tran.data['position']
+                    if tran.data['layer'] > top_most_layer or top_most_layer == -1.0:
+                        top_most_layer = tran.data['layer']
+
+                # Default layer if not known
+                if layer_id == -1:
+                    layer_id = top_most_layer
+
+                # Determine difference from top left and paste location
+                position_diff = position - left_most_position
+                layer_diff = layer_id - top_most_layer
+
+                # Loop through each copied clip
+                for clip_id in clipboard_clip_ids:
+                    # Get existing clip object
+                    clip = Clip()
+                    clip.data = self.copy_clipboard.get(clip_id, {})
+
+                    # Remove the ID property from the clip (so it becomes a new one)
+                    clip.type = 'insert'
+                    clip.data.pop('id')
 
-                # Adjust the position and track
-                clip.data['position'] += position_diff
-                clip.data['layer'] += layer_diff
+                    # Adjust the position and track
+                    clip.data['position'] += position_diff
+                    clip.data['layer'] += layer_diff
 
-                # Save changes
-                clip.save()
+                    # Save changes
+                    clip.save()
 
-            # Loop through all copied transitions
-            for tran_id in clipboard_tran_ids:
-                # Get existing transition object
-                tran = Transition()
-                tran.data = self.copy_transition_clipboard.get(tran_id, {})
+                # Loop through all copied transitions
+                for tran_id in clipboard_tran_ids:
+                    # Get existing transition object
+                    tran = Transition()
+                    tran.data = self.copy_transition_clipboard.get(tran_id, {})
 
-                # Remove the ID property from the transition (so it becomes a new one)
-                tran.type = 'insert'
-                tran.data.pop('id')
+                    # Remove the ID property from the transition (so it becomes a new one)
+                    tran.type = 'insert'
+                    tran.data.pop('id')
 
-                # Adjust the position and track
-                tran.data['position'] += position_diff
-                tran.data['layer'] += layer_diff
+                    # Adjust the position and track
+                    tran.data['position'] += position_diff
+                    tran.data['layer'] += layer_diff
 
-                # Save changes
-                tran.save()
+                    # Save changes
+                    tran.save()
 
-        # Loop through each full clip object copied
-        if self.copy_clipboard:
-            for clip_id in clip_ids:
+            # Loop through each full clip object copied
+            if self.copy_clipboard:
+                for clip_id in clip_ids:
 
-                # Get existing clip object
-                clip = Clip.get(id=clip_id)
-                if not clip:
-                    # Invalid clip, skip to next item
-                    continue
+                    # Get existing clip object
+                    clip = Clip.get(id=clip_id)
+                    if not clip:
+                        # Invalid clip, skip to next item
+                        continue
 
-                # Apply clipboard to clip (there should only be a single key in this dict)
-                for k, v in self.copy_clipboard[list(self.copy_clipboard)[0]].items():
-                    if k != 'id':
-                        # Overwrite clips properties (which are in the clipboard)
-                        clip.data[k] = v
+                    # Apply clipboard to clip (there should only be a single key in this dict)
+                    for k, v in self.copy_clipboard[list(self.copy_clipboard)[0]].items():
+                        if k != 'id':
+                            # Overwrite clips properties (which are in the clipboard)
+                            clip.data[k] = v
 
-                # Save changes
-                clip.save()
+                    # Save changes
+                    clip.save()
 
-        # Loop through each full transition object copied
-        if self.copy_transition_clipboard:
-            for tran_id in tran_ids:
+            # Loop through each full transition object copied
+            if self.copy_transition_clipboard:
+                for tran_id in tran_ids:
 
-                # Get existing transition object
-                tran = Transition.get(id=tran_id)
-                if not tran:
-                    # Invalid transition, skip to next item
-                    continue
+                    # Get existing transition object
+                    tran = Transition.get(id=tran_id)
+                    if not tran:
+                        # Invalid transition, skip to next item
+                        continue
 
-                # Apply clipboard to transition (there should only be a single key in this dict)
-                for k, v in self.copy_transition_clipboard[list(self.copy_transition_clipboard)[0]].items():
-                    if k != 'id':
-                        # Overwrite transition properties (which are in the clipboard)
-                        tran.data[k] = v
+                    # Apply clipboard to transition (there should only be a single key in this dict)
+                    for k, v in self.copy_transition_clipboard[list(self.copy_transition_clipboard)[0]].items():
+                        if k != 'id':
+                            # Overwrite transition properties (which are in the clipboard)
+                            tran.data[k] = v
 
-                # Save changes
-                tran.save()
+                    # Save changes
+                    tran.save()
 
     def Nudge_Triggered(self, action, clip_ids, tran_ids):
         """Callback for clip nudges"""
@@ -1641,7 +1665,7 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # Loop through each selected clip (find furthest left and right edge)
         for clip_id in clip_ids:
             # Get existing clip object
-            clip = Clip.get(id=clip_id)
+            clip = Clip.get(id=clip_id, read_only=True)
             if not clip:
                 # Invalid clip, skip to next item
                 continue
@@ -1663,7 +1687,7 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # Loop through each selected transition (find furthest left and right edge)
         for tran_id in tran_ids:
             # Get existing transition object
-            tran = Transition.get(id=tran_id)
+            tran = Transition.get(id=tran_id, read_only=True)
             if not tran:
                 # Invalid transition, skip to next item
                 continue
@@ -1682,33 +1706,38 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
                 log.info("Cannot nudge beyond start of timeline")
                 nudgeDistance = 0
 
-        # Loop through each selected clip (update position to align clips)
-        for clip_id in clip_ids:
-            # Get existing clip object
-            clip = Clip.get(id=clip_id)
-            if not clip:
-                # Invalid clip, skip to next item
-                continue
+        # Apply all changes as a single undo/redo step (and a single update to the timeline)
+        with get_app().updates.transaction():
+            # Loop through each selected clip (update position to align clips)
+            for clip_id in clip_ids:
+                # Get existing clip object
+                clip = Clip.get(id=clip_id)
+                if not clip:
+                    # Invalid clip, skip to next item
+                    continue
 
-            # Do the nudge
-            clip.data['position'] += nudgeDistance
+                # Do the nudge
+                clip.data['position'] += nudgeDistance
 
-            # Save changes
-            self.update_clip_data(clip.data, only_basic_props=False, ignore_reader=True)
+                # Save changes
+                self.update_clip_data(clip.data, only_basic_props=False, ignore_reader=True, ignore_refresh=True)
 
-        # Loop through each selected transition (update position to align clips)
-        for tran_id in tran_ids:
-            # Get existing transition object
-            tran = Transition.get(id=tran_id)
-            if not tran:
-                # Invalid transition, skip to next item
-                continue
+            # Loop through each selected transition (update position to align clips)
+            for tran_id in tran_ids:
+                # Get existing transition object
+                tran = Transition.get(id=tran_id)
+                if not tran:
+                    # Invalid transition, skip to next item
+                    continue
 
-            # Do the nudge
-            tran.data['position'] += nudgeDistance
+                # Do the nudge
+                tran.data['position'] += nudgeDistance
 
-            # Save changes
-            self.update_transition_data(tran.data, only_basic_props=False)
+                # Save changes
+                self.update_transition_data(tran.data, only_basic_props=False, ignore_refresh=True)
+
+        # Update the preview (once all changes are applied)
+        self.window.refreshFrameSignal.emit()
 
     def Align_Triggered(self, action, clip_ids, tran_ids):
         """Callback for alignment context menus"""
@@ -1720,7 +1749,7 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # Loop through each selected clip (find furthest left and right edge)
         for clip_id in clip_ids:
             # Get existing clip object
-            clip = Clip.get(id=clip_id)
+            clip = Clip.get(id=clip_id, read_only=True)
             if not clip:
                 # Invalid clip, skip to next item
                 continue
@@ -1737,7 +1766,7 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # Loop through each selected transition (find furthest left and right edge)
         for tran_id in tran_ids:
             # Get existing transition object
-            tran = Transition.get(id=tran_id)
+            tran = Transition.get(id=tran_id, read_only=True)
             if not tran:
                 # Invalid transition, skip to next item
                 continue
@@ -1751,47 +1780,52 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
             if position + (end_of_tran - start_of_tran) > right_edge or right_edge == -1.0:
                 right_edge = position + (end_of_tran - start_of_tran)
 
-        # Loop through each selected clip (update position to align clips)
-        for clip_id in clip_ids:
-            # Get existing clip object
-            clip = Clip.get(id=clip_id)
-            if not clip:
-                # Invalid clip, skip to next item
-                continue
+        # Apply all changes as a single undo/redo step (and a single update to the timeline)
+        with get_app().updates.transaction():
+            # Loop through each selected clip (update position to align clips)
+            for clip_id in clip_ids:
+                # Get existing clip object
+                clip = Clip.get(id=clip_id)
+                if not clip:
+                    # Invalid clip, skip to next item
+                    continue
 
-            if action == MENU_ALIGN_LEFT:
-                clip.data['position'] = left_edge
-            elif action == MENU_ALIGN_RIGHT:
-                position = float(clip.data["position"])
-                start_of_clip = float(clip.data["start"])
-                end_of_clip = float(clip.data["end"])
-                right_clip_edge = position + (end_of_clip - start_of_clip)
+                if action == MENU_ALIGN_LEFT:
+                    clip.data['position'] = left_edge
+                elif action == MENU_ALIGN_RIGHT:
+                    position = float(clip.data["position"])
+                    start_of_clip = float(clip.data["start"])
+                    end_of_clip = float(clip.data["end"])
+                    right_clip_edge = position + (end_of_clip - start_of_clip)
 
-                clip.data['position'] = position + (right_edge - right_clip_edge)
+                    clip.data['position'] = position + (right_edge - right_clip_edge)
 
-            # Save changes
-            self.update_clip_data(clip.data, only_basic_props=False, ignore_reader=True)
+                # Save changes
+                self.update_clip_data(clip.data, only_basic_props=False, ignore_reader=True, ignore_refresh=True)
 
-        # Loop through each selected transition (update position to align clips)
-        for tran_id in tran_ids:
-            # Get existing transition object
-            tran = Transition.get(id=tran_id)
-            if not tran:
-                # Invalid transition, skip to next item
-                continue
+            # Loop through each selected transition (update position to align clips)
+            for tran_id in tran_ids:
+                # Get existing transition object
+                tran = Transition.get(id=tran_id)
+                if not tran:
+                    # Invalid transition, skip to next item
+                    continue
 
-            if action == MENU_ALIGN_LEFT:
-                tran.data['position'] = left_edge
-            elif action == MENU_ALIGN_RIGHT:
-                position = float(tran.data["position"])
-                start_of_tran = float(tran.data["start"])
-                end_of_tran = float(tran.data["end"])
-                right_tran_edge = position + (end_of_tran - start_of_tran)
+                if action == MENU_ALIGN_LEFT:
+                    tran.data['position'] = left_edge
+                elif action == MENU_ALIGN_RIGHT:
+                    position = float(tran.data["position"])
+                    start_of_tran = float(tran.data["start"])
+                    end_of_tran = float(tran.data["end"])
+                    right_tran_edge = position + (end_of_tran - start_of_tran)
 
-                tran.data['position'] = position + (right_edge - right_tran_edge)
+                    tran.data['position'] = position + (right_edge - right_tran_edge)
 
-            # Save changes
-            self.update_transition_data(tran.data, only_basic_props=False)
+                # Save changes
+                self.update_transition_data(tran.data, only_basic_props=False, ignore_refresh=True)
+
+        # Update the preview (once all changes are applied)
+        self.window.refreshFrameSignal.emit()
 
     def Fade_Triggered(self, action, clip_ids, position="Entire Clip"):
         """Callback for fade context menus"""
@@ -1900,127 +1934,132 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # in-between frames, and thus less likely to repeat or skip a frame).
         playhead_position = float(round((playhead_position * fps_num) / fps_den) * fps_den) / fps_num
 
-        # Loop through each clip (using the list of ids)
-        for clip_id in clip_ids:
-
-            # Get existing clip object
-            clip = Clip.get(id=clip_id)
-            if not clip:
-                # Invalid clip, skip to next item
-                continue
+        # Apply all changes as a single undo/redo step (and a single update to the timeline)
+        with get_app().updates.transaction():
+            # Loop through each clip (using the list of ids)
+            for clip_id in clip_ids:
 
-            # Determine if waveform needs to be redrawn
-            has_audio_data = clip_id in self.waveform_cache
-
-            if action in [MENU_SLICE_KEEP_LEFT, MENU_SLICE_KEEP_BOTH]:
-                # Get details of original clip
-                position_of_clip = float(clip.data["position"])
-                start_of_clip = float(clip.data["start"])
-
-                # Set new 'end' of clip
-                clip.data["end"] = start_of_clip + (playhead_position - position_of_clip)
-
-            elif action == MENU_SLICE_KEEP_RIGHT:
-                # Get details of original clip
-                position_of_clip = float(clip.data["position"])
-                start_of_clip = float(clip.data["start"])
-
-                # Set new 'end' of clip
-                clip.data["position"] = playhead_position
-                clip.data["start"] = start_of_clip + (playhead_position - position_of_clip)
-
-            if action == MENU_SLICE_KEEP_BOTH:
-                # Add the 2nd clip (the right side, since the left side has already been adjusted above)
-                # Get right side clip object
-                right_clip = Clip.get(id=clip_id)
-                if not right_clip:
+                # Get existing clip object
+                clip = Clip.get(id=clip_id)
+                if not clip:
                     # Invalid clip, skip to next item
                     continue
 
-                # Remove the ID property from the clip (so it becomes a new one)
-                right_clip.id = None
-                right_clip.type = 'insert'
-                right_clip.data.pop('id')
-                right_clip.key.pop(1)
+                # Determine if waveform needs to be redrawn
+                has_audio_data = clip_id in self.waveform_cache
 
-                # Set new 'start' of right_clip (need to bump 1 frame duration more, so we don't repeat a frame)
-                right_clip.data["position"] = (round(float(playhead_position) * fps_float) + 1) / fps_float
-                right_clip.data["start"] = (round(float(clip.data["end"]) * fps_float) + 2) / fps_float
+                if action in [MENU_SLICE_KEEP_LEFT, MENU_SLICE_KEEP_BOTH]:
+                    # Get details of original clip
+                    position_of_clip = float(clip.data["position"])
+                    start_of_clip = float(clip.data["start"])
 
-                # Save changes
-                right_clip.save()
+                    # Set new 'end' of clip
+                    clip.data["end"] = start_of_clip + (playhead_position - position_of_clip)
 
-                # Save changes again (with new thumbnail)
-                self.update_clip_data(right_clip.data, only_basic_props=False, ignore_reader=True)
+                elif action == MENU_SLICE_KEEP_RIGHT:
+                    # Get details of original clip
+                    position_of_clip = float(clip.data["position"])
+                    start_of_clip = float(clip.data["start"])
 
-                if has_audio_data:
-                    # Add right clip audio to cache
-                    self.waveform_cache[right_clip.id] = self.waveform_cache.get(clip_id, '[]')
+                    # Set new 'end' of clip
+                    clip.data["position"] = playhead_position
+                    clip.data["start"] = start_of_clip + (playhead_position - position_of_clip)
 
-                    # Pass audio to javascript timeline (and render)
-                    self.run_js(JS_SCOPE_SELECTOR + ".setAudioData('{}',{});"
-                        .format(right_clip.id, self.waveform_cache.get(right_clip.id)))
+                if action == MENU_SLICE_KEEP_BOTH:
+                    # Add the 2nd clip (the right side, since the left side has already been adjusted above)
+                    # Get right side clip object
+                    right_clip = Clip.get(id=clip_id)
+                    if not right_clip:
+                        # Invalid clip, skip to next item
+                        continue
 
-            # Save changes
-            self.update_clip_data(clip.data, only_basic_props=False, ignore_reader=True)
+                    # Remove the ID property from the clip (so it becomes a new one)
+                    right_clip.id = None
+                    right_clip.type = 'insert'
+                    right_clip.data.pop('id')
+                    right_clip.key.pop(1)
 
-        # Start or restart timer to redraw audio waveforms
-        self.redraw_audio_timer.start()
+                    # Set new 'start' of right_clip (need to bump 1 frame duration more, so we don't repeat a frame)
+                    right_clip.data["position"] = (round(float(playhead_position) * fps_float) + 1) / fps_float
+                    right_clip.data["start"] = (round(float(clip.data["end"]) * fps_float) + 2) / fps_float
 
-        # Loop through each transition (using the list of ids)
-        for trans_id in trans_ids:
-            # Get existing transition object
-            trans = Transition.get(id=trans_id)
-            if not trans:
-                # Invalid transition, skip to next item
-                continue
+                    # Save changes
+                    right_clip.save()
 
-            if action in [MENU_SLICE_KEEP_LEFT, MENU_SLICE_KEEP_BOTH]:
-                # Get details of original transition
-                position_of_tran = float(trans.data["position"])
+                    # Save changes again (with new thumbnail)
+                    self.update_clip_data(right_clip.data, only_basic_props=False, ignore_reader=True, ignore_refresh=True)
 
-                # Set new 'end' of transition
-                trans.data["end"] = playhead_position - position_of_tran
+                    if has_audio_data:
+                        # Add right clip audio to cache
+                        self.waveform_cache[right_clip.id] = self.waveform_cache.get(clip_id)
 
-            elif action == MENU_SLICE_KEEP_RIGHT:
-                # Get details of transition clip
-                position_of_tran = float(trans.data["position"])
-                end_of_tran = float(trans.data["end"])
+                        # Pass audio to javascript timeline (and render)
+                        self.run_js(JS_SCOPE_SELECTOR + ".setAudioData('{}', {}, {});"
+                            .format(right_clip.id, *self.waveform_cache.get(right_clip.id)))
+
+                # Save changes
+                self.update_clip_data(clip.data, only_basic_props=False, ignore_reader=True, ignore_refresh=True)
 
-                # Set new 'end' of transition
-                trans.data["position"] = playhead_position
-                trans.data["end"] = end_of_tran - (playhead_position - position_of_tran)
+            # Start or restart timer to redraw audio waveforms
+            self.redraw_audio_timer.start()
 
-            if action == MENU_SLICE_KEEP_BOTH:
-                # Add the 2nd transition (the right side, since the left side has already been adjusted above)
-                # Get right side transition object
-                right_tran = Transition.get(id=trans_id)
-                if not right_tran:
+            # Loop through each transition (using the list of ids)
+            for trans_id in trans_ids:
+                # Get existing transition object
+                trans = Transition.get(id=trans_id)
+                if not trans:
                     # Invalid transition, skip to next item
                     continue
 
-                # Remove the ID property from the transition (so it becomes a new one)
-                right_tran.id = None
-                right_tran.type = 'insert'
-                right_tran.data.pop('id')
-                right_tran.key.pop(1)
+                if action in [MENU_SLICE_KEEP_LEFT, MENU_SLICE_KEEP_BOTH]:
+                    # Get details of original transition
+                    position_of_tran = float(trans.data["position"])
 
-                # Get details of original transition
-                position_of_tran = float(right_tran.data["position"])
-                end_of_tran = float(right_tran.data["end"])
+                    # Set new 'end' of transition
+                    trans.data["end"] = playhead_position - position_of_tran
 
-                # Set new 'end' of right_tran
-                right_tran.data["position"] = playhead_position + frame_duration
-                right_tran.data["end"] = end_of_tran - (playhead_position - position_of_tran) + frame_duration
+                elif action == MENU_SLICE_KEEP_RIGHT:
+                    # Get details of transition clip
+                    position_of_tran = float(trans.data["position"])
+                    end_of_tran = float(trans.data["end"])
 
-                # Save changes
-                right_tran.save()
+                    # Set new 'end' of transition
+                    trans.data["position"] = playhead_position
+                    trans.data["end"] = end_of_tran - (playhead_position - position_of_tran)
+
+                if action == MENU_SLICE_KEEP_BOTH:
+                    # Add the 2nd transition (the right side, since the left side has already been adjusted above)
+                    # Get right side transition object
+                    right_tran = Transition.get(id=trans_id)
+                    if not right_tran:
+                        # Invalid transition, skip to next item
+                        continue
 
-                # Save changes again (right side)
-                self.update_transition_data(right_tran.data, only_basic_props=False)
+                    # Remove the ID property from the transition (so it becomes a new one)
+                    right_tran.id = None
+                    right_tran.type = 'insert'
+                    right_tran.data.pop('id')
+                    right_tran.key.pop(1)
 
-            # Save changes (left side)
-            self.update_transition_data(trans.data, only_basic_props=False)
+                    # Get details of original transition
+                    position_of_tran = float(right_tran.data["position"])
+                    end_of_tran = float(right_tran.data["end"])
+
+                    # Set new 'end' of right_tran
+                    right_tran.data["position"] = playhead_position + frame_duration
+                    right_tran.data["end"] = end_of_tran - (playhead_position - position_of_tran) + frame_duration
+
+                    # Save changes
+                    right_tran.save()
+
+                    # Save changes again (right side)
+                    self.update_transition_data(right_tran.data, only_basic_props=False, ignore_refresh=True)
+
+                # Save changes (left side)
+                self.update_transition_data(trans.data, only_basic_props=False, ignore_refresh=True)
+
+        # Update the preview (once all changes are applied)
+        self.window.refreshFrameSignal.emit()
 
     def Volume_Triggered(self, action, clip_ids, position="Entire Clip"):
         """Callback for volume context menus"""
@@ -2033,7 +2072,7 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
 
             if has_audio_data:
                 # Re-generate waveform since volume curve has changed
-                self.Show_Waveform_Triggered(clip_id)
+                self.Show_Waveform_Triggered([clip_id])
 
         # Get FPS from project
         fps = get_app().project.get("fps")
@@ -2772,6 +2811,12 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # Start or restart timer to redraw audio
         self.redraw_audio_timer.start()
 
+        # Get waveforms with a different level of detail (if needed for this zoom)
+        samples_per_second = get_waveform_samples_per_second(float(get_app().project.get("tick_pixels") or 100) / newScale)
+        if samples_per_second != self.waveform_samples_per_second:
+            self.waveform_samples_per_second = samples_per_second
+            self.Show_Waveform_Triggered(list(self.waveform_cache.keys()))
+
         # Only update scale if different
         current_scale = get_app().project.get("scale")
 
@@ -3138,9 +3183,13 @@ class TimelineWebView(updates.UpdateInterface, WebViewClass):
         # Connect waveform generation signal
         window.WaveformReady.connect(self.Waveform_Ready)
 
-        # Local audio waveform cache
+        # Local audio waveform cache (clip_id: (serialized audio data, samples per second))
         self.waveform_cache = {}
 
+        # Level of detail of waveforms (for the current zoom)
+        initial_scale = get_app().project.get("scale") or 15
+        self.waveform_samples_per_second = get_waveform_samples_per_second(100.0 / initial_scale)
+
         # Connect update thumbnail signal
         window.ThumbnailUpdated.connect(self.Thumbnail_Updated)
 